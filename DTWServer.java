@@ -1,6 +1,9 @@
 import py4j.GatewayServer;
 import java.util.concurrent.*;
 import java.util.*;
+import java.nio.ByteBuffer;
+import java.nio.DoubleBuffer;
+import java.nio.ByteOrder;
 
 public class DTWServer {
     private final ExecutorService threadPool;
@@ -52,6 +55,24 @@ public class DTWServer {
         return results;
     }
     
+    // BULK TRANSFER: build many equally shaped sequences from one little-endian float64 buffer.
+    // Filling a double[][] element by element from Python costs one Py4J round trip per value;
+    // this takes a single call for the whole database.
+    public List<double[][]> toMatrixList(byte[] data, int count, int rows, int cols) {
+        DoubleBuffer values = ByteBuffer.wrap(data).order(ByteOrder.LITTLE_ENDIAN).asDoubleBuffer();
+        List<double[][]> matrices = new ArrayList<>(count);
+        
+        for (int k = 0; k < count; k++) {
+            double[][] matrix = new double[rows][cols];
+            for (int i = 0; i < rows; i++) {
+                values.get(matrix[i]);
+            }
+            matrices.add(matrix);
+        }
+        
+        return matrices;
+    }
+    
     // Helper class for thread results
     private static class DTWResult {
         final int index;
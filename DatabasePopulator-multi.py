@@ -3,10 +3,268 @@ import os
 import time
 import multiprocessing
 import traceback
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from PyQt6.QtCore import QPoint
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import cv2
 import numpy as np
+from sign_index import build_location_index, save_location_index
+from HandCoordinates import init_tracking_worker
+from frame_source import probe_videos, benchmark_new_formats
+from result_slots import ResultSlots, write_arrays
+
+# Tasks queued per worker beyond the one it is running, so no worker idles while the parent handles results
+TASKS_PER_WORKER = 2
+
+
+class CostModel:
+    """Processing time estimate from a video's duration, fps and resolution, refit as results arrive
+
+    Time is modelled as a fixed per-video overhead, plus tracking cost proportional to the
+    duration (frames are tracked on the TARGET_FPS timeline), plus decoding cost proportional
+    to source frames times megapixels. The coefficients are fit by least squares on the
+    measured processing times, regularized towards the prior while there are few of them.
+    """
+    PRIOR = np.array([1.0, 0.5, 0.01])
+    PRIOR_WEIGHT = 1.0
+
+    def __init__(self):
+        self.coef = self.PRIOR.copy()
+        self._features = []
+        self._times = []
+
+    @staticmethod
+    def features(metadata):
+        """(1, seconds, source frames x megapixels) for (duration_ms, fps, width, height), or overhead only"""
+        if metadata is None:
+            return np.array([1.0, 0.0, 0.0])
+        duration_ms, fps, width, height = metadata
+        seconds = duration_ms / 1000.0
+        return np.array([1.0, seconds, seconds * fps * width * height / 1e6])
+
+    def estimate(self, features):
+        """Estimated seconds for one feature vector or a (videos, 3) matrix"""
+        return np.asarray(features) @ self.coef
+
+    def update(self, features, processing_time):
+        self._features.append(features)
+        self._times.append(processing_time)
+        X = np.array(self._features)
+        y = np.array(self._times)
+        # Ridge regression towards the prior, coefficients kept non-negative
+        regularizer = self.PRIOR_WEIGHT * np.eye(len(self.PRIOR))
+        self.coef = np.maximum(np.linalg.solve(X.T @ X + regularizer, X.T @ y + regularizer @ self.PRIOR), 0.0)
+
+
+def manifest_metadata(parts):
+    """(duration_ms, fps, width, height) from the manifest columns after signer, or None if absent"""
+    try:
+        duration_ms, fps, width, height = (float(v) for v in parts[4:8])
+    except ValueError:
+        return None
+    if duration_ms <= 0 or fps <= 0:
+        return None
+    return duration_ms, fps, width, height
+
+
+def init_populator_worker():
+    """ProcessPoolExecutor initializer: import the extraction code and load every model once per worker"""
+    init_tracking_worker()
+    import VideoTrimAndCropping
+    from faceDetection import get_detector, get_mediapipe_detector
+    if VideoTrimAndCropping.FACE_DETECTOR == "mediapipe":
+        get_mediapipe_detector()
+    else:
+        get_detector()
+
+
+def _video_duration(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = (frame_count / fps) * 1000
+    
+    cap.release()
+    return duration
+
+
+# Closing braces of the database files, which later saves write their new entries in front of
+DB_FILE_END = '\n}}\n'
+
+
+def _array_json(arr):
+    """JSON text of an array, formatted by NumPy instead of going through Python float lists; NaN becomes null"""
+    if arr.dtype.kind != 'f':
+        return json.dumps(arr.tolist())
+    text = arr.astype(str)
+    text[np.isnan(arr)] = 'null'
+    text[np.isposinf(arr)] = 'Infinity'
+    text[np.isneginf(arr)] = '-Infinity'
+
+    def nested(values):
+        if values.ndim == 0:
+            return str(values)
+        if values.ndim == 1:
+            return '[' + ', '.join(values) + ']'
+        return '[' + ', '.join(nested(row) for row in values) + ']'
+    return nested(text)
+
+
+def _value_json(value):
+    """JSON text of a database value: arrays through _array_json, dicts of them, or plain JSON values"""
+    if isinstance(value, np.ndarray):
+        return _array_json(value)
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{json.dumps(key)}: {_value_json(v)}" for key, v in value.items()) + '}'
+    # Entries loaded from the files are plain JSON already; NumPy scalars (e.g. in origin) become Python numbers
+    return json.dumps(value, default=lambda obj: obj.item())
+
+
+def _entry_json(video_path, video_data):
+    """One '"path": {...}' line of the database files"""
+    entry = {
+        "name": video_data["name"],
+        "features": video_data["features"],
+        "is_one_handed": video_data["is_one_handed"],
+        "duration": float(video_data["duration"]),
+        "origin": video_data["origin"],
+        "scaling_factor": float(video_data["scaling_factor"])
+    }
+    if "processing_time" in video_data:
+        entry["processing_time"] = float(video_data["processing_time"])
+    return f"    {json.dumps(video_path)}: {_value_json(entry)}"
+
+
+def _as_float32(arr):
+    return arr.astype(np.float32, copy=False) if arr.dtype.kind == 'f' else arr
+
+
+def _pack_features(features, slot_name):
+    """Write the feature arrays (as float32) into the shared memory slot; only the rest and the layout get pickled"""
+    arrays = {}
+    values = {}
+    for key, value in features.items():
+        if isinstance(value, np.ndarray):
+            arrays[(key,)] = _as_float32(value)
+        elif isinstance(value, dict) and value and all(isinstance(v, np.ndarray) for v in value.values()):
+            for sub_key, sub_value in value.items():
+                arrays[(key, sub_key)] = _as_float32(sub_value)
+        else:
+            values[key] = value
+
+    layout = write_arrays(slot_name, arrays) if slot_name is not None else None
+    if layout is None:
+        # No slot, or too large for it: arrays are pickled as raw buffers instead
+        features = dict(values)
+        for path, arr in arrays.items():
+            if len(path) == 1:
+                features[path[0]] = arr
+            else:
+                features.setdefault(path[0], {})[path[1]] = arr
+        return {"values": features, "layout": None}
+    return {"values": values, "layout": layout}
+
+
+def _unpack_features(packed, slots, slot_name):
+    features = dict(packed["values"])
+    if packed["layout"] is not None:
+        for path, arr in slots.read(slot_name, packed["layout"]).items():
+            if len(path) == 1:
+                features[path[0]] = arr
+            else:
+                features.setdefault(path[0], {})[path[1]] = arr
+    return features
+
+
+def _process_video(video_entry, slot_name=None):
+    """Process a single manifest line in a worker process
+
+    Module level so submitting a task pickles only the line, not the populator and its database.
+    Feature arrays come back through the ResultSlots slot slot_name (see _pack_features).
+    """
+    parts = [p.strip() for p in video_entry.strip().split(',')]
+    video_path = parts[0]
+    sign_name = parts[1] if len(parts) > 1 else os.path.splitext(os.path.basename(video_path))[0]
+    is_one_handed = True if len(parts) <= 2 else parts[2].lower() == 'true'
+    # Optional signer/session column: clips of the same set-up share a cached face box
+    face_group = parts[3] if len(parts) > 3 and parts[3] else None
+
+    print(f"Processing: {sign_name} from {video_path}")
+
+    if not os.path.exists(video_path):
+        print(f"Video not found: {video_path}")
+        return {"status": "error", "path": video_path, "reason": "not_found"}
+
+    try:
+        video_start_time = time.time()
+
+        # Extract features directly without using GetValues which does comparison
+        features, origin, scaling_factor, duration = _extract_features_only(
+            video_path, 
+            is_one_handed,
+            face_group
+        )
+
+        video_processing_time = time.time() - video_start_time
+        
+        if features is None or not features:
+            print(f"No features extracted for {sign_name}, skipping database entry")
+            return {"status": "error", "path": video_path, "reason": "no_features"}
+        
+        # Return the processed data rather than modifying shared data
+        result = {
+            "status": "processed",
+            "path": video_path,
+            "name": sign_name,
+            "features": _pack_features(features, slot_name),
+            "is_one_handed": is_one_handed,
+            "duration": duration,
+            "origin": origin,
+            "scaling_factor": scaling_factor,
+            "processing_time": video_processing_time
+        }
+        
+        return result
+
+    except Exception as e:
+        print(f"Error processing {video_path}: {str(e)}")
+        traceback.print_exc()
+        return {"status": "error", "path": video_path, "reason": str(e)}
+
+
+def _extract_features_only(video_path, is_one_handed, face_group=None):
+    """Extract features from a video without comparing to database"""
+    from VideoTrimAndCropping import extract_sign_features
+    
+    print(f"Extracting features from: {video_path}")
+    
+    # Get video duration
+    duration = _video_duration(video_path)
+    if duration is None:
+        print(f"Could not read video: {video_path}")
+        return None, None, None, None
+
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    try:
+        # Database clips are processed whole and uncropped, decoded in memory like GetValues
+        # Features stay arrays; they reach the parent through shared memory and become JSON text only in _save_db
+        features, origin, scaling_factor = extract_sign_features(
+            0, None, (0, 0), (width, height), video_path, is_one_handed, face_group=face_group, as_arrays=True
+        )
+        if features is None:
+            return None, None, None, None
+        return features, origin, scaling_factor, duration
+        
+    except Exception as e:
+        print(f"Error in feature extraction: {str(e)}")
+        traceback.print_exc()
+        return None, None, None, None
+
 
 class DatabasePopulator:
     def __init__(self, db_dir="sign_database", db_file="sign_data.db", json_backup=True, max_signs=None, 
@@ -26,6 +284,10 @@ class DatabasePopulator:
         
         self.db_data = self._load_or_create_db()
         self.benchmark_data = {"processing_times": []}
+        self.location_index = build_location_index(self.db_data["signs"])
+        # Entries already in the database files written during this run
+        self._files_written = False
+        self._saved_paths = set()
         
         print(f"Initialized with {self.num_workers} worker processes")
         
@@ -43,47 +305,52 @@ class DatabasePopulator:
                 return json.load(f)
         return {"signs": {}}
 
+    def _write_entries(self, path, paths, rewrite):
+        """Write the database entries for paths to path: the whole file, or appended before its closing braces"""
+        if rewrite:
+            with open(path, 'w') as f:
+                f.write('{"signs": {\n')
+                for i, video_path in enumerate(paths):
+                    f.write(('' if i == 0 else ',\n') + _entry_json(video_path, self.db_data["signs"][video_path]))
+                f.write(DB_FILE_END)
+            return
+        if not paths:
+            return
+        with open(path, 'r+') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(f.tell() - len(DB_FILE_END))
+            separator = ',\n' if len(self._saved_paths) > 0 else ''
+            f.write(separator + ',\n'.join(_entry_json(p, self.db_data["signs"][p]) for p in paths) + DB_FILE_END)
+
     def _save_db(self):
+        """Save the entries added since the last save
+
+        The first save of a run rewrites both database files; later ones append only the new
+        entries, so a save costs the size of the batch rather than of the whole database.
+        """
         try:
             print("\n--- DATABASE SAVE ATTEMPT ---")
             print(f"Current working directory: {os.getcwd()}")
             print(f"Database directory: {os.path.abspath(self.db_dir)}")
-            
-            def convert_to_json_serializable(obj):
-                if isinstance(obj, np.ndarray):
-                    return [[None if np.isnan(x) else float(x) for x in row] 
-                        for row in obj]
-                if isinstance(obj, (np.float32, np.float64)):
-                    return float(obj)
-                if isinstance(obj, (np.int32, np.int64)):
-                    return int(obj)
-                return obj
-
-            json_safe_data = {}
-            for video_path, video_data in self.db_data["signs"].items():
-                json_safe_data[video_path] = {
-                    "name": video_data["name"],
-                    "features": {
-                        key: convert_to_json_serializable(value)
-                        for key, value in video_data["features"].items()
-                    },
-                    "is_one_handed": video_data["is_one_handed"],
-                    "duration": float(video_data["duration"]),
-                    "origin": convert_to_json_serializable(video_data["origin"]),
-                    "scaling_factor": float(video_data["scaling_factor"])
-                }
-                if "processing_time" in video_data:
-                    json_safe_data[video_path]["processing_time"] = float(video_data["processing_time"])
-
-            print(f"Number of signs in database: {len(json_safe_data)}")
-            
+
+            rewrite = not self._files_written
+            if rewrite:
+                new_paths = list(self.db_data["signs"])
+                self._saved_paths = set()
+            else:
+                new_paths = [p for p in self.db_data["signs"] if p not in self._saved_paths]
+            print(f"Number of signs in database: {len(self.db_data['signs'])} ({len(new_paths)} to write)")
+
             print(f"Saving JSON data to: {self.json_file}")
-            with open(self.json_file, 'w') as f:
-                json.dump({"signs": json_safe_data}, f, indent=4)
-            
+            self._write_entries(self.json_file, new_paths, rewrite)
             print(f"Saving DB data to: {self.db_file}")
-            with open(self.db_file, 'w') as f:
-                json.dump({"signs": json_safe_data}, f, indent=4)
+            self._write_entries(self.db_file, new_paths, rewrite)
+            self._files_written = True
+            self._saved_paths.update(new_paths)
+
+            # Inverted index from quantized start/end hand location to signs, for candidate filtering.
+            # Saved after the database so load_location_index sees it as up to date
+            save_location_index(self.location_index, self.db_dir)
                 
             if self.benchmark_data["processing_times"]:
                 print(f"Saving benchmark data to: {self.benchmark_file}")
@@ -103,299 +370,53 @@ class DatabasePopulator:
         except Exception as e:
             print(f"ERROR DURING DATABASE SAVE: {str(e)}")
             traceback.print_exc()
+            # The files may be partly written; rewrite them whole next time
+            self._files_written = False
 
-    def get_video_duration(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return None
-        
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = (frame_count / fps) * 1000
-        
-        cap.release()
-        return duration
-
-    def calculate_roi_points(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            print(f"Warning: Could not open video {video_path}, using default ROI")
-            return QPoint(100, 100), QPoint(400, 400)
-            
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        cap.release()
-
-        padding_percent = 0.20
-        start_x = int(width * padding_percent)
-        start_y = int(height * padding_percent)
-        end_x = int(width * (1 - padding_percent))
-        end_y = int(height * (1 - padding_percent))
-
-        MIN_SIZE = 200
-        if (end_x - start_x) < MIN_SIZE:
-            center_x = (start_x + end_x) // 2
-            start_x = center_x - MIN_SIZE // 2
-            end_x = center_x + MIN_SIZE // 2
+    def _add_result(self, result):
+        self.db_data["signs"][result["path"]] = {
+            "name": result["name"],
+            "features": result["features"],
+            "is_one_handed": result["is_one_handed"],
+            "duration": result["duration"],
+            "origin": result["origin"],
+            "scaling_factor": result["scaling_factor"],
+            "processing_time": result["processing_time"]
+        }
+        self.location_index.add(result["path"], result["features"])
         
-        if (end_y - start_y) < MIN_SIZE:
-            center_y = (start_y + end_y) // 2
-            start_y = center_y - MIN_SIZE // 2
-            end_y = center_y + MIN_SIZE // 2
+        self.benchmark_data["processing_times"].append({
+            "sign_name": result["name"],
+            "video_path": result["path"],
+            "processing_time_seconds": result["processing_time"],
+            "video_duration_ms": result["duration"]
+        })
 
-        start_x = max(0, min(start_x, width - MIN_SIZE))
-        start_y = max(0, min(start_y, height - MIN_SIZE))
-        end_x = max(MIN_SIZE, min(end_x, width))
-        end_y = max(MIN_SIZE, min(end_y, height))
+    def _schedule_features(self, entries):
+        """Cost model features and (duration_ms, fps, width, height) per manifest line
 
-        return QPoint(start_x, start_y), QPoint(end_x, end_y)
-
-    def _process_video(self, video_entry):
-        """Process a single video for parallel execution"""
-        parts = [p.strip() for p in video_entry.strip().split(',')]
-        video_path = parts[0]
-        sign_name = parts[1] if len(parts) > 1 else os.path.splitext(os.path.basename(video_path))[0]
-        is_one_handed = True if len(parts) <= 2 else parts[2].lower() == 'true'
-
-        print(f"Processing: {sign_name} from {video_path}")
-
-        if not os.path.exists(video_path):
-            print(f"Video not found: {video_path}")
-            return {"status": "error", "path": video_path, "reason": "not_found"}
-
-        try:
-            video_start_time = time.time()
-
-            # Extract features directly without using GetValues which does comparison
-            features, origin, scaling_factor, duration = self._extract_features_only(
-                video_path, 
-                is_one_handed
-            )
-
-            video_processing_time = time.time() - video_start_time
-            
-            if features is None or not features:
-                print(f"No features extracted for {sign_name}, skipping database entry")
-                return {"status": "error", "path": video_path, "reason": "no_features"}
-            
-            # Return the processed data rather than modifying shared data
-            result = {
-                "status": "processed",
-                "path": video_path,
-                "name": sign_name,
-                "features": features,
-                "is_one_handed": is_one_handed,
-                "duration": duration,
-                "origin": origin,
-                "scaling_factor": scaling_factor,
-                "processing_time": video_processing_time
-            }
-            
-            # Clean up temp files
-            try:
-                base_name = os.path.basename(video_path)
-                name_no_ext, ext = os.path.splitext(base_name)
-                transformed_video = f"{name_no_ext}_transformed{ext}"
-                if os.path.exists(transformed_video):
-                    os.remove(transformed_video)
-            except Exception as cleanup_error:
-                print(f"Error cleaning up transformed video: {str(cleanup_error)}")
-                
-            return result
+        Lines without metadata are probed in parallel.
+        """
+        metadata = [manifest_metadata([p.strip() for p in entry.split(',')]) for entry in entries]
+        missing = [i for i, meta in enumerate(metadata) if meta is None]
+        if missing:
+            print(f"Probing {len(missing)} videos without duration/resolution in the manifest")
+            paths = [entries[i].split(',')[0].strip() for i in missing]
+            for i, info in zip(missing, probe_videos(paths, max(8, self.num_workers))):
+                if info is not None and info[2] > 0:
+                    width, height, fps, frame_count = info
+                    metadata[i] = (frame_count / fps * 1000, fps, width, height)
+        return np.array([CostModel.features(meta) for meta in metadata]), metadata
 
-        except Exception as e:
-            print(f"Error processing {video_path}: {str(e)}")
-            traceback.print_exc()
-            return {"status": "error", "path": video_path, "reason": str(e)}
-
-    def _extract_features_only(self, video_path, is_one_handed):
-        """Extract features from a video without comparing to database"""
-        from faceDetection import detect_face
-        from HandCoordinates import HandCoordinates
-        from hand_processing import extract_hand_image, preprocess_hand_image
-        from LinearInterpolation import InterpolateAndResample
-        import ffmpeg
-        import os
-        import cv2
-        
-        print(f"Extracting features from: {video_path}")
-        
-        # Get video duration
-        duration = self.get_video_duration(video_path)
-        if duration is None:
-            print(f"Could not read video: {video_path}")
-            return None, None, None, None
-            
-        # Calculate ROI
-        start_point, end_point = self.calculate_roi_points(video_path)
-        
-        # Process the video with ffmpeg (optionally with hardware acceleration)
-        baseName = os.path.basename(video_path)
-        fileName_NoExtension, extension = os.path.splitext(baseName)
-        output_fileName = f"{fileName_NoExtension}_transformed{extension}"
-        
-        # Get hardware acceleration option (code from VideoTrimAndCropping.py)
-        def get_hardware_acceleration_option():
-            import platform
-            import subprocess
-            
-            system = platform.system()
-            
-            try:
-                result = subprocess.run(
-                    ["ffmpeg", "-hwaccels"], 
-                    capture_output=True, 
-                    text=True
-                )
-                hwaccels = result.stdout.lower()
-                
-                if "videotoolbox" in hwaccels and system == "Darwin":
-                    return "videotoolbox"
-                elif "cuda" in hwaccels:
-                    return "cuda"
-                elif "qsv" in hwaccels:
-                    return "qsv"
-                elif "vaapi" in hwaccels:
-                    return "vaapi"
-                elif "dxva2" in hwaccels and system == "Windows":
-                    return "dxva2"
-                elif "d3d11va" in hwaccels and system == "Windows":
-                    return "d3d11va"
-                else:
-                    return None
-            except:
-                return None
-                
-        hw_accel = get_hardware_acceleration_option()
-        print(f"Hardware acceleration: {hw_accel if hw_accel else 'Not available'}")
+    def _benchmark_decoders(self, entries, metadata):
+        """Decoder self-benchmark for formats this host has not measured, on one clip per extension and resolution"""
+        representatives = {}
+        for entry, meta in zip(entries, metadata):
+            path = entry.split(',')[0].strip()
+            resolution = meta[2:] if meta is not None else None
+            representatives.setdefault((os.path.splitext(path)[1].lower(), resolution), path)
+        benchmark_new_formats(list(representatives.values()))
 
-        try:
-            # Process with ffmpeg
-            if hw_accel:
-                try:
-                    (
-                        ffmpeg
-                        .input(video_path, hwaccel=hw_accel)
-                        .filter('fps', fps=30)
-                        .output(output_fileName, vsync=0)
-                        .overwrite_output()
-                        .run(quiet=True)
-                    )
-                except Exception as hw_error:
-                    print(f"Hardware acceleration failed: {hw_error}. Falling back to CPU processing.")
-                    (
-                        ffmpeg
-                        .input(video_path)
-                        .filter('fps', fps=30)
-                        .output(output_fileName, vsync=0, threads=8)
-                        .overwrite_output()
-                        .run(quiet=True)
-                    )
-            else:
-                (
-                    ffmpeg
-                    .input(video_path)
-                    .filter('fps', fps=30)
-                    .output(output_fileName, vsync=0, threads=8)
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-                
-            # Detect face for normalization
-            origin, scaling_factor, _ = detect_face(output_fileName)
-            if origin is None or scaling_factor is None:
-                print("Face detection failed, using default normalization parameters")
-                cap = cv2.VideoCapture(output_fileName)
-                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                cap.release()
-                origin = (width/2, height/2)
-                scaling_factor = 1.0/height
-                
-            print(f"Using normalization - Origin: {origin}, Scaling: {scaling_factor}")
-            
-            # Extract hand coordinates
-            (centroids_dom_arr,
-             centroids_nondom_arr,
-             hand_boxes_dom,
-             hand_boxes_nondom,
-             _,  # origin is already set
-             l_delta_arr,
-             orientation_dom_arr,
-             orientation_nondom_arr,
-             orientation_delta_arr) = HandCoordinates(output_fileName, origin, scaling_factor, is_one_handed)
-            
-            if centroids_dom_arr.size == 0 or len(hand_boxes_dom) == 0:
-                print("No hand coordinates detected")
-                return None, None, None, None
-                
-            # Extract hand images from first and last frame
-            cap = cv2.VideoCapture(output_fileName)
-            ret, first_frame = cap.read()
-            if not ret:
-                print("Failed to read first frame")
-                return None, None, None, None
-                
-            last_frame = first_frame.copy()
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            if frame_count > 1:
-                safe_last_frame_pos = max(0, min(frame_count - 2, frame_count - 1))
-                cap.set(cv2.CAP_PROP_POS_FRAMES, safe_last_frame_pos)
-                ret, potential_last_frame = cap.read()
-                if ret:
-                    last_frame = potential_last_frame
-            cap.release()
-            
-            # Process hand images
-            dom_start_img = extract_hand_image(first_frame, hand_boxes_dom[0])
-            dom_end_img = extract_hand_image(last_frame, hand_boxes_dom[-1])
-            
-            H_d_s = preprocess_hand_image(dom_start_img)
-            H_d_e = preprocess_hand_image(dom_end_img)
-            
-            # Interpolate to standardize feature length
-            TARGET_FRAMES = 20
-            Interpolated_Dominant_Hand = InterpolateAndResample(centroids_dom_arr, TARGET_FRAMES)
-            Interpolated_nonDominant_Hand = InterpolateAndResample(centroids_nondom_arr, TARGET_FRAMES)
-            Interpolated_l_Delta = InterpolateAndResample(l_delta_arr, TARGET_FRAMES)
-            Interpolated_orient_dom = InterpolateAndResample(orientation_dom_arr, TARGET_FRAMES)
-            Interpolated_orient_nondom = InterpolateAndResample(orientation_nondom_arr, TARGET_FRAMES)
-            Interpolated_orient_delta = InterpolateAndResample(orientation_delta_arr, TARGET_FRAMES)
-            
-            # Create features dictionary
-            processed_features = {
-                'centroids_dom_arr': Interpolated_Dominant_Hand.tolist(),
-                'centroids_nondom_arr': Interpolated_nonDominant_Hand.tolist(),
-                'l_delta_arr': Interpolated_l_Delta.tolist(),
-                'orientation_dom_arr': Interpolated_orient_dom.tolist(),
-                'orientation_nondom_arr': Interpolated_orient_nondom.tolist(),
-                'orientation_delta_arr': Interpolated_orient_delta.tolist(),
-                'H_d_s': H_d_s.tolist() if isinstance(H_d_s, np.ndarray) else H_d_s,
-                'H_d_e': H_d_e.tolist() if isinstance(H_d_e, np.ndarray) else H_d_e,
-                'is_one_handed': is_one_handed,
-                'frame_count': TARGET_FRAMES
-            }
-            
-            # Add non-dominant hand features if applicable
-            if not is_one_handed and len(hand_boxes_nondom) > 0:
-                nondom_start_img = extract_hand_image(first_frame, hand_boxes_nondom[0])
-                nondom_end_img = extract_hand_image(last_frame, hand_boxes_nondom[-1])
-                
-                H_nd_s = preprocess_hand_image(nondom_start_img)
-                H_nd_e = preprocess_hand_image(nondom_end_img)
-                
-                processed_features.update({
-                    'H_nd_s': H_nd_s.tolist() if isinstance(H_nd_s, np.ndarray) else H_nd_s,
-                    'H_nd_e': H_nd_e.tolist() if isinstance(H_nd_e, np.ndarray) else H_nd_e
-                })
-                
-            return processed_features, origin, scaling_factor, duration
-            
-        except Exception as e:
-            print(f"Error in feature extraction: {str(e)}")
-            traceback.print_exc()
-            return None, None, None, None
-            
     def process_videos(self, video_list_file):
         """Process videos in parallel using worker processes"""
         if not os.path.exists(video_list_file):
@@ -438,61 +459,90 @@ class DatabasePopulator:
             
         print(f"Processing {len(to_process)} videos ({skipped_count} already in database)")
         
-        # Process in batches
         processed_count = 0
         error_count = 0
+        unsaved_count = 0
         overall_start_time = time.time()
         
-        # Process videos in batches using ProcessPoolExecutor
-        for batch_start in range(0, len(to_process), self.batch_size):
-            batch_end = min(batch_start + self.batch_size, len(to_process))
-            batch = to_process[batch_start:batch_end]
-            
-            print(f"\n--- Processing batch {batch_start//self.batch_size + 1} ({len(batch)} videos) ---")
-            
-            batch_results = []
-            with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
-                futures = {executor.submit(self._process_video, entry): entry for entry in batch}
-                
-                for future in as_completed(futures):
-                    entry = futures[future]
-                    try:
-                        result = future.result()
-                        if result["status"] == "processed":
-                            batch_results.append(result)
-                            processed_count += 1
-                            print(f"Successfully processed: {result['name']} ({processed_count}/{len(to_process)})")
-                        else:
-                            error_count += 1
-                            print(f"Error processing: {entry.strip()} - {result.get('reason', 'unknown error')}")
-                    except Exception as e:
-                        error_count += 1
-                        print(f"Exception in worker for {entry.strip()}: {str(e)}")
+        # Longest processing time first from the cost model, so long clips do not end up alone at the end
+        features, metadata = self._schedule_features(to_process)
+        # Before the pool starts, so every worker reads the measured backend order
+        self._benchmark_decoders(to_process, metadata)
+        cost_model = CostModel()
+        pending = list(range(len(to_process)))
+        
+        def submit_order():
+            # Re-ranked whenever the model changes; popped from the end
+            estimates = cost_model.estimate(features[pending])
+            pending[:] = [pending[i] for i in np.argsort(estimates, kind='stable')]
+        
+        submit_order()
+        estimated_total = cost_model.estimate(features).sum()
+        print(f"Estimated {estimated_total:.0f}s of work, longest video {cost_model.estimate(features).max():.1f}s")
+        
+        # One pool for the whole run, so each worker loads its models once. Tasks are fed as
+        # workers free up and results are added as they arrive, with a save every batch_size results.
+        # Each task in flight has its own shared memory slot for the feature arrays
+        max_in_flight = self.num_workers * (1 + TASKS_PER_WORKER)
+        slots = ResultSlots(min(max_in_flight, len(to_process)))
+        in_flight = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self.num_workers, initializer=init_populator_worker) as executor:
+                def submit_next():
+                    if pending:
+                        index = pending.pop()
+                        slot_name = slots.acquire()
+                        in_flight[executor.submit(_process_video, to_process[index], slot_name)] = (index, slot_name)
             
-            # Update database with batch results
-            for result in batch_results:
-                self.db_data["signs"][result["path"]] = {
-                    "name": result["name"],
-                    "features": result["features"],
-                    "is_one_handed": result["is_one_handed"],
-                    "duration": result["duration"],
-                    "origin": result["origin"],
-                    "scaling_factor": result["scaling_factor"],
-                    "processing_time": result["processing_time"]
-                }
-                
-                self.benchmark_data["processing_times"].append({
-                    "sign_name": result["name"],
-                    "video_path": result["path"],
-                    "processing_time_seconds": result["processing_time"],
-                    "video_duration_ms": result["duration"]
-                })
+                for _ in range(max_in_flight):
+                    submit_next()
             
-            # Save after each batch
-            if batch_results:
-                self._save_db()
+                try:
+                    while in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            index, slot_name = in_flight.pop(future)
+                            entry = to_process[index]
+                            try:
+                                result = future.result()
+                                if result["status"] == "processed":
+                                    result["features"] = _unpack_features(result["features"], slots, slot_name)
+                            except Exception as e:
+                                error_count += 1
+                                print(f"Exception in worker for {entry.strip()}: {str(e)}")
+                                continue
+                            finally:
+                                slots.release(slot_name)
+                                submit_next()
+                        
+                            if result["status"] == "processed":
+                                cost_model.update(features[index], result["processing_time"])
+                                submit_order()
+                                self._add_result(result)
+                                processed_count += 1
+                                unsaved_count += 1
+                                print(f"Successfully processed: {result['name']} ({processed_count}/{len(to_process)})")
+                            else:
+                                error_count += 1
+                                print(f"Error processing: {entry.strip()} - {result.get('reason', 'unknown error')}")
+                    
+                        if unsaved_count >= self.batch_size:
+                            self._save_db()
+                            unsaved_count = 0
+                except BaseException:
+                    # Keep what finished if the run is interrupted
+                    for future in in_flight:
+                        future.cancel()
+                    if unsaved_count:
+                        self._save_db()
+                    raise
+        finally:
+            # Workers have exited once the pool is shut down
+            slots.close()
         
         overall_time = time.time() - overall_start_time
+        print(f"Cost model (overhead s, s per video second, s per frame megapixel): "
+              f"{', '.join(f'{c:.4f}' for c in cost_model.coef)}")
         
         self.benchmark_data["summary"] = {
             "total_videos": total_videos,
@@ -528,7 +578,7 @@ def main():
     parser.add_argument('--workers', type=int, default=None,
                       help='Number of worker processes (default: CPU count - 1)')
     parser.add_argument('--batch_size', type=int, default=5,
-                      help='Batch size for processing (default: 5)')
+                      help='Processed videos between database saves (default: 5)')
     
     args = parser.parse_args()
     
@@ -546,7 +596,7 @@ def main():
     print(f"  JSON files: {'Disabled' if args.no_json else 'Enabled'}")
     print(f"  Video list: {args.video_list}")
     print(f"  Worker processes: {populator.num_workers}")
-    print(f"  Batch size: {args.batch_size}")
+    print(f"  Save every: {args.batch_size} videos")
     
     populator.process_videos(args.video_list)
 
@@ -5,6 +5,7 @@ from VideoTrimAndCropping import GetValues
 from PyQt6.QtCore import QPoint
 import cv2
 import numpy as np
+from sign_index import build_location_index, save_location_index
 
 class DatabasePopulator:
     def __init__(self, db_dir="sign_database", db_file="sign_data.db", json_backup=True, max_signs=None):
@@ -68,6 +69,9 @@ class DatabasePopulator:
             print(f"Saving DB data to: {self.db_file}")
             with open(self.db_file, 'w') as f:
                 json.dump({"signs": json_safe_data}, f, indent=4)
+
+            # Inverted index from quantized start/end hand location to signs, for candidate filtering
+            save_location_index(build_location_index(json_safe_data), self.db_dir)
                 
             if self.benchmark_data["processing_times"]:
                 print(f"Saving benchmark data to: {self.benchmark_file}")
@@ -142,7 +146,7 @@ class DatabasePopulator:
         from faceDetection import detect_face
         from HandCoordinates import HandCoordinates
         from hand_processing import extract_hand_image, preprocess_hand_image
-        from LinearInterpolation import InterpolateAndResample
+        from LinearInterpolation import InterpolateAndResample, ResamplePyramid
         import os
         import cv2
         
@@ -229,7 +233,10 @@ class DatabasePopulator:
             'H_d_s': H_d_s,
             'H_d_e': H_d_e,
             'is_one_handed': is_one_handed,
-            'frame_count': TARGET_FRAMES
+            'frame_count': TARGET_FRAMES,
+            'centroids_dom_pyramid': {
+                size: arr.tolist() for size, arr in ResamplePyramid(centroids_dom_arr).items()
+            }
         }
         
         # Add non-dominant hand features if applicable
@@ -254,6 +261,10 @@ class DatabasePopulator:
 
         with open(video_list_file, 'r') as f:
             video_entries = f.readlines()
+
+        # Filter out empty lines and comments (generate_video_list.py writes a '#' header)
+        video_entries = [entry.strip() for entry in video_entries
+                        if entry.strip() and not entry.strip().startswith('#')]
             
         if self.max_signs is not None:
             print(f"Limiting processing to {self.max_signs} signs as requested")
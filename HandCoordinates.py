@@ -2,8 +2,25 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import os
+import threading
+from faceDetection import find_face_mediapipe
+
+
+def _empty_result(origin):
+    empty = np.array([])
+    return empty, empty, empty, empty, origin, empty, empty, empty, empty
+
+
+_acceleration_checked = False
+
+
+def _enable_acceleration():
+    """OpenCL/CUDA setup, done once per process"""
+    global _acceleration_checked
+    if _acceleration_checked:
+        return
+    _acceleration_checked = True
 
-def HandCoordinates(videoDir, origin, scaling_factor, isOneHanded):
     # Enable OpenCL acceleration in OpenCV if available (helps on many platforms)
     try:
         if hasattr(cv2, 'ocl'):
@@ -12,18 +29,7 @@ def HandCoordinates(videoDir, origin, scaling_factor, isOneHanded):
     except Exception as e:
         print(f"Warning: Failed to enable OpenCL: {e}")
 
-    # Configure MediaPipe to use GPU when available
-    # Lower model_complexity for better performance on CPU
-    mp_hands = mp.solutions.hands.Hands(
-        static_image_mode=False,
-        max_num_hands=2,
-        min_detection_confidence=0.3,
-        min_tracking_confidence=0.3,
-        model_complexity=0  # Use 0 for better performance on CPU
-    )
-    
     # Safely check CUDA availability
-    cuda_enabled = False
     try:
         cuda_enabled = hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
         if cuda_enabled:
@@ -38,174 +44,460 @@ def HandCoordinates(videoDir, origin, scaling_factor, isOneHanded):
             print("CUDA not available or not enabled in OpenCV")
     except Exception as e:
         print(f"Could not check CUDA availability: {e}")
-    
-    cap = cv2.VideoCapture(videoDir)
-    if not cap.isOpened():
-        print(f"Error: Could not open video at {videoDir}")
-        empty = np.array([])
-        return empty, empty, empty, empty, origin, empty, empty, empty, empty
-
-    # Get reported properties (these might be inaccurate)
-    reported_frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    reported_fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    print(f"Reported video properties: {width}x{height}, {reported_fps} fps, {reported_frame_count} frames")
-    
-    # Try to set hardware acceleration - safely handle if not available
-    try:
-        cap.set(cv2.CAP_PROP_HW_ACCELERATION, 1)  # Enable hardware acceleration
-    except:
-        print("Hardware acceleration not supported for video capture")
-    
-    centroids_dom = []
-    centroids_nondom = []
-    bboxes_dom = []
-    bboxes_nondom = []
-    l_delta = []
-    
-    found_hand = False
-    frame_count = 0
-    
-    # Pre-allocate buffers for better performance
-    frame_rgb = np.zeros((height, width, 3), dtype=np.uint8)
-    
-    # Increase buffer size for better throughput
-    try:
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 10)
-    except:
-        print("Failed to set buffer size")
-    
-    # Force reading all frames regardless of reported count
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        frame_count += 1
-        if frame_count % 20 == 0:  # Report progress less frequently
-            print(f"Processing frame {frame_count}/{reported_frame_count}")
-        
-        # Convert BGR to RGB directly on the array without copying
-        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame_rgb)
-        
-        # Process with MediaPipe
-        results = mp_hands.process(frame_rgb)
 
-        frame_centroids_dom = None
-        frame_centroids_nondom = None
-        frame_bbox_dom = None
-        frame_bbox_nondom = None
 
+def _create_hands_model(static_image_mode=False):
+    # Configure MediaPipe to use GPU when available
+    # Lower model_complexity for better performance on CPU
+    return mp.solutions.hands.Hands(
+        static_image_mode=static_image_mode,
+        max_num_hands=2,
+        min_detection_confidence=0.3,
+        min_tracking_confidence=0.3,
+        model_complexity=0  # Use 0 for better performance on CPU
+    )
+
+
+class HandModelPool:
+    """Per-process pool of MediaPipe Hands models, reused across clips instead of reloaded
+
+    A model is reset between clips so no tracking state leaks from one clip into the
+    next. On MediaPipe versions without reset() the model is closed instead.
+    static_image_mode pools models that detect every frame on its own, for frames
+    tracked out of order.
+    """
+
+    def __init__(self, static_image_mode=False):
+        self.static_image_mode = static_image_mode
+        self._lock = threading.Lock()
+        self._free = []
+        self.created = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            self.created += 1
+            created = self.created
+        _enable_acceleration()
+        mode = "static image" if self.static_image_mode else "video"
+        print(f"Loading MediaPipe Hands {mode} model ({created} in this process)")
+        return _create_hands_model(self.static_image_mode)
+
+    def release(self, model):
+        if hasattr(model, 'reset'):
+            try:
+                model.reset()
+                with self._lock:
+                    self._free.append(model)
+                return
+            except Exception as e:
+                print(f"Could not reset hand model, discarding it: {e}")
+        model.close()
+
+
+_model_pool = HandModelPool()
+_static_model_pool = HandModelPool(static_image_mode=True)
+
+
+def init_tracking_worker():
+    """ProcessPoolExecutor initializer: load the hand model once per worker process"""
+    _model_pool.release(_model_pool.acquire())
+
+
+def compute_orientation(coords_arr):
+    """Unit vector from the previous to the next point at every frame (NaN where there is no motion)"""
+    coords_arr = np.asarray(coords_arr, dtype=np.float32)
+    length = len(coords_arr)
+
+    if length <= 1:
+        return np.array([[0, 0]] * length, dtype=np.float32)
+
+    # Central differences, one-sided at the ends, on the float32 coordinates
+    i_prev = np.maximum(np.arange(length) - 1, 0)
+    i_next = np.minimum(np.arange(length) + 1, length - 1)
+    dx = coords_arr[i_next, 0] - coords_arr[i_prev, 0]
+    dy = coords_arr[i_next, 1] - coords_arr[i_prev, 1]
+    norm = np.sqrt(dx*dx + dy*dy)
+
+    invalid = np.isnan(norm) | (norm < 1e-9)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        orientation = np.stack([dx / norm, dy / norm], axis=1)
+    orientation[invalid] = np.nan
+    return orientation.astype(np.float32)
+
+
+# Padding (pixels) added around the landmarks to form a hand box
+BOX_PADDING = 20
+NUM_LANDMARKS = 21
+DEFAULT_BOX = (0, 0, 100, 100)
+
+
+def landmark_geometry(landmarks, width, height, padding=BOX_PADDING):
+    """Centroids (..., 2) and padded boxes (..., 4) in pixels from normalized (..., 21, 2) landmarks
+
+    Boxes are (x, y, w, h) truncated to whole pixels but returned as floats, so missing
+    hands (NaN landmarks) stay NaN.
+    """
+    x = landmarks[..., 0] * width
+    y = landmarks[..., 1] * height
+    centroids = np.stack([x.mean(axis=-1), y.mean(axis=-1)], axis=-1)
+
+    x_min = np.maximum(0, x.min(axis=-1) - padding)
+    y_min = np.maximum(0, y.min(axis=-1) - padding)
+    x_max = np.minimum(width, x.max(axis=-1) + padding)
+    y_max = np.minimum(height, y.max(axis=-1) + padding)
+    boxes = np.trunc(np.stack([x_min, y_min, x_max - x_min, y_max - y_min], axis=-1))
+    return centroids, boxes
+
+
+def fill_skipped(values, tracked):
+    """Linearly interpolate untracked frames from the tracked frames on either side
+
+    values is (frames, ...); a result is NaN wherever either neighbour is NaN. Frames
+    before the first or after the last tracked frame are left as they are.
+    """
+    indices = np.arange(len(values))
+    tracked_indices = indices[tracked]
+    if len(tracked_indices) == 0 or tracked.all():
+        return values
+    skipped = indices[~tracked & (indices > tracked_indices[0]) & (indices < tracked_indices[-1])]
+    if len(skipped) == 0:
+        return values
+
+    right = tracked_indices[np.searchsorted(tracked_indices, skipped)]
+    left = tracked_indices[np.searchsorted(tracked_indices, skipped) - 1]
+    t = ((skipped - left) / (right - left)).reshape((-1,) + (1,) * (values.ndim - 1))
+    values = values.copy()
+    values[skipped] = values[left] + (values[right] - values[left]) * t
+    return values
+
+
+# Sparse sampling: tracked samples per output trajectory frame (InterpolateAndResample's 20),
+# and the displacement between consecutive samples, in hand-box sizes, that triggers tracking
+# the skipped frames in between
+TRAJECTORY_FRAMES = 20
+SAMPLES_PER_OUTPUT_FRAME = 2
+DENSIFY_MOTION = 0.5
+
+
+# Motion gate: frames are compared with the last frame the model ran on, downscaled and in
+# grayscale, inside the last known hand boxes grown by MOTION_GATE_MARGIN box sizes. A mean absolute
+# difference below MOTION_GATE_THRESHOLD (0-255 gray levels) reuses the previous landmarks, for at
+# most MOTION_GATE_MAX_REUSE frames in a row
+MOTION_GATE_SCALE = 0.25
+MOTION_GATE_MARGIN = 0.5
+MOTION_GATE_THRESHOLD = 2.0
+MOTION_GATE_MAX_REUSE = 15
+
+
+# Tracking widths worth trying (see benchmark_tracking.py); landmarks come back normalized,
+# so tracking on a downscaled frame still yields source-pixel centroids and boxes
+TRACKING_LADDER = (960, 640, 480, 320)
+
+
+def choose_stride(expected_frames, target_frames=TRAJECTORY_FRAMES, samples_per_output_frame=SAMPLES_PER_OUTPUT_FRAME):
+    """Frame stride that still leaves samples_per_output_frame tracked frames per resampled frame"""
+    if not expected_frames:
+        return 1
+    return max(1, int(expected_frames // (target_frames * samples_per_output_frame)))
+
+
+class HandTracker:
+    """Incremental hand tracking: feed frames one at a time, normalize once the face is known
+
+    Normalized landmarks are written into a preallocated (frames, hands, 21, 2) array
+    (hand 0 dominant, hand 1 non-dominant, NaN when absent); centroids, boxes, deltas and
+    orientations are computed from it in one go by finish(), once the face origin/scale
+    is known. With stride > 1 (or 'auto') only every stride-th frame is tracked; skipped
+    frames are tracked after all when the hands moved a lot between samples, and
+    interpolated otherwise. With motion_gate, frames where nothing moved around the hands
+    reuse the previous landmarks instead of running the model. With tracking_width, frames
+    wider than that are downscaled before inference; results are still reported in
+    source-frame pixels, so hand crops can be cut from the full frame. With face_frames > 0
+    MediaPipe face detection also runs on the model input of the first face_frames frames,
+    and face_box() gives the median box, so face normalization needs no separate detector.
+    """
+
+    def __init__(self, isOneHanded, expected_frames=None, stride=1, motion_gate=False, tracking_width=None,
+                 face_frames=0):
+        self.mp_hands = _model_pool.acquire()
+        # Static image model for densified frames, acquired on first use
+        self.mp_hands_static = None
+        self.isOneHanded = isOneHanded
+        self.expected_frames = expected_frames
+        self.stride = choose_stride(expected_frames) if stride == 'auto' else max(1, int(stride or 1))
+        capacity = max(16, int(expected_frames or 0) + 1)
+        self.landmarks = np.full((capacity, 2, NUM_LANDMARKS, 2), np.nan)
+        self.tracked = np.zeros(capacity, dtype=bool)
+        self.frame_size = None
+        self.pending = []
+        self.last_sample = None
+        self.found_hand = False
+        self.frame_count = 0
+        self.inference_count = 0
+        self.densified_count = 0
+        self.frame_rgb = None
+        self.motion_gate = motion_gate
+        self.tracking_width = tracking_width
+        self.gate_reference = None
+        self.last_landmarks = None
+        self.reused = 0
+        self.gated_count = 0
+        self.detected_count = None
+        self.face_frames = face_frames
+        self.face_boxes = []
+
+    def _geometry(self, landmarks):
+        height, width = self.frame_size
+        return landmark_geometry(landmarks, width, height)
+
+    def _gate_region(self, shape):
+        """Slice of the downscaled frame around the last known hands (whole frame if none)"""
+        height, width = shape
+        _, boxes = self._geometry(self.last_landmarks)
+        boxes = boxes[~np.isnan(boxes[:, 0])]
+        if len(boxes) == 0:
+            return slice(None), slice(None)
+        x_min = np.min(boxes[:, 0] - MOTION_GATE_MARGIN * boxes[:, 2]) * MOTION_GATE_SCALE
+        y_min = np.min(boxes[:, 1] - MOTION_GATE_MARGIN * boxes[:, 3]) * MOTION_GATE_SCALE
+        x_max = np.max(boxes[:, 0] + (1 + MOTION_GATE_MARGIN) * boxes[:, 2]) * MOTION_GATE_SCALE
+        y_max = np.max(boxes[:, 1] + (1 + MOTION_GATE_MARGIN) * boxes[:, 3]) * MOTION_GATE_SCALE
+        x_min, y_min = max(0, int(x_min)), max(0, int(y_min))
+        x_max, y_max = min(width, int(np.ceil(x_max))), min(height, int(np.ceil(y_max)))
+        if x_max <= x_min or y_max <= y_min:
+            return slice(None), slice(None)
+        return slice(y_min, y_max), slice(x_min, x_max)
+
+    def _is_static(self, frame):
+        """Cheap frame-difference check; returns (downscaled gray frame, static?)"""
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), None,
+                           fx=MOTION_GATE_SCALE, fy=MOTION_GATE_SCALE, interpolation=cv2.INTER_AREA)
+        if self.gate_reference is None or self.gate_reference.shape != small.shape or \
+                self.last_landmarks is None or self.reused >= MOTION_GATE_MAX_REUSE:
+            return small, False
+        rows, cols = self._gate_region(small.shape)
+        difference = cv2.absdiff(small[rows, cols], self.gate_reference[rows, cols]).mean()
+        return small, difference < MOTION_GATE_THRESHOLD
+
+    def input_shape(self, frame_shape):
+        """Shape of the model input prepare_input() produces for a frame of frame_shape"""
+        height, width = frame_shape[:2]
+        if self.tracking_width and width > self.tracking_width:
+            return max(1, int(round(height * self.tracking_width / width))), self.tracking_width, 3
+        return height, width, 3
+
+    def prepare_input(self, frame, out=None):
+        """Downscale (tracking_width) and convert BGR to RGB: the model input for frame
+
+        Independent of tracking state, so it can run ahead on another thread.
+        """
+        height, width = frame.shape[:2]
+        if self.tracking_width and width > self.tracking_width:
+            target_height, target_width = self.input_shape(frame.shape)[:2]
+            frame = cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA)
+
+        if out is None or out.shape != frame.shape:
+            out = np.empty(frame.shape, dtype=np.uint8)
+        # Convert BGR to RGB directly into the output buffer without copying
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+        return out
+
+    def _track(self, index, frame, model_input=None, model=None):
+        """Run the hand model on one frame (or reuse the last result if gated) into landmarks[index]
+
+        A model passed in (the static image model for densified frames) leaves the video model,
+        the motion gate and last_landmarks untouched, since those frames come out of order.
+        """
+        self.tracked[index] = True
+        out_of_order = model is not None
+        if self.motion_gate and not out_of_order:
+            small, static = self._is_static(frame)
+            if static:
+                self.gated_count += 1
+                self.reused += 1
+                self.landmarks[index] = self.last_landmarks
+                return
+            self.gate_reference = small
+            self.reused = 0
+
+        if model_input is None:
+            # Reuse one RGB buffer per clip for better performance
+            self.frame_rgb = self.prepare_input(frame, self.frame_rgb)
+            model_input = self.frame_rgb
+
+        # Process with MediaPipe
+        results = (model if out_of_order else self.mp_hands).process(model_input)
+        self.inference_count += 1
+
+        hands = self.landmarks[index]
+        hands[:] = np.nan
         if results.multi_hand_landmarks:
-            hand_data = []
-            for hand_landmarks in results.multi_hand_landmarks:
-                x_coords = [lm.x * width for lm in hand_landmarks.landmark]
-                y_coords = [lm.y * height for lm in hand_landmarks.landmark]
-                cx = np.mean(x_coords)
-                cy = np.mean(y_coords)
-                
-                x_min, x_max = min(x_coords), max(x_coords)
-                y_min, y_max = min(y_coords), max(y_coords)
-                
-                padding = 20
-                x_min = max(0, x_min - padding)
-                y_min = max(0, y_min - padding)
-                x_max = min(width, x_max + padding)
-                y_max = min(height, y_max + padding)
-                
-                norm_cx = (cx - origin[0]) * scaling_factor
-                norm_cy = (cy - origin[1]) * scaling_factor
-                
-                hand_data.append({
-                    'centroid': (norm_cx, norm_cy),
-                    'bbox': (int(x_min), int(y_min), 
-                            int(x_max - x_min), int(y_max - y_min)),
-                    'raw_x': cx
-                })
-            
-            if hand_data:
-                hand_data.sort(key=lambda x: x['raw_x'], reverse=True)
-                
-                if len(hand_data) >= 1:
-                    frame_centroids_dom = hand_data[0]['centroid']
-                    frame_bbox_dom = hand_data[0]['bbox']
-                    found_hand = True 
-                    
-                    if len(hand_data) >= 2 and not isOneHanded:
-                        frame_centroids_nondom = hand_data[1]['centroid']
-                        frame_bbox_nondom = hand_data[1]['bbox']
-
-        if frame_centroids_dom:
-            centroids_dom.append(frame_centroids_dom)
-            bboxes_dom.append(frame_bbox_dom)
-        else:
-            centroids_dom.append((np.nan, np.nan))
-            bboxes_dom.append((0, 0, 100, 100))
-        
-        if isOneHanded:
-            centroids_nondom.append((np.nan, np.nan))
-            bboxes_nondom.append((0, 0, 100, 100))
-            l_delta.append((np.nan, np.nan))
+            detected = results.multi_hand_landmarks[:2]
+            for slot, hand_landmarks in enumerate(detected):
+                hands[slot] = [(lm.x, lm.y) for lm in hand_landmarks.landmark]
+
+            # Dominant hand is the right-most one in the image
+            if len(detected) == 2:
+                centroids, _ = self._geometry(hands)
+                if centroids[1, 0] > centroids[0, 0]:
+                    hands[[0, 1]] = hands[[1, 0]]
+                if self.isOneHanded:
+                    hands[1] = np.nan
+            self.found_hand = True
+
+        if not out_of_order:
+            self.last_landmarks = hands.copy()
+
+    def _moved(self, previous, current):
+        """Whether the hands moved (or appeared/disappeared) enough between samples to densify"""
+        centroids, boxes = self._geometry(self.landmarks[[previous, current]])
+        for hand in range(2):
+            a, b = centroids[0, hand], centroids[1, hand]
+            if np.isnan(a[0]) != np.isnan(b[0]):
+                return True
+            if np.isnan(a[0]):
+                continue
+            size = max(boxes[0, hand, 2], boxes[0, hand, 3], 1)
+            if np.hypot(b[0] - a[0], b[1] - a[1]) > DENSIFY_MOTION * size:
+                return True
+        return False
+
+    def _sample(self, index, frame, model_input=None):
+        self._track(index, frame, model_input)
+        if self.pending and self.last_sample is not None and self._moved(self.last_sample, index):
+            # Fast motion: the skipped frames carry information, track them too. The video model
+            # has already seen the later sample, so they go through a static image model
+            if self.mp_hands_static is None:
+                self.mp_hands_static = _static_model_pool.acquire()
+            for pending_index, pending_frame in self.pending:
+                self._track(pending_index, pending_frame, model=self.mp_hands_static)
+            self.densified_count += len(self.pending)
+        self.pending = []
+        self.last_sample = index
+
+    def process_frame(self, frame, model_input=None):
+        """Track one frame; model_input is an optional prepare_input(frame) result computed ahead of time"""
+        index = self.frame_count
+        self.frame_count += 1
+        if self.frame_count % 20 == 0:  # Report progress less frequently
+            print(f"Processing frame {self.frame_count}/{self.expected_frames}")
+
+        if self.frame_size is None:
+            self.frame_size = frame.shape[:2]
+        if index >= len(self.landmarks):
+            # More frames than expected: grow the preallocated arrays
+            grow = len(self.landmarks)
+            self.landmarks = np.concatenate([self.landmarks, np.full((grow, 2, NUM_LANDMARKS, 2), np.nan)])
+            self.tracked = np.concatenate([self.tracked, np.zeros(grow, dtype=bool)])
+
+        if index < self.face_frames:
+            if model_input is None:
+                self.frame_rgb = self.prepare_input(frame, self.frame_rgb)
+                model_input = self.frame_rgb
+            height, width = self.frame_size
+            box = find_face_mediapipe(model_input, width, height)
+            if box is not None:
+                self.face_boxes.append(box)
+
+        if self.stride <= 1 or index % self.stride == 0:
+            self._sample(index, frame, model_input)
         else:
-            if frame_centroids_nondom:
-                centroids_nondom.append(frame_centroids_nondom)
-                bboxes_nondom.append(frame_bbox_nondom)
-
-                delta = (
-                    frame_centroids_dom[0] - frame_centroids_nondom[0],
-                    frame_centroids_dom[1] - frame_centroids_nondom[1]
-                )
-                l_delta.append(delta)
-            else:
-                centroids_nondom.append((np.nan, np.nan))
-                bboxes_nondom.append((0, 0, 100, 100))
-                l_delta.append((np.nan, np.nan))
-
-    cap.release()
-    mp_hands.close()
-
-    print(f"Actually processed {frame_count} frames (reported: {reported_frame_count})")
-    print(f"Found hands in at least one frame: {found_hand}")
-    
-    if frame_count <= 1:
+            # Keep a copy: the decoder may reuse its buffers
+            self.pending.append((index, frame.copy()))
+
+    def face_box(self):
+        """Median face box (x, y, w, h) in source-frame pixels over the first face_frames frames, or None"""
+        if not self.face_boxes:
+            return None
+        return tuple(float(v) for v in np.median(np.array(self.face_boxes), axis=0))
+
+    def stats(self):
+        """Per-clip counters: frames seen and how many of them went through the hand model"""
+        detected = self.detected_count
+        if detected is None:
+            tracked = self.tracked[:self.frame_count]
+            detected = int(np.sum(tracked & ~np.isnan(self.landmarks[:self.frame_count, 0, 0, 0])))
+        return {
+            "frames": self.frame_count,
+            "inferences": self.inference_count,
+            "densified": self.densified_count,
+            "gated": self.gated_count,
+            "detected": detected,
+            "stride": self.stride,
+            "tracking_width": self.tracking_width,
+            "face_detections": len(self.face_boxes)
+        }
+
+    def close(self):
+        """Hand the models back to their pools; safe to call more than once"""
+        if self.mp_hands is not None:
+            _model_pool.release(self.mp_hands)
+            self.mp_hands = None
+        if self.mp_hands_static is not None:
+            _static_model_pool.release(self.mp_hands_static)
+            self.mp_hands_static = None
+
+    def flush(self):
+        """Track any frames still pending and release the model; landmarks are final afterwards"""
+        # Always track the last frame, so the end hand crop and trajectory end are real
+        if self.pending:
+            last_index, last_frame = self.pending.pop()
+            self._sample(last_index, last_frame)
+        self.close()
+
+    def finish(self, origin, scaling_factor):
+        """Normalize the tracked centroids and return the HandCoordinates tuple"""
+        self.flush()
+
+        print(f"Actually processed {self.frame_count} frames (reported: {self.expected_frames})")
+        if self.stride > 1:
+            print(f"Sparse tracking: stride {self.stride}, hand model ran on {self.inference_count}/{self.frame_count} frames "
+                  f"({self.densified_count} densified)")
+        if self.motion_gate:
+            print(f"Motion gate: reused landmarks on {self.gated_count}/{self.frame_count} frames")
+        print(f"Found hands in at least one frame: {self.found_hand}")
+
+        result, self.detected_count = hand_features(self.landmarks[:self.frame_count], self.tracked[:self.frame_count],
+                                                    self.frame_size, self.isOneHanded, origin, scaling_factor)
+        return result
+
+
+def hand_features(landmarks, tracked, frame_size, isOneHanded, origin, scaling_factor):
+    """HandCoordinates tuple from normalized (frames, 2, 21, 2) landmarks, plus the detected frame count
+
+    tracked marks the frames that were tracked (or gated); the others are interpolated.
+    """
+    count = len(landmarks)
+    if count <= 1:
         print("ERROR: Only processed one frame! The video might be corrupted.")
-        empty = np.array([])
-        return empty, empty, empty, empty, origin, empty, empty, empty, empty
-
-    centroids_dom_arr = np.array(centroids_dom, dtype=np.float32)
-    centroids_nondom_arr = np.array(centroids_nondom, dtype=np.float32)
-    bboxes_dom_arr = np.array(bboxes_dom, dtype=np.int32)
-    bboxes_nondom_arr = np.array(bboxes_nondom, dtype=np.int32)
-    l_delta_arr = np.array(l_delta, dtype=np.float32)
-
-    def compute_orientation(coords_arr):
-        orientation_list = []
-        length = len(coords_arr)
-        
-        if length <= 1:
-            return np.array([[0, 0]] * length, dtype=np.float32)
-        
-        for i in range(length):
-            i_prev = max(0, i-1)
-            i_next = min(length-1, i+1)
-            
-            dx = coords_arr[i_next,0] - coords_arr[i_prev,0]
-            dy = coords_arr[i_next,1] - coords_arr[i_prev,1]
-            norm = np.sqrt(dx*dx + dy*dy)
-            
-            if norm < 1e-9 or np.isnan(norm):
-                orientation_list.append([np.nan, np.nan])
-            else:
-                orientation_list.append([dx/norm, dy/norm])
-                
-        return np.array(orientation_list, dtype=np.float32)
+        return _empty_result(origin), None
+
+    height, width = frame_size
+    centroids, boxes = landmark_geometry(landmarks, width, height)
+    centroids = fill_skipped(centroids, tracked)
+    # Interpolated boxes stay integer pixel rectangles
+    boxes = np.round(fill_skipped(boxes, tracked))
+    boxes[np.isnan(boxes[..., 0])] = DEFAULT_BOX
+
+    # Same arithmetic as normalizing per frame, applied to the whole clip at once
+    normalized = (centroids - np.array([origin[0], origin[1]], dtype=np.float64)) * scaling_factor
+    if isOneHanded:
+        l_delta = np.full((count, 2), np.nan)
+    else:
+        l_delta = normalized[:, 0] - normalized[:, 1]
+
+    centroids_dom_arr = normalized[:, 0].astype(np.float32)
+    centroids_nondom_arr = normalized[:, 1].astype(np.float32)
+    bboxes_dom_arr = boxes[:, 0].astype(np.int32)
+    bboxes_nondom_arr = boxes[:, 1].astype(np.int32)
+    l_delta_arr = l_delta.astype(np.float32)
 
     orientation_dom_arr = compute_orientation(centroids_dom_arr)
     orientation_nondom_arr = compute_orientation(centroids_nondom_arr)
     orientation_delta_arr = compute_orientation(l_delta_arr)
 
-    total_frames = len(centroids_dom)
+    total_frames = count
     detected_frames = np.sum(~np.isnan(centroids_dom_arr[:, 0]))
     print(f"\nHand Detection Statistics:")
     print(f"Total frames: {total_frames}")
@@ -213,19 +505,71 @@ def HandCoordinates(videoDir, origin, scaling_factor, isOneHanded):
     detection_rate = (detected_frames/total_frames)*100 if total_frames > 0 else 0
     print(f"Detection rate: {detection_rate:.2f}%")
 
+    found_hand = bool(np.any(tracked & ~np.isnan(landmarks[:, 0, 0, 0])))
     if not found_hand or detection_rate < 5:
         print("Insufficient hand detection. Returning empty arrays.")
-        empty = np.array([])
-        return empty, empty, empty, empty, origin, empty, empty, empty, empty
+        return _empty_result(origin), int(detected_frames)
 
     return (
         centroids_dom_arr,
         centroids_nondom_arr,
-        bboxes_dom_arr,   
-        bboxes_nondom_arr, 
+        bboxes_dom_arr,
+        bboxes_nondom_arr,
         origin,
         l_delta_arr,
         orientation_dom_arr,
         orientation_nondom_arr,
         orientation_delta_arr
-    )
\ No newline at end of file
+    ), int(detected_frames)
+
+
+def HandCoordinates(videoDir, origin, scaling_factor, isOneHanded, stride=1, motion_gate=False, tracking_width=None):
+    if isinstance(videoDir, str):
+        cap = cv2.VideoCapture(videoDir)
+        if not cap.isOpened():
+            print(f"Error: Could not open video at {videoDir}")
+            return _empty_result(origin)
+
+        # Get reported properties (these might be inaccurate)
+        reported_frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        reported_fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        print(f"Reported video properties: {width}x{height}, {reported_fps} fps, {reported_frame_count} frames")
+
+        # Try to set hardware acceleration - safely handle if not available
+        try:
+            cap.set(cv2.CAP_PROP_HW_ACCELERATION, 1)  # Enable hardware acceleration
+        except:
+            print("Hardware acceleration not supported for video capture")
+
+        # Increase buffer size for better throughput
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 10)
+        except:
+            print("Failed to set buffer size")
+
+        def read_frames():
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+            cap.release()
+        frames = read_frames()
+    else:
+        # Frames already decoded in memory (frame_source.read_frames), shape (N, h, w, 3) BGR
+        if len(videoDir) == 0:
+            print("Error: No frames to process")
+            return _empty_result(origin)
+        reported_frame_count = len(videoDir)
+        height, width = videoDir[0].shape[:2]
+        print(f"In-memory frames: {width}x{height}, {reported_frame_count} frames")
+        frames = iter(videoDir)
+
+    tracker = HandTracker(isOneHanded, expected_frames=reported_frame_count, stride=stride,
+                          motion_gate=motion_gate, tracking_width=tracking_width)
+    # Force reading all frames regardless of reported count
+    for frame in frames:
+        tracker.process_frame(frame)
+    return tracker.finish(origin, scaling_factor)
@@ -1,5 +1,4 @@
 import numpy as np
-from scipy.interpolate import interp1d
 
 def InterpolateAndResample(data, target_size = 20):
     if data.size == 0:
@@ -17,19 +16,27 @@ def InterpolateAndResample(data, target_size = 20):
         return np.tile(valid_data, (target_size, 1))
 
     new_indices = np.linspace(valid_indices[0], valid_indices[-1], num=target_size)
-    interp_function = [interp1d(valid_indices, valid_data[:, i], kind='linear', fill_value="extrapolate") for i in range (data.shape[1])]
-    resampled_data = np.array([function(new_indices) for function in interp_function]).T
+    # Linear interpolation of every column at once, same arithmetic as interp1d(kind='linear')
+    hi = np.clip(np.searchsorted(valid_indices, new_indices), 1, len(valid_indices) - 1)
+    lo = hi - 1
+    slope = (valid_data[hi] - valid_data[lo]) / (valid_indices[hi] - valid_indices[lo])[:, None]
+    resampled_data = slope * (new_indices - valid_indices[lo])[:, None] + valid_data[lo]
 
     return resampled_data
 
 def calculate_unit_vector(input):
     result = np.full_like(input, np.nan)
-    for t in range (1, (len(input)-1)):
-        vector = input[t+1] - input[t-1]
-        magnitude = np.sqrt(np.sum(vector**2))
-
-        if magnitude != 0:
-            unit_vector = vector/magnitude
-            result[t] = unit_vector
+    if len(input) < 3:
+        return result
+    vector = input[2:] - input[:-2]
+    magnitude = np.sqrt(np.sum(vector**2, axis=1))
 
+    moving = magnitude != 0
+    result[1:-1][moving] = vector[moving] / magnitude[moving][:, None]
     return result
+
+# Coarser resolutions stored alongside the 20-frame trajectory for the matching cascade
+PYRAMID_SIZES = (5, 10)
+
+def ResamplePyramid(data, sizes = PYRAMID_SIZES):
+    return {str(size): InterpolateAndResample(data, size) for size in sizes}
@@ -1,53 +1,68 @@
 import ffmpeg
 import os
 import json
-from faceDetection import detect_face
-from HandCoordinates import HandCoordinates
 import numpy as np
-from LinearInterpolation import InterpolateAndResample
+from LinearInterpolation import InterpolateAndResample, ResamplePyramid
 from sign_matcher import SignMatcher
-import cv2
+from sign_clusters import load_clusters, resolve_clusters
+from sign_index import build_location_index, save_location_index, load_location_index
 from hand_processing import extract_hand_image, preprocess_hand_image
+from frame_source import TARGET_FPS, probe_video, iter_frames, read_frame_at
+from frame_pipeline import FramePipeline, FaceStage, HandTrackingStage, HandCropStage, PipelineCancelled
+from faceDetection import (face_cache_keys, face_normalization, FACE_CACHE, FACE_CACHE_MEDIAPIPE,
+                           DEFAULT_ORIGIN, DEFAULT_SCALING)
+from HandCoordinates import fill_skipped, hand_features, choose_stride
+from landmark_cache import landmark_cache_file, load_landmarks, save_landmarks, covering_segment, add_segment
 import time
+import threading
+
+# Shortlist sizes for the coarse-to-fine matching cascade (one per LinearInterpolation.PYRAMID_SIZES level),
+# e.g. (200, 50); None keeps the exact search
+MATCH_CASCADE_SHORTLISTS = None
+# Seconds GetValues may spend matching (SignMatcher.find_matches_within): candidates are scored nearest
+# location index cells first and the best top-k so far is returned at the deadline; None = exact search
+MATCH_LATENCY_BUDGET = None
+# Similarity scores shown for matches (sign_matcher.rank_matches). 'relative' (best distance / distance) needs
+# only the best distance, so pruned and exhaustive searches give the same percentages; the pruned searches
+# (clusters, cascade, latency budget) support nothing else. 'minmax' is the original 0-100% scale over every
+# candidate and only applies to the exhaustive search
+MATCH_NORMALIZATION = 'relative'
+
+# Location index filtering: neighbouring grid cells searched around the query's start/end cells,
+# and the minimum candidate count below which matching falls back to the whole database
+LOCATION_INDEX_TOLERANCE = 1
+LOCATION_INDEX_MIN_CANDIDATES = 30
+
+# Hand tracking frame stride: 1 tracks every frame, 'auto' picks a stride from the clip length
+# and densifies where the hands move fast (HandCoordinates.choose_stride; see benchmark_tracking.py)
+HAND_TRACKING_STRIDE = 1
+# Reuse the previous landmarks on frames where nothing moved around the hands (HandCoordinates.MOTION_GATE_*)
+HAND_TRACKING_MOTION_GATE = False
+# Width frames are downscaled to before hand tracking (None = full resolution, see HandCoordinates.TRACKING_LADDER);
+# hand appearance crops are always cut from the full-resolution frame
+HAND_TRACKING_WIDTH = None
+# Reuse face normalization across runs on the same video (faceDetection.FACE_CACHE, keyed by content hash)
+FACE_CACHE_ENABLED = True
+# Face detector for normalization: "dlib" (first frame, separate model) or "mediapipe" (median box over the
+# first FACE_DETECTION_FRAMES frames, detected inside the hand-tracking loop on the hand model's input).
+# The two detectors' boxes differ in size, so queries and the database must use the same setting
+FACE_DETECTOR = "dlib"
+FACE_DETECTION_FRAMES = 5
+# GetValues keeps the per-frame hand landmarks of each tracked range (landmark_cache.py), so a new time range
+# inside it, ROI or handedness for the same video needs no tracking and only decodes the range's first and
+# last frames. Ranges are tracked over the whole, uncropped frame; the ROI then only selects hands
+LANDMARK_CACHE_ENABLED = True
+# Frames decoded (and converted for the hand model) ahead of the stages on a separate thread; 0 = serial
+FRAME_PREFETCH = 8
+
+# Per cache file locks, so a background prefill and GetValues never track the same video twice
+_landmark_locks = {}
+_landmark_locks_guard = threading.Lock()
 
 # Database cache to avoid repeated file reads
 _database_cache = None
 _database_timestamp = 0
 
-def get_hardware_acceleration_option():
-    """Determine the best hardware acceleration option for ffmpeg on this system"""
-    import platform
-    import subprocess
-    
-    system = platform.system()
-    
-    # Check ffmpeg capabilities
-    try:
-        result = subprocess.run(
-            ["ffmpeg", "-hwaccels"], 
-            capture_output=True, 
-            text=True
-        )
-        hwaccels = result.stdout.lower()
-        
-        # Check for available hardware acceleration
-        if "videotoolbox" in hwaccels and system == "Darwin":  # macOS (including M1/M2)
-            return "videotoolbox"
-        elif "cuda" in hwaccels:  # NVIDIA GPU
-            return "cuda"
-        elif "qsv" in hwaccels:  # Intel Quick Sync
-            return "qsv"
-        elif "vaapi" in hwaccels:  # Linux VA-API
-            return "vaapi"
-        elif "dxva2" in hwaccels and system == "Windows":  # Windows
-            return "dxva2"
-        elif "d3d11va" in hwaccels and system == "Windows":  # Windows
-            return "d3d11va"
-        else:
-            return None
-    except:
-        return None
-
 def load_database(db_dir="sign_database", db_file="sign_data.json"):
     """Load database with caching to avoid repeated disk reads"""
     global _database_cache, _database_timestamp
@@ -77,149 +92,355 @@ def get_matcher():
     """Get singleton instance of SignMatcher"""
     return SignMatcher.get_instance()
 
-def GetValues(startTime, endTime, startPoint, endPoint, fileName, isOneHanded, add_to_db=False):
-    print(f"Processing video: {fileName}")
-    print(f"Time range: {startTime} to {endTime}")
-    print(f"ROI points: {startPoint} to {endPoint}")
-    
-    start_seconds = startTime / 1000.0
-    end_seconds = endTime / 1000.0
+def _point_xy(point):
+    """Accept either a QPoint (GUI) or a plain (x, y) pair (headless callers)"""
+    if hasattr(point, 'x') and callable(point.x):
+        return point.x(), point.y()
+    return int(point[0]), int(point[1])
 
-    if endTime <= startTime:
-        print("Error: End time must be greater than start time.")
-        return [], None, None, None
+def _crop_box(startPoint, endPoint, original_width, original_height, min_size=200):
+    """Clamp the ROI to the frame, enforcing a minimum size; returns (width, height, x, y)"""
+    start_x, start_y = _point_xy(startPoint)
+    end_x, end_y = _point_xy(endPoint)
+    start_x, end_x = sorted((max(0, start_x), max(0, end_x)))
+    start_y, end_y = sorted((max(0, start_y), max(0, end_y)))
 
-    cap = cv2.VideoCapture(fileName)
-    if not cap.isOpened():
-        print(f"Error: Could not open video {fileName}")
-        return [], None, None, None
-        
-    original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    cap.release()
+    width = min(max(end_x - start_x, min_size), original_width)
+    height = min(max(end_y - start_y, min_size), original_height)
+    x = max(0, min(start_x, original_width - width))
+    y = max(0, min(start_y, original_height - height))
+    return int(width), int(height), int(x), int(y)
 
-    width = min(endPoint.x() - startPoint.x(), original_width)
-    height = min(endPoint.y() - startPoint.y(), original_height)
-    x = min(startPoint.x(), original_width - width)
-    y = min(startPoint.y(), original_height - height)
+def _enter_stage(stage, cancel=None, on_stage=None):
+    """Stage boundary: stop here if cancelled, otherwise report the stage"""
+    if cancel is not None and cancel.is_set():
+        raise PipelineCancelled()
+    if on_stage is not None:
+        on_stage(stage, 0, 0)
 
-    MIN_SIZE = 200
-    if width < MIN_SIZE or height < MIN_SIZE:
-        width = max(MIN_SIZE, width)
-        height = max(MIN_SIZE, height)
+def _default_tracker_options():
+    return {"stride": HAND_TRACKING_STRIDE, "motion_gate": HAND_TRACKING_MOTION_GATE,
+            "tracking_width": HAND_TRACKING_WIDTH}
 
-    baseName = os.path.basename(fileName)
-    fileName_NoExtension, extension = os.path.splitext(baseName)
-    output_fileName = f"{fileName_NoExtension}_transformed{extension}"
+def _face_stage(fileName, face_group, offset):
+    """FaceStage for the configured detector; returns (stage, whether the hand tracker must detect the face)"""
+    combined = FACE_DETECTOR == "mediapipe"
+    face_keys = face_cache_keys(fileName, face_group) if FACE_CACHE_ENABLED else None
+    face_stage = FaceStage(face_keys, offset=offset, detect=not combined,
+                           cache_name=FACE_CACHE_MEDIAPIPE if combined else FACE_CACHE)
+    if face_stage.cached:
+        print("Face normalization loaded from cache")
+    return face_stage, combined and not face_stage.cached
 
-    crop_dimensions = f'{width}:{height}:{x}:{y}'
-    print(f"Crop dimensions: {crop_dimensions}")
+def _track_clip(fileName, info, box, start_seconds, end_seconds, isOneHanded, tracker_options, face_group,
+                timings, tracker_stats, cancel=None, on_stage=None):
+    """Decode the selected range once and run the face, hand and crop stages over it
+
+    Returns (origin, scaling_factor, HandCoordinates tuple, first frame, last frame, frame count),
+    or None if nothing was decoded.
+    """
+    width, height, x, y = box
+    original_width, original_height = info[0], info[1]
+    _enter_stage("decode", cancel, on_stage)
+    print(f"Decoding selected range...")
 
-    # Get hardware acceleration option
-    hw_accel = get_hardware_acceleration_option()
-    print(f"Hardware acceleration: {hw_accel if hw_accel else 'Not available'}")
+    # Trim, crop and resample to 30 fps in a single streaming decode; every frame is
+    # handed to face detection, hand tracking and the hand-crop stage as it arrives
+    crop = None if (width, height) == (original_width, original_height) else box
+    frames = iter_frames(fileName, start_seconds, end_seconds, crop=crop)
 
+    fps = info[2] if info[2] and info[2] > 0 else TARGET_FPS
+    duration_seconds = (info[3] / fps if end_seconds is None else end_seconds) - start_seconds
+    expected_frames = max(0, int(round(duration_seconds * TARGET_FPS)))
+
+    face_stage, track_face = _face_stage(fileName, face_group, (x, y))
+    if track_face:
+        tracker_options = dict(tracker_options, face_frames=FACE_DETECTION_FRAMES)
+    hand_stage = HandTrackingStage(isOneHanded, expected_frames=expected_frames, **tracker_options)
+    crop_stage = HandCropStage()
+    pipeline = FramePipeline([face_stage, hand_stage, crop_stage], prefetch=FRAME_PREFETCH)
     try:
-        print(f"Attempting to extract all frames from video...")
-        
-        # Base ffmpeg input
-        input_stream = ffmpeg.input(fileName)
-        
-        # Apply hardware acceleration if available
-        if hw_accel:
-            if hw_accel == "videotoolbox":  # For macOS including M1/M2
-                # Continuing from previous code
-                output_stream = (
-                    ffmpeg.input(fileName, hwaccel="videotoolbox")
-                    .filter('fps', fps=30)
-                    .output(output_fileName, vsync=0)
-                    .overwrite_output()
-                )
-                output_stream.run(quiet=True)
-            elif hw_accel == "cuda":  # For NVIDIA GPUs
-                (
-                    ffmpeg
-                    .input(fileName, hwaccel="cuda")
-                    .filter('fps', fps=30)
-                    .output(output_fileName, vsync=0)
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-            elif hw_accel == "qsv":  # For Intel Quick Sync
-                (
-                    ffmpeg
-                    .input(fileName, hwaccel="qsv")
-                    .filter('fps', fps=30)
-                    .output(output_fileName, vsync=0)
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-            elif hw_accel in ["vaapi", "dxva2", "d3d11va"]:  # Other acceleration methods
-                (
-                    ffmpeg
-                    .input(fileName, hwaccel=hw_accel)
-                    .filter('fps', fps=30)
-                    .output(output_fileName, vsync=0)
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-        else:
-            # Standard processing without hardware acceleration
-            # Try with higher thread count for better CPU utilization
-            (
-                ffmpeg
-                .input(fileName)
-                .filter('fps', fps=30)
-                .output(output_fileName, vsync=0, threads=8)  # Use more CPU threads
-                .overwrite_output()
-                .run(quiet=True)
-            )
-        
-        # Verify the transformed video has multiple frames
-        check_cap = cv2.VideoCapture(output_fileName)
-        check_frame_count = int(check_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        check_cap.release()
-        print(f"Transformed video contains {check_frame_count} frames")
-        
-        if check_frame_count <= 1:
-            # Try alternative approach with different parameters
-            print("First approach failed, trying alternate method...")
-            if hw_accel:
-                (
-                    ffmpeg
-                    .input(fileName, hwaccel=hw_accel)
-                    .output(output_fileName, c='copy')  # Direct stream copy with hardware accel
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-            else:
-                (
-                    ffmpeg
-                    .input(fileName)
-                    .output(output_fileName, c='copy', threads=8)  # More CPU threads
-                    .overwrite_output()
-                    .run(quiet=True)
-                )
-            
-            # Verify again
-            check_cap = cv2.VideoCapture(output_fileName)
-            check_frame_count = int(check_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            check_cap.release()
-            print(f"After second attempt, transformed video contains {check_frame_count} frames")
-        
-        print(f"Processed video saved as: {output_fileName}")
+        progress = (lambda done: on_stage("decode", done, expected_frames)) if on_stage else None
+        results = pipeline.run(frames, timings, cancel=cancel, on_progress=progress)
+        print(f"Decoded {pipeline.frame_count} frames in {pipeline.wall_time:.2f}s; stage utilization: " +
+              ", ".join(f"{name} {fraction:.0%}" for name, fraction in pipeline.utilization().items()))
+
+        if pipeline.frame_count == 0:
+            print("No frames decoded from the selected range")
+            return None
 
         # Face detection for coordinate system normalization as described in paper section 4.1
-        origin, scaling_factor, videoDir = detect_face(output_fileName)
+        _enter_stage("face", cancel, on_stage)
+        if track_face:
+            face_stage.set_face(results["hands"].face_box())
+        origin, scaling_factor = face_stage.finish()
         if origin is None or scaling_factor is None:
             print("Using default normalization parameters")
             origin = (width/2, height/2)
             scaling_factor = 1.0/height
-            videoDir = output_fileName
-            
+
         print(f"Face detection parameters - Origin: {origin}, Scaling: {scaling_factor}")
+        _enter_stage("hands", cancel, on_stage)
+        stage_start = time.time()
 
         # Hand tracking and feature extraction
+        hand_result = results["hands"].finish(origin, scaling_factor)
+        if tracker_stats is not None:
+            tracker_stats.update(results["hands"].stats())
+        timings['hands'] += time.time() - stage_start
+
+        # Both frames were kept by the crop stage during the single decode pass
+        first_frame, last_frame = results["crops"]
+        return origin, scaling_factor, hand_result, first_frame, last_frame, pipeline.frame_count
+    finally:
+        # Hands the model back to the pool on every path (finish() already did on success)
+        hand_stage.tracker.close()
+
+def _track_range(fileName, info, box, first_frame, end_seconds, isOneHanded, tracker_options, face_group, timings,
+                 cancel=None, on_progress=None):
+    """Track the ROI from frame first_frame (on the TARGET_FPS timeline) to end_seconds for the landmark cache
+
+    The same face and hand stages as _track_clip, on the same cropped frames, minus the hand crops.
+    Returns a landmark cache segment plus the tracker's stats, or None if nothing was decoded;
+    raises PipelineCancelled if cancelled.
+    """
+    width, height, x, y = box
+    start_seconds = first_frame / TARGET_FPS
+    fps = info[2] if info[2] and info[2] > 0 else TARGET_FPS
+    duration_seconds = (info[3] / fps if end_seconds is None else end_seconds) - start_seconds
+    expected_frames = max(0, int(round(duration_seconds * TARGET_FPS)))
+
+    face_stage, track_face = _face_stage(fileName, face_group, (x, y))
+    if track_face:
+        tracker_options = dict(tracker_options, face_frames=FACE_DETECTION_FRAMES)
+    hand_stage = HandTrackingStage(isOneHanded, expected_frames=expected_frames, **tracker_options)
+    pipeline = FramePipeline([face_stage, hand_stage], prefetch=FRAME_PREFETCH)
+    progress = (lambda done: on_progress(done, expected_frames)) if on_progress else None
+    crop = None if (width, height) == (info[0], info[1]) else box
+    try:
+        frames = iter_frames(fileName, start_seconds, end_seconds, crop=crop)
+        tracker = pipeline.run(frames, timings, cancel=cancel, on_progress=progress)["hands"]
+    except PipelineCancelled:
+        hand_stage.tracker.close()
+        print(f"Landmark caching cancelled after {pipeline.frame_count} frames")
+        raise
+    tracker.flush()
+    print(f"Decoded {pipeline.frame_count} frames in {pipeline.wall_time:.2f}s")
+    if pipeline.frame_count == 0:
+        print("No frames decoded for the landmark cache")
+        return None
+
+    if track_face:
+        face_stage.set_face(tracker.face_box())
+    count = tracker.frame_count
+    return {
+        "landmarks": tracker.landmarks[:count],
+        "tracked": tracker.tracked[:count],
+        "timestamps": (first_frame + np.arange(count)) / TARGET_FPS,
+        "frame_size": tracker.frame_size,
+        "face_box": face_stage.box if face_stage.box is not None else (np.nan,) * 4,
+        "span": (start_seconds, np.inf if end_seconds is None else end_seconds),
+        "stats": tracker.stats()
+    }
+
+def _landmark_lock(cache_file):
+    """Lock held while a video's landmarks are loaded or computed, so concurrent requests track it once"""
+    with _landmark_locks_guard:
+        return _landmark_locks.setdefault(cache_file, threading.Lock())
+
+def _cached_landmarks(fileName, info, box, start_seconds, end_seconds, isOneHanded, tracker_options, face_group,
+                      timings, cancel=None, on_progress=None):
+    """Cached segment covering start_seconds to end_seconds (None = end of the video)
+
+    Entries are keyed by tracker settings, ROI box and handedness, since all three change what
+    the hand model sees. A range that is not cached yet is tracked on its own and merged with
+    the segments it overlaps or touches; other segments are kept. "stats" is set on the
+    returned segment when this call tracked it. tracker_options must hold a resolved stride.
+    """
+    settings = dict(tracker_options, face_detector=FACE_DETECTOR, fps=TARGET_FPS, box=list(box),
+                    one_handed=bool(isOneHanded))
+    cache_file = landmark_cache_file(fileName, settings)
+    lock = _landmark_lock(cache_file)
+    # Wait for a concurrent run on the same video, but stay cancellable meanwhile
+    while not lock.acquire(timeout=0.1):
+        if cancel is not None and cancel.is_set():
+            raise PipelineCancelled()
+    try:
+        segments = load_landmarks(cache_file)
+        segment = covering_segment(segments, start_seconds, end_seconds, TARGET_FPS)
+        if segment is not None:
+            print(f"Landmarks loaded from cache: {cache_file}")
+            return segment
+
+        print(f"Tracking the selected range for the landmark cache...")
+        new = _track_range(fileName, info, box, int(round(start_seconds * TARGET_FPS)), end_seconds, isOneHanded,
+                           tracker_options, face_group, timings, cancel, on_progress)
+        if new is None:
+            return None
+        stats = new.pop("stats")
+        segments, segment = add_segment(segments, new, TARGET_FPS)
+        save_landmarks(cache_file, segments)
+        return dict(segment, stats=stats)
+    finally:
+        lock.release()
+
+def prepare_landmark_cache(fileName, isOneHanded=False, cancel=None, on_progress=None, face_group=None):
+    """Track a whole video into the landmark cache ahead of GetValues, e.g. as soon as it is loaded
+
+    Tracks the full frame, so it serves any time range processed without an ROI and with the
+    given handedness. cancel is a threading.Event checked before every frame;
+    on_progress(frames_done, frames_expected) reports progress. Returns True once the video's
+    landmarks are cached. Not available with HAND_TRACKING_STRIDE = 'auto', whose stride
+    depends on the clip that is later selected.
+    """
+    if not LANDMARK_CACHE_ENABLED:
+        return False
+    tracker_options = _default_tracker_options()
+    if tracker_options["stride"] == 'auto':
+        print("Background tracking skipped: the 'auto' stride depends on the selected clip")
+        return False
+    info = probe_video(fileName)
+    if info is None:
+        print(f"Error: Could not open video {fileName}")
+        return False
+    box = (info[0], info[1], 0, 0)
+    try:
+        segment = _cached_landmarks(fileName, info, box, 0.0, None, isOneHanded, tracker_options, face_group, {},
+                                    cancel, on_progress)
+    except PipelineCancelled:
+        return False
+    return segment is not None
+
+def _track_clip_cached(fileName, info, box, start_seconds, end_seconds, isOneHanded, tracker_options, face_group,
+                       timings, tracker_stats, cancel=None, on_stage=None):
+    """_track_clip from the landmark cache: only the first and last frames of the range are decoded
+
+    The range is tracked once exactly as _track_clip would track it (same ROI crop, handedness,
+    face source and stride); later requests inside a tracked span slice its landmarks.
+    """
+    width, height, x, y = box
+    original_width, original_height = info[0], info[1]
+    if tracker_options.get("stride") == 'auto':
+        # Resolve the stride from the clip's length, so caching does not change which frames are tracked
+        fps = info[2] if info[2] and info[2] > 0 else TARGET_FPS
+        duration_seconds = (info[3] / fps if end_seconds is None else end_seconds) - start_seconds
+        tracker_options = dict(tracker_options, stride=choose_stride(int(round(duration_seconds * TARGET_FPS))))
+    _enter_stage("decode", cancel, on_stage)
+    progress = (lambda done, total: on_stage("decode", done, total)) if on_stage else None
+    entry = _cached_landmarks(fileName, info, box, start_seconds, end_seconds, isOneHanded, tracker_options,
+                              face_group, timings, cancel, progress)
+    if entry is None:
+        return None
+    stage_start = time.time()
+
+    # Frames of the range on the TARGET_FPS timeline the video was tracked on; like the decoders,
+    # the range ends before the first frame at or after end_seconds
+    timestamps = entry["timestamps"]
+    first = int(np.searchsorted(timestamps, start_seconds - 0.5 / TARGET_FPS))
+    last = len(timestamps) if end_seconds is None else int(np.searchsorted(timestamps, end_seconds - 1e-6))
+    if last <= first:
+        print("No frames in the selected range")
+        return None
+
+    landmarks, tracked = entry["landmarks"], entry["tracked"]
+    if not tracked[first:last].all():
+        # Sparse tracking: interpolate from the tracked frames around the range, edges included
+        before = np.flatnonzero(tracked[:first + 1])
+        after = np.flatnonzero(tracked[last - 1:])
+        lo = before[-1] if len(before) else first
+        hi = last - 1 + after[0] + 1 if len(after) else last
+        landmarks = fill_skipped(landmarks[lo:hi], tracked[lo:hi])[first - lo:last - lo]
+        tracked = np.ones(last - first, dtype=bool)
+    else:
+        landmarks, tracked = landmarks[first:last], tracked[first:last]
+
+    # Tracked on the ROI crop with this handedness, like _track_clip
+    crop = None if (width, height) == (original_width, original_height) else box
+    frame_size = entry["frame_size"]
+
+    _enter_stage("face", cancel, on_stage)
+    face_x, face_y, face_w, face_h = entry["face_box"]
+    if np.isnan(face_x):
+        print("No face detected.")
+        origin, scaling_factor = DEFAULT_ORIGIN, DEFAULT_SCALING
+    else:
+        origin, scaling_factor = face_normalization((face_x - x, face_y - y, face_w, face_h))
+    print(f"Face detection parameters - Origin: {origin}, Scaling: {scaling_factor}")
+
+    _enter_stage("hands", cancel, on_stage)
+    hand_result, detected = hand_features(landmarks, tracked, frame_size, isOneHanded, origin, scaling_factor)
+    if tracker_stats is not None:
+        if "stats" in entry:
+            # Tracked by this call: report the tracking run's counters
+            tracker_stats.update(entry["stats"], detected=detected, cached=False)
+        else:
+            tracker_stats.update({"frames": last - first, "inferences": 0, "detected": detected, "cached": True})
+    timings['hands'] = timings.get('hands', 0.0) + time.time() - stage_start
+
+    # Hand crops still need pixels: decode just the first and last frames of the range
+    stage_start = time.time()
+    first_frame = read_frame_at(fileName, timestamps[first], crop)
+    last_frame = read_frame_at(fileName, timestamps[last - 1], crop) if last - first > 1 else first_frame
+    timings['decode'] = timings.get('decode', 0.0) + time.time() - stage_start
+    if first_frame is None or last_frame is None:
+        print("Could not decode the first and last frames of the range")
+        return None
+    return origin, scaling_factor, hand_result, first_frame, last_frame, last - first
+
+def extract_sign_features(startTime, endTime, startPoint, endPoint, fileName, isOneHanded, timings=None,
+                          tracker_options=None, tracker_stats=None, face_group=None, landmark_cache=False,
+                          cancel=None, on_stage=None, as_arrays=False):
+    """Run the feature extraction half of GetValues
+    
+    endTime=None processes the clip to its end. The ROI is applied as a real crop.
+    Returns (processed_features, origin, scaling_factor); processed_features is None on failure.
+    If timings is a dict, per-stage wall times in seconds are stored in it
+    (decode, face, hands, crops, features). tracker_options override the HandTracker
+    settings from this module's config, and tracker_stats receives HandTracker.stats().
+    face_group (e.g. a signer or session name) lets clips of the same recording set-up share
+    a cached face box when their own content hash has none. With landmark_cache the clip is
+    derived from the video's cached per-frame landmarks (see _track_clip_cached).
+    on_stage(stage, done, total) is called as the decode, face, hands and features stages
+    start (with frame counts while decoding); setting the cancel event raises
+    PipelineCancelled at the next stage boundary or frame. Trajectories are returned as
+    lists ready for JSON, or as NumPy arrays with as_arrays (hand images are always arrays).
+    """
+    if timings is None:
+        timings = {}
+    if tracker_options is None:
+        tracker_options = _default_tracker_options()
+
+    print(f"Processing video: {fileName}")
+    print(f"Time range: {startTime} to {endTime}")
+    print(f"ROI points: {startPoint} to {endPoint}")
+    
+    if endTime is not None and endTime <= startTime:
+        print("Error: End time must be greater than start time.")
+        return None, None, None
+
+    info = probe_video(fileName)
+    if info is None:
+        print(f"Error: Could not open video {fileName}")
+        return None, None, None
+    original_width, original_height = info[0], info[1]
+
+    width, height, x, y = _crop_box(startPoint, endPoint, original_width, original_height)
+    crop_dimensions = f'{width}:{height}:{x}:{y}'
+    print(f"Crop dimensions: {crop_dimensions}")
+
+    try:
+        # Start on the TARGET_FPS frame grid, so the direct and the cached path decode the same frames
+        start_seconds = round(startTime / 1000.0 * TARGET_FPS) / TARGET_FPS
+        end_seconds = endTime / 1000.0 if endTime is not None else None
+        track = _track_clip_cached if landmark_cache else _track_clip
+        tracked = track(fileName, info, (width, height, x, y), start_seconds, end_seconds, isOneHanded,
+                        tracker_options, face_group, timings, tracker_stats, cancel, on_stage)
+        if tracked is None:
+            return None, None, None
+        origin, scaling_factor, hand_result, first_frame, last_frame, frame_count = tracked
+        _enter_stage("features", cancel, on_stage)
+        stage_start = time.time()
+
         (centroids_dom_arr,
          centroids_nondom_arr,
          hand_boxes_dom,
@@ -228,38 +449,19 @@ def GetValues(startTime, endTime, startPoint, endPoint, fileName, isOneHanded, a
          l_delta_arr,
          orientation_dom_arr,
          orientation_nondom_arr,
-         orientation_delta_arr) = HandCoordinates(videoDir, origin, scaling_factor, isOneHanded)
+         orientation_delta_arr) = hand_result
          
         if centroids_dom_arr.size == 0 or len(hand_boxes_dom) == 0:
             print("No hand coordinates detected")
-            return [], origin, scaling_factor, None
+            return None, origin, scaling_factor
 
         # Extract hand appearance features as in paper section 4
-        cap = cv2.VideoCapture(videoDir)
-        ret, first_frame = cap.read()
-        if not ret:
-            print("Failed to read first frame")
-            return [], None, None, None
-
-        last_frame = first_frame.copy()
-        
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        if frame_count > 1:
-            safe_last_frame_pos = max(0, min(frame_count - 2, frame_count - 1))
-            cap.set(cv2.CAP_PROP_POS_FRAMES, safe_last_frame_pos)
-            ret, potential_last_frame = cap.read()
-            if ret:
-                last_frame = potential_last_frame
-            else:
-                print("Could not read near-last frame, using first frame as last frame")
-        else:
+        if frame_count == 1:
             print("Video has only one frame, using it as both first and last")
-        
-        cap.release()
 
         if len(hand_boxes_dom) == 0:
             print("No hand boxes detected")
-            return [], origin, scaling_factor, None
+            return None, origin, scaling_factor
 
         # Extract and preprocess hand images
         dom_start_img = extract_hand_image(first_frame, hand_boxes_dom[0])
@@ -277,18 +479,24 @@ def GetValues(startTime, endTime, startPoint, endPoint, fileName, isOneHanded, a
         Interpolated_orient_nondom = InterpolateAndResample(orientation_nondom_arr, TARGET_FRAMES)
         Interpolated_orient_delta = InterpolateAndResample(orientation_delta_arr, TARGET_FRAMES)
 
+        def output(arr):
+            return arr if as_arrays else arr.tolist()
+
         # Prepare all features for the sign
         processed_features = {
-            'centroids_dom_arr': Interpolated_Dominant_Hand.tolist(),
-            'centroids_nondom_arr': Interpolated_nonDominant_Hand.tolist(),
-            'l_delta_arr': Interpolated_l_Delta.tolist(),
-            'orientation_dom_arr': Interpolated_orient_dom.tolist(),
-            'orientation_nondom_arr': Interpolated_orient_nondom.tolist(),
-            'orientation_delta_arr': Interpolated_orient_delta.tolist(),
+            'centroids_dom_arr': output(Interpolated_Dominant_Hand),
+            'centroids_nondom_arr': output(Interpolated_nonDominant_Hand),
+            'l_delta_arr': output(Interpolated_l_Delta),
+            'orientation_dom_arr': output(Interpolated_orient_dom),
+            'orientation_nondom_arr': output(Interpolated_orient_nondom),
+            'orientation_delta_arr': output(Interpolated_orient_delta),
             'H_d_s': H_d_s,
             'H_d_e': H_d_e,
             'is_one_handed': isOneHanded,
-            'frame_count': TARGET_FRAMES
+            'frame_count': TARGET_FRAMES,
+            'centroids_dom_pyramid': {
+                size: output(arr) for size, arr in ResamplePyramid(centroids_dom_arr).items()
+            }
         }
 
         # Add non-dominant hand appearance features if applicable
@@ -304,74 +512,234 @@ def GetValues(startTime, endTime, startPoint, endPoint, fileName, isOneHanded, a
                 'H_nd_e': H_nd_e
             })
 
-        # Save to database if requested
-        if add_to_db:
-            db_dir = "sign_database"
-            db_file = "sign_data.json"
-            db_data = load_database(db_dir, db_file)
-            db_data[fileName] = {
-                "name": os.path.splitext(os.path.basename(fileName))[0],
-                "features": processed_features,
-                "is_one_handed": isOneHanded,
-                "duration": float(end_seconds - start_seconds),
-                "origin": [float(x) for x in origin] if isinstance(origin, (tuple, list)) else [0.0, 0.0],
-                "scaling_factor": float(scaling_factor)
-            }
-            db_path = os.path.join(db_dir, db_file)
-            if not os.path.exists(db_dir):
-                os.makedirs(db_dir)
-            with open(db_path, 'w') as f:
-                json.dump({"signs": db_data}, f, indent=4)
-            print(f"Added sign data to database: {db_path}")
-
-        # Matching process following the paper's approach (section 7)
-        matches = []
-        db_dir = "sign_database"
-        db_file = "sign_data.json"
-        db_data = load_database(db_dir, db_file)
-
-        if db_data:
-            # Get the singleton instance of SignMatcher (implements DTW as in paper)
-            matcher = get_matcher()
-            
-            database_signs = []
-            sign_names = []
+        timings['features'] = time.time() - stage_start
+        return processed_features, origin, scaling_factor
+
+    except PipelineCancelled:
+        print(f"Processing cancelled: {fileName}")
+        raise
+    except ffmpeg.Error as e:
+        print("FFmpeg error:", e.stderr.decode() if e.stderr else str(e))
+        print(f"Failed to process video: {fileName}")
+        return None, None, None
+    except Exception as e:
+        print(f"Error processing video: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None, None, None
+
+def save_sign_to_database(fileName, processed_features, isOneHanded, duration, origin, scaling_factor,
+                          db_dir="sign_database", db_file="sign_data.json"):
+    """Add one extracted sign to sign_data.json (and refresh the location index)"""
+    db_data = load_database(db_dir, db_file)
+    db_data[fileName] = {
+        "name": os.path.splitext(os.path.basename(fileName))[0],
+        "features": processed_features,
+        "is_one_handed": isOneHanded,
+        "duration": float(duration),
+        "origin": [float(x) for x in origin] if isinstance(origin, (tuple, list)) else [0.0, 0.0],
+        "scaling_factor": float(scaling_factor)
+    }
+    db_path = os.path.join(db_dir, db_file)
+    if not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+    with open(db_path, 'w') as f:
+        json.dump({"signs": db_data}, f, indent=4)
+    save_location_index(build_location_index(db_data), db_dir)
+    print(f"Added sign data to database: {db_path}")
+
+def _eligible_paths(db_data, isOneHanded, exclude_paths=None):
+    """Database signs with the query's handedness, as in the paper"""
+    print("Filtering signs by handedness as specified in the paper...")
+    return {
+        path for path, entry in db_data.items()
+        if entry['is_one_handed'] == isOneHanded and not (exclude_paths and path in exclude_paths)
+    }
+
+def _location_candidates(location_index, processed_features, eligible):
+    """Eligible signs starting and ending near the query's hand locations, or None if too few do"""
+    location_candidates = location_index.query(
+        processed_features,
+        tolerance=LOCATION_INDEX_TOLERANCE,
+        min_candidates=LOCATION_INDEX_MIN_CANDIDATES,
+        allowed=eligible
+    )
+    if location_candidates is None:
+        print("Too few location index candidates, searching the whole database")
+    else:
+        print(f"Location index selected {len(location_candidates)} candidate signs")
+    return location_candidates
+
+def match_sign_features(processed_features, isOneHanded, top_k=10, on_matches=None, exclude_paths=None,
+                        db_dir="sign_database", db_file="sign_data.json", latency_budget=None):
+    """Run the matching half of GetValues, returning (sign_name, similarity) pairs best first
+    
+    With latency_budget (seconds) the location index orders the whole database instead of
+    filtering it, and matching stops at the deadline with the best matches found so far.
+    """
+    # Matching process following the paper's approach (section 7)
+    matches = []
+    db_data = load_database(db_dir, db_file)
+
+    if db_data:
+        # Get the singleton instance of SignMatcher (implements DTW as in paper)
+        matcher = get_matcher()
+        
+        database_signs = []
+        database_paths = []
+        sign_names = []
+        
+        # Filter signs with matching handedness as in paper
+        eligible = _eligible_paths(db_data, isOneHanded, exclude_paths)
+        
+        # Restrict to signs starting and ending near the query's hand locations,
+        # unless too few of the eligible ones do
+        location_index = load_location_index(db_data, db_dir, db_file=db_file)
+        location_candidates = None
+        cell_distances = None
+        if latency_budget is not None:
+            # Budgeted search scores the nearest cells first rather than skipping the rest
+            cell_distances = location_index.cell_distances(processed_features)
+        else:
+            location_candidates = _location_candidates(location_index, processed_features, eligible)
+        
+        for path, entry in db_data.items():
+            if path not in eligible:
+                continue
+            if location_candidates is not None and path not in location_candidates:
+                continue
+            database_signs.append(entry['features'])
+            database_paths.append(path)
+            sign_names.append(entry['name'])
+        
+        print(f"Found {len(database_signs)} matching signs in database for comparison")
+        
+        if database_signs:
+            print("Starting batch DTW matching process...")
+            t_start = time.time()
             
-            # Filter signs with matching handedness as in paper
-            print("Filtering signs by handedness as specified in the paper...")
-            for path, entry in db_data.items():
-                if entry['is_one_handed'] != isOneHanded:
-                    continue
-                database_signs.append(entry['features'])
-                sign_names.append(entry['name'])
+            # Use cluster-pruned search when prototypes have been built (sign_clusters.py),
+            # otherwise fall back to exhaustive batch processing
+            clusters = load_clusters(db_dir)
             
-            print(f"Found {len(database_signs)} matching signs in database for comparison")
+            def named_progress(distance_matches, examined, total):
+                named = [(sign_names[idx], similarity) for idx, similarity in distance_matches]
+                stop = on_matches(named, examined, total)
+                if stop:
+                    print(f"Matching stopped early after {examined}/{total} signs")
+                return stop
+            progress = named_progress if on_matches is not None else None
             
-            if database_signs:
-                print("Starting batch DTW matching process...")
-                t_start = time.time()
-                
-                # Use batch processing for much faster results
-                distance_matches = matcher.find_matches_batch(processed_features, database_signs, top_k=10)
-                
-                t_end = time.time()
-                print(f"DTW batch matching completed in {t_end - t_start:.2f} seconds")
+            # The pruned searches stream their own progress, so they come before plain streaming
+            if latency_budget is not None:
+                priority = None
+                if cell_distances is not None:
+                    priority = [cell_distances.get(path, float('inf')) for path in database_paths]
                 
-                for idx, similarity in distance_matches:
-                    sign_name = sign_names[idx]
-                    matches.append((sign_name, similarity))
-                    print(f"Match: {sign_name}, Similarity: {similarity:.2f}%")
+                distance_matches, partial, examined_fraction = matcher.find_matches_within(
+                    processed_features, database_signs, latency_budget, top_k=top_k, priority=priority,
+                    normalization=MATCH_NORMALIZATION, on_matches=progress
+                )
+                if partial:
+                    print(f"Approximate matches: {examined_fraction:.0%} of candidate signs examined "
+                          f"within {latency_budget:.2f} seconds")
+            elif MATCH_CASCADE_SHORTLISTS:
+                distance_matches = matcher.find_matches_cascade(
+                    processed_features, database_signs, top_k=top_k,
+                    shortlist_sizes=MATCH_CASCADE_SHORTLISTS, normalization=MATCH_NORMALIZATION,
+                    on_matches=progress
+                )
+            elif clusters:
+                clusters = resolve_clusters(clusters, database_paths, database_signs)
+                distance_matches = matcher.find_matches_clustered(processed_features, database_signs, clusters,
+                                                                  top_k=top_k, normalization=MATCH_NORMALIZATION,
+                                                                  on_matches=progress)
+            elif on_matches is not None:
+                distance_matches = []
+                for distance_matches, examined, total in matcher.iter_matches(
+                        processed_features, database_signs, top_k=top_k, normalization=MATCH_NORMALIZATION):
+                    if named_progress(distance_matches, examined, total):
+                        break
             else:
-                print("No compatible signs found in database for comparison")
+                distance_matches = matcher.find_matches_batch(processed_features, database_signs, top_k=top_k,
+                                                              normalization=MATCH_NORMALIZATION)
+            
+            t_end = time.time()
+            print(f"DTW batch matching completed in {t_end - t_start:.2f} seconds")
+            
+            for idx, similarity in distance_matches:
+                sign_name = sign_names[idx]
+                matches.append((sign_name, similarity))
+                print(f"Match: {sign_name}, Similarity: {similarity:.2f}%")
+        else:
+            print("No compatible signs found in database for comparison")
+
+    return matches
+
+def match_sign_features_many(queries, top_k=10, db_dir="sign_database", db_file="sign_data.json"):
+    """Match many (processed_features, isOneHanded, exclude_paths) queries in one batch
+    
+    Each query is compared with the same handedness and location index candidates as in
+    match_sign_features, using the exhaustive dominant hand search (SignMatcher.find_matches_many)
+    over a database converted to Java once. Returns one (sign_name, similarity) list per query.
+    """
+    db_data = load_database(db_dir, db_file)
+    if not db_data or not queries:
+        return [[] for _ in queries]
+    
+    matcher = get_matcher()
+    database_paths = list(db_data)
+    database_signs = [db_data[path]['features'] for path in database_paths]
+    positions = {path: idx for idx, path in enumerate(database_paths)}
+    location_index = load_location_index(db_data, db_dir, db_file=db_file)
+    
+    candidates = []
+    for processed_features, isOneHanded, exclude_paths in queries:
+        eligible = _eligible_paths(db_data, isOneHanded, exclude_paths)
+        location_candidates = _location_candidates(location_index, processed_features, eligible)
+        selected = eligible if location_candidates is None else location_candidates
+        candidates.append(sorted(positions[path] for path in selected))
+    
+    distance_matches = matcher.find_matches_many(
+        [processed_features for processed_features, _, _ in queries], database_signs, top_k=top_k,
+        normalization=MATCH_NORMALIZATION, candidates=candidates
+    )
+    return [[(db_data[database_paths[idx]]['name'], similarity) for idx, similarity in query_matches]
+            for query_matches in distance_matches]
+
+def GetValues(startTime, endTime, startPoint, endPoint, fileName, isOneHanded, add_to_db=False, on_matches=None,
+              cancel=None, on_stage=None):
+    """Extract features for the selected clip and match them against the sign database
+    
+    If on_matches is given, matching streams provisional results: it is called as
+    on_matches(matches, examined, total) after every candidate batch, and returning
+    True from it stops the search early with the current top matches.
+    on_stage(stage, done, total) reports the decode, face, hands, features and matching
+    stages; setting the cancel event raises PipelineCancelled before matching starts
+    (use on_matches to stop the search itself).
+    """
+    processed_features, origin, scaling_factor = extract_sign_features(
+        startTime, endTime, startPoint, endPoint, fileName, isOneHanded, landmark_cache=LANDMARK_CACHE_ENABLED,
+        cancel=cancel, on_stage=on_stage
+    )
+    if processed_features is None:
+        return [], origin, scaling_factor, None
 
+    try:
+        # Save to database if requested
+        if add_to_db:
+            save_sign_to_database(fileName, processed_features, isOneHanded,
+                                  (endTime - startTime) / 1000.0, origin, scaling_factor)
+
+        _enter_stage("matching", cancel, on_stage)
+        matches = match_sign_features(processed_features, isOneHanded, top_k=10, on_matches=on_matches,
+                                      latency_budget=MATCH_LATENCY_BUDGET)
         return matches, origin, scaling_factor, processed_features
 
-    except ffmpeg.Error as e:
-        print("FFmpeg error:", e.stderr.decode() if e.stderr else str(e))
-        print(f"Failed to process video: {fileName}")
-        return [], None, None, None
+    except PipelineCancelled:
+        raise
     except Exception as e:
         print(f"Error processing video: {str(e)}")
         import traceback
         traceback.print_exc()
-        return [], None, None, None
\ No newline at end of file
+        return [], None, None, None
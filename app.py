@@ -1,14 +1,16 @@
 import sys
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QFileDialog,
     QVBoxLayout, QSlider, QWidget, QCheckBox, QListWidget,
-    QLabel, QStackedWidget, QGraphicsScene, QGraphicsView
+    QLabel, QStackedWidget, QGraphicsScene, QGraphicsView, QProgressBar
 )
 from PyQt6.QtMultimedia import QMediaPlayer
 from PyQt6.QtMultimediaWidgets import QGraphicsVideoItem
-from PyQt6.QtCore import Qt, QUrl, QRectF, QPoint
+from PyQt6.QtCore import Qt, QUrl, QRectF, QPoint, QThread, pyqtSignal
 from PyQt6.QtGui import QPen, QColor
-from VideoTrimAndCropping import GetValues
+from VideoTrimAndCropping import GetValues, prepare_landmark_cache
+from frame_pipeline import PipelineCancelled
 from database_manager import SignDatabase
 import cv2
 
@@ -58,13 +60,101 @@ class VideoGraphicsView(QGraphicsView):
             self.endPoint = self.mapToScene(event.pos())
 
     def get_selection_points(self):
+        """ROI corners in source video pixels (GetValues crops the decoded frames with them)"""
         if self.currentRect:
             rect = self.currentRect.rect()
-            start = self.mapFromScene(rect.topLeft())
-            end = self.mapFromScene(rect.bottomRight())
+            bounds = self.video_item.boundingRect()
+            native = self.video_item.nativeSize()
+            if bounds.width() <= 0 or bounds.height() <= 0 or native.width() <= 0 or native.height() <= 0:
+                return None, None
+            
+            # The video is letterboxed inside the item, so map through its drawn rectangle
+            scale_x = native.width() / bounds.width()
+            scale_y = native.height() / bounds.height()
+            start = QPoint(int((rect.left() - bounds.x()) * scale_x), int((rect.top() - bounds.y()) * scale_y))
+            end = QPoint(int((rect.right() - bounds.x()) * scale_x), int((rect.bottom() - bounds.y()) * scale_y))
             return start, end
         return None, None
 
+class BackgroundTrackingWorker(QThread):
+    """Tracks a newly loaded video (full frame, current handedness) into the landmark cache while the user picks the clip"""
+    progress = pyqtSignal(int, int)
+    done = pyqtSignal(bool)
+
+    def __init__(self, fileName, isOneHanded, parent=None):
+        super().__init__(parent)
+        self.fileName = fileName
+        self.isOneHanded = isOneHanded
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Stop before the next frame; the partial result is discarded"""
+        self._cancel.set()
+
+    def run(self):
+        try:
+            cached = prepare_landmark_cache(self.fileName, self.isOneHanded, cancel=self._cancel,
+                                            on_progress=self.progress.emit)
+        except Exception as e:
+            print(f"Background tracking failed: {str(e)}")
+            cached = False
+        self.done.emit(cached and not self._cancel.is_set())
+
+
+class ProcessingWorker(QThread):
+    """Runs GetValues for one clip off the UI thread
+
+    stop() cancels extraction at the next stage boundary or frame; once matching has
+    started it ends the search early with the matches found so far.
+    """
+    stage = pyqtSignal(str, int, int)
+    matchesUpdated = pyqtSignal(list, int, int)
+    succeeded = pyqtSignal(list, bool)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, startTime, endTime, startPoint, endPoint, fileName, isOneHanded, parent=None):
+        super().__init__(parent)
+        self.arguments = (startTime, endTime, startPoint, endPoint, fileName, isOneHanded)
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _on_matches(self, matches, examined, total):
+        self.matchesUpdated.emit(list(matches), examined, total)
+        return self._stop.is_set()
+
+    def run(self):
+        try:
+            matches, origin, scaling_factor, features = GetValues(
+                *self.arguments,
+                on_matches=self._on_matches,
+                cancel=self._stop,
+                on_stage=self.stage.emit
+            )
+        except PipelineCancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            print(f"Error processing video: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(list(matches), self._stop.is_set())
+
+
+# Progress label text per GetValues stage
+STAGE_LABELS = {
+    "decode": "Decoding and tracking",
+    "face": "Normalizing to the face",
+    "hands": "Processing hand trajectories",
+    "features": "Extracting features",
+    "matching": "Matching against the database"
+}
+
+
 class VideoEditor(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -76,6 +166,11 @@ class VideoEditor(QMainWindow):
         self.startTimeSet = False
         self.endTimeSet = False
         self.isOneHanded = False
+        self.trackingWorker = None
+        self.retiredWorkers = []
+        self.processingWorker = None
+        # (examined, total) from the latest provisional matches of the running search
+        self.lastComparison = None
         
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -116,6 +211,17 @@ class VideoEditor(QMainWindow):
         self.loadPlayButton.clicked.connect(self.loadOrPlayVideo)
         layout.addWidget(self.loadPlayButton)
         
+        self.openButton = QPushButton('Open Another Video')
+        self.openButton.clicked.connect(self.openVideo)
+        self.openButton.setEnabled(False)
+        layout.addWidget(self.openButton)
+        
+        # Background tracking of the loaded video (see BackgroundTrackingWorker)
+        self.trackingProgress = QProgressBar()
+        self.trackingProgress.setFormat("Tracking hands: %p%")
+        self.trackingProgress.setVisible(False)
+        layout.addWidget(self.trackingProgress)
+        
         self.setStartButton = QPushButton('Set Start Time')
         self.setStartButton.clicked.connect(self.setStartTime)
         layout.addWidget(self.setStartButton)
@@ -149,6 +255,14 @@ class VideoEditor(QMainWindow):
         self.resultsList.setStyleSheet("QListWidget { font-size: 14px; padding: 5px; }")
         layout.addWidget(self.resultsList)
         
+        self.progressLabel = QLabel("")
+        layout.addWidget(self.progressLabel)
+        
+        self.stopButton = QPushButton("Stop")
+        self.stopButton.clicked.connect(self.stopMatching)
+        self.stopButton.setEnabled(False)
+        layout.addWidget(self.stopButton)
+        
         self.backButton = QPushButton("Back to Video")
         self.backButton.clicked.connect(self.show_video_page)
         layout.addWidget(self.backButton)
@@ -168,16 +282,87 @@ class VideoEditor(QMainWindow):
                 self.mediaPlayer.play()
                 self.loadPlayButton.setText('Pause')
         else:
-            fileName, _ = QFileDialog.getOpenFileName(self, "Open Video File")
-            if fileName:
-                self.fileName = fileName
-                self.mediaPlayer.setSource(QUrl.fromLocalFile(fileName))
-                self.videoLoaded = True
-                self.loadPlayButton.setText('Play')
-                
-                self.trimButton.setEnabled(True)
-                
-                self.playVideo()
+            self.openVideo()
+
+    def openVideo(self):
+        fileName, _ = QFileDialog.getOpenFileName(self, "Open Video File")
+        if fileName:
+            self.fileName = fileName
+            self.mediaPlayer.setSource(QUrl.fromLocalFile(fileName))
+            self.videoLoaded = True
+            self.loadPlayButton.setText('Play')
+            self.openButton.setEnabled(True)
+            self.startTime = self.endTime = 0
+            self.startTimeSet = self.endTimeSet = False
+            
+            self.trimButton.setEnabled(True)
+            self.retireProcessingWorker()
+            self.startBackgroundTracking(fileName)
+            
+            self.playVideo()
+
+    def startBackgroundTracking(self, fileName):
+        """Track the whole video now, so Process only has to slice, resample and match"""
+        self.cancelBackgroundTracking()
+        worker = BackgroundTrackingWorker(fileName, self.isOneHanded, self)
+        worker.progress.connect(self.trackingProgressChanged)
+        worker.done.connect(lambda cached, worker=worker: self.trackingDone(worker, cached))
+        worker.finished.connect(lambda worker=worker: self.workerFinished(worker))
+        self.trackingWorker = worker
+        self.trackingProgress.setRange(0, 0)
+        self.trackingProgress.setVisible(True)
+        worker.start()
+
+    def cancelBackgroundTracking(self):
+        # The worker stops at its next frame; keep a reference until its thread has finished
+        if self.trackingWorker is not None:
+            worker = self.trackingWorker
+            self.trackingWorker = None
+            worker.cancel()
+            worker.progress.disconnect()
+            worker.done.disconnect()
+            self.retiredWorkers.append(worker)
+        self.trackingProgress.setVisible(False)
+
+    def retireProcessingWorker(self):
+        """Stop the running Process job without letting its late signals reach the UI"""
+        if self.processingWorker is None:
+            return
+        worker = self.processingWorker
+        self.processingWorker = None
+        worker.stop()
+        for signal in (worker.stage, worker.matchesUpdated, worker.succeeded, worker.cancelled, worker.failed):
+            signal.disconnect()
+        self.retiredWorkers.append(worker)
+        self.stopButton.setEnabled(False)
+        self.progressLabel.setText("")
+        self.resultsList.clear()
+
+    def trackingProgressChanged(self, done, total):
+        if self.sender() is not self.trackingWorker:
+            return
+        if total > 0:
+            self.trackingProgress.setRange(0, total)
+            self.trackingProgress.setValue(min(done, total))
+
+    def trackingDone(self, worker, cached):
+        if worker is not self.trackingWorker:
+            return
+        self.trackingProgress.setVisible(False)
+        print(f"Background tracking {'finished' if cached else 'did not complete'} for {worker.fileName}")
+
+    def workerFinished(self, worker):
+        if worker is self.trackingWorker:
+            self.trackingWorker = None
+        elif worker in self.retiredWorkers:
+            self.retiredWorkers.remove(worker)
+
+    def closeEvent(self, event):
+        self.cancelBackgroundTracking()
+        self.retireProcessingWorker()
+        for worker in list(self.retiredWorkers):
+            worker.wait()
+        super().closeEvent(event)
 
     def playVideo(self):
         self.mediaPlayer.play()
@@ -195,6 +380,9 @@ class VideoEditor(QMainWindow):
 
     def oneHandedCheckChanged(self, state):
         self.isOneHanded = state == Qt.CheckState.Checked.value
+        # Handedness is part of the landmark cache key: track the loaded video again for the new setting
+        if self.videoLoaded:
+            self.startBackgroundTracking(self.fileName)
 
     def trimVideo(self):
         try:
@@ -232,32 +420,102 @@ class VideoEditor(QMainWindow):
                     print("Could not open video to get duration")
                     return
                     
-            matches, origin, scaling_factor, features = GetValues(
+            # Processing runs on a worker thread; the window stays responsive and Stop cancels it
+            worker = ProcessingWorker(
                 self.startTime,
                 self.endTime,
                 start_point,
                 end_point,
                 self.fileName,
-                self.isOneHanded
+                self.isOneHanded,
+                self
             )
-                
+            worker.stage.connect(self.stageChanged)
+            worker.matchesUpdated.connect(self.matchesUpdated)
+            worker.succeeded.connect(self.processingSucceeded)
+            worker.cancelled.connect(self.processingCancelled)
+            worker.failed.connect(self.processingFailed)
+            worker.finished.connect(lambda worker=worker: self.processingFinished(worker))
+            self.processingWorker = worker
+            self.lastComparison = None
+
             self.resultsList.clear()
-                
-            if matches:
-                    for i, (sign_name, similarity) in enumerate(matches, 1):
-                        self.resultsList.addItem(
-                            f"{i}. {sign_name} (Similarity: {similarity:.2f}%)"
-                        )
-            else:
-                    self.resultsList.addItem("No matching signs found")
-                
+            self.progressLabel.setText("Starting...")
+            self.trimButton.setEnabled(False)
+            self.stopButton.setEnabled(True)
             self.show_results_page()
+            worker.start()
                     
         except Exception as e:
             print(f"Error processing video: {str(e)}")
             import traceback
             traceback.print_exc()
 
+    def stageChanged(self, stage, done, total):
+        # Signals already queued by a retired worker can still arrive after it was disconnected
+        if self.sender() is not self.processingWorker:
+            return
+        label = STAGE_LABELS.get(stage, stage)
+        if total > 0:
+            label += f" ({done}/{total} frames)"
+        self.progressLabel.setText(label + "...")
+
+    def processingSucceeded(self, matches, stopped):
+        if self.sender() is not self.processingWorker:
+            return
+        self.showMatches(matches)
+        if stopped:
+            self.progressLabel.setText("Stopped early")
+        elif self.lastComparison is not None and self.lastComparison[0] < self.lastComparison[1]:
+            # The matching time budget ran out before the whole database was compared
+            self.progressLabel.setText(
+                f"Approximate: compared {self.lastComparison[0]} of {self.lastComparison[1]} signs")
+        else:
+            self.progressLabel.setText("")
+
+    def processingCancelled(self):
+        if self.sender() is not self.processingWorker:
+            return
+        self.resultsList.clear()
+        self.progressLabel.setText("Cancelled")
+
+    def processingFailed(self, message):
+        if self.sender() is not self.processingWorker:
+            return
+        self.showMatches([])
+        self.progressLabel.setText(f"Error: {message}")
+
+    def processingFinished(self, worker):
+        if worker is not self.processingWorker:
+            self.workerFinished(worker)
+            return
+        self.processingWorker = None
+        self.stopButton.setEnabled(False)
+        self.trimButton.setEnabled(True)
+
+    def showMatches(self, matches):
+        self.resultsList.clear()
+        if matches:
+            for i, (sign_name, similarity) in enumerate(matches, 1):
+                self.resultsList.addItem(
+                    f"{i}. {sign_name} (Similarity: {similarity:.2f}%)"
+                )
+        else:
+            self.resultsList.addItem("No matching signs found")
+
+    def matchesUpdated(self, matches, examined, total):
+        """Show provisional matches while the database search is still running"""
+        if self.sender() is not self.processingWorker:
+            return
+        self.showMatches(matches)
+        self.lastComparison = (examined, total)
+        self.progressLabel.setText(f"Compared {examined} of {total} signs...")
+
+    def stopMatching(self):
+        if self.processingWorker is not None:
+            self.processingWorker.stop()
+            self.progressLabel.setText("Stopping...")
+
     def setPosition(self, position):
         self.mediaPlayer.setPosition(position)
     
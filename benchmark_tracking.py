@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from evaluate import parse_manifest, TOP_K_LEVELS
+from dtw_utils import as_sequence, dtw_distance
+from HandCoordinates import TRACKING_LADDER
+
+# Tracker settings compared against the full-rate baseline ("full" must stay first)
+TRACKER_CONFIGS = {
+    "full": {"stride": 1},
+    "sparse": {"stride": "auto"},
+    "gated": {"motion_gate": True},
+    "sparse_gated": {"stride": "auto", "motion_gate": True},
+}
+# Resolution ladder: one config per tracking width
+TRACKER_CONFIGS.update({f"width_{width}": {"tracking_width": width} for width in TRACKING_LADDER})
+# GetValues' landmark cache path at full rate: "cold" drops the clip's cached landmarks first, so it tracks
+# the range and stores it; "warm" then slices the stored landmarks (run it after cache_cold)
+TRACKER_CONFIGS.update({"cache_cold": {"stride": 1, "landmark_cache": "cold"},
+                        "cache_warm": {"stride": 1, "landmark_cache": "warm"}})
+TRAJECTORY_FEATURES = ['centroids_dom_arr', 'centroids_nondom_arr', 'l_delta_arr']
+# The cache configs track the same crop at the same rate as "full", so their trajectories must match it
+CACHE_PARITY_TOLERANCE = 1e-6
+
+
+def trajectory_error(reference, candidate):
+    """Mean per-frame Euclidean distance between two resampled trajectories (face units), NaN-aware"""
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    if reference.shape != candidate.shape or reference.size == 0:
+        return None
+    distances = np.linalg.norm(reference - candidate, axis=1)
+    distances = distances[~np.isnan(distances)]
+    return float(distances.mean()) if len(distances) else None
+
+
+def _summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {"mean": float(np.mean(values)), "p95": float(np.percentile(values, 95)), "max": float(np.max(values))}
+
+
+def benchmark(queries, configs=TRACKER_CONFIGS, db_dir=None, top_k=10):
+    from VideoTrimAndCropping import extract_sign_features, match_sign_features
+    from landmark_cache import remove_video_landmarks
+
+    records = []
+    for number, query in enumerate(queries, 1):
+        x1, y1, x2, y2 = query["roi"]
+        record = {"path": query["path"], "sign": query["sign"], "start_ms": query["start_ms"], "configs": {}}
+        baseline = None
+
+        for name, options in configs.items():
+            timings, stats = {}, {}
+            options = dict(options)
+            cache_mode = options.pop("landmark_cache", None)
+            if cache_mode == "cold":
+                remove_video_landmarks(query["path"])
+            extraction_start = time.time()
+            features, _, _ = extract_sign_features(
+                query["start_ms"], query["end_ms"], (x1, y1), (x2, y2), query["path"], query["is_one_handed"],
+                timings=timings, tracker_options=options, tracker_stats=stats, landmark_cache=cache_mode is not None
+            )
+            timings["extraction"] = time.time() - extraction_start
+            result = {"timings": timings, "stats": stats, "ok": features is not None}
+
+            if features is not None and baseline is not None:
+                result["error"] = {key: trajectory_error(baseline[key], features[key])
+                                   for key in TRAJECTORY_FEATURES if key in baseline and key in features}
+                result["dtw_dom"] = dtw_distance(as_sequence(baseline['centroids_dom_arr']),
+                                                 as_sequence(features['centroids_dom_arr']))
+            if features is not None and db_dir:
+                stage_start = time.time()
+                matches = match_sign_features(features, query["is_one_handed"], top_k=top_k, db_dir=db_dir,
+                                              exclude_paths={query["path"]})
+                timings["matching"] = time.time() - stage_start
+                names = [n for n, _ in matches]
+                result["top_match"] = names[0] if names else None
+                result["rank"] = names.index(query["sign"]) + 1 if query["sign"] in names else None
+
+            if name == next(iter(configs)):
+                baseline = features
+            record["configs"][name] = result
+
+        records.append(record)
+        print(f"[{number}/{len(queries)}] {query['path']}: " + ", ".join(
+            f"{n} {r['timings'].get('hands', 0) * 1000:.0f} ms/{r['stats'].get('inferences', 0)} inf"
+            for n, r in record["configs"].items()))
+
+    baseline_name = next(iter(configs))
+    summary = {}
+    for name in configs:
+        results = [r["configs"][name] for r in records]
+        usable = [(r["configs"][baseline_name], r["configs"][name]) for r in records
+                  if r["configs"][baseline_name]["ok"] and r["configs"][name]["ok"]]
+        base_time = sum(b["timings"].get("hands", 0) for b, _ in usable)
+        config_time = sum(c["timings"].get("hands", 0) for _, c in usable)
+        extraction_time = sum(c["timings"].get("extraction", 0) for _, c in usable)
+        frames = sum(c["stats"].get("frames", 0) for _, c in usable)
+        inferences = sum(c["stats"].get("inferences", 0) for _, c in usable)
+        gated = sum(c["stats"].get("gated", 0) for _, c in usable)
+        # Detection rate over every clip, including the ones this config lost entirely
+        detected = sum(r["stats"].get("detected", 0) for r in results)
+        all_frames = sum(r["stats"].get("frames", 0) for r in results)
+
+        entry = {
+            "clips": len(results),
+            "failed": sum(1 for r in results if not r["ok"]),
+            "hands_ms_mean": 1000.0 * config_time / len(usable) if usable else None,
+            "hands_speedup": base_time / config_time if config_time > 0 else None,
+            # End to end, so cache runs are comparable: their tracking is not all in the hands stage
+            "extraction_ms_mean": 1000.0 * extraction_time / len(usable) if usable else None,
+            "cache_hits": sum(1 for r in results if r["stats"].get("cached")),
+            "hands_fps": frames / config_time if config_time > 0 else None,
+            "detection_rate": detected / all_frames if all_frames else None,
+            "inference_fraction": inferences / frames if frames else None,
+            "gated_fraction": gated / frames if frames else None,
+            "trajectory_error": {key: _summarize([c.get("error", {}).get(key) for _, c in usable])
+                                 for key in TRAJECTORY_FEATURES},
+            "dtw_dom": _summarize([c.get("dtw_dom") for _, c in usable])
+        }
+        if configs[name].get("landmark_cache"):
+            worst = [summary_error["max"] for summary_error in entry["trajectory_error"].values() if summary_error]
+            entry["matches_full"] = bool(usable) and len(usable) == len(results) and \
+                all(error <= CACHE_PARITY_TOLERANCE for error in worst)
+        if db_dir:
+            matched = [r for r in results if r["ok"]]
+            entry["accuracy"] = {f"top{k}": sum(1 for r in matched if r.get("rank") and r["rank"] <= k) / len(matched)
+                                 if matched else 0.0 for k in TOP_K_LEVELS}
+            entry["top1_agreement"] = sum(1 for b, c in usable if b.get("top_match") == c.get("top_match")) / len(usable) \
+                if usable else None
+        summary[name] = entry
+
+    return {"configs": configs, "summary": summary, "clips": records}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare hand tracking settings against full-rate tracking.')
+    parser.add_argument('manifest', type=str,
+                        help='CSV of path,sign_name,start_ms,end_ms[,one_handed[,x1,y1,x2,y2]] (as evaluate.py)')
+    parser.add_argument('--configs', type=str, default=",".join(TRACKER_CONFIGS),
+                        help=f'Comma separated subset of: {", ".join(TRACKER_CONFIGS)} (full is always included)')
+    parser.add_argument('--db_dir', type=str, default=None,
+                        help='Also match every clip against this database and report accuracy')
+    parser.add_argument('--output', '-o', type=str, default="tracking_benchmark.json",
+                        help='Path of the JSON report (default: tracking_benchmark.json)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        print(f"Error: Manifest not found: {args.manifest}")
+        sys.exit(1)
+    names = ["full"] + [n.strip() for n in args.configs.split(',') if n.strip() and n.strip() != "full"]
+    unknown = [n for n in names if n not in TRACKER_CONFIGS]
+    if unknown:
+        print(f"Error: unknown config(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    queries = parse_manifest(args.manifest)
+    report = benchmark(queries, {n: TRACKER_CONFIGS[n] for n in names}, args.db_dir)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+    print(f"Tracking benchmark written to {args.output}")
+
+    for name, entry in report["summary"].items():
+        error = (entry["trajectory_error"].get("centroids_dom_arr") or {}).get("mean")
+        speedup = entry["hands_speedup"]
+        extraction = entry["extraction_ms_mean"]
+        fraction = entry["inference_fraction"]
+        fps = entry["hands_fps"]
+        detection = entry["detection_rate"]
+        print(f"{name:>12}: speedup {speedup:.2f}x" if speedup else f"{name:>12}: speedup n/a", end="")
+        print(f", {fps:.0f} frames/s" if fps else "", end="")
+        print(f", extraction {extraction:.0f} ms" if extraction is not None else "", end="")
+        print(f", hands detected in {detection:.0%}" if detection is not None else "", end="")
+        print(f", model on {fraction:.0%} of frames" if fraction is not None else "", end="")
+        print(f", dominant trajectory error {error:.4f}" if error is not None else "")
+        if entry.get("matches_full") is False:
+            print(f"ERROR: {name} features differ from direct full-rate tracking")
+    if any(entry.get("matches_full") is False for entry in report["summary"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
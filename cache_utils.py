@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+import platform
+
+# Per-user cache for things that are expensive to recompute but safe to throw away
+# (hardware probes, decoder benchmarks, ...). Override with SIGN_CACHE_DIR.
+CACHE_DIR = os.environ.get(
+    "SIGN_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "sign_recognition")
+)
+
+
+def host_key():
+    """Identify this machine, so a shared home directory doesn't mix up per-host results"""
+    return f"{platform.node()}-{platform.system()}-{platform.machine()}"
+
+
+def cache_path(name):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+def load_json_cache(name):
+    """Load a JSON cache file, returning {} if it is missing or unreadable"""
+    try:
+        with open(cache_path(name), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json_cache(name, data):
+    """Write a JSON cache file atomically; failures are reported but not fatal"""
+    try:
+        path = cache_path(name)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write cache {name}: {e}")
+
+
+def file_content_hash(path, block_size=1 << 20):
+    """Cheap content fingerprint: size plus the first and last block_size bytes of the file
+
+    Identifies a video across renames and copies without reading all of it.
+    """
+    digest = hashlib.sha1()
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(block_size, size - block_size))
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
@@ -0,0 +1,149 @@
+import numpy as np
+
+
+def as_sequence(sequence):
+    """Convert a stored trajectory to the float array DTWServer actually sees (NaN -> 0.0)"""
+    # Mirror SignMatcher.convert_for_java: float32 round-trip, NaN replaced with 0.0
+    arr = np.asarray(sequence, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr.reshape(-1, 1)
+    return np.nan_to_num(arr, nan=0.0).astype(np.float64)
+
+
+def dtw_distance(seq1, seq2):
+    """Unconstrained DTW with Euclidean frame cost, same recurrence as DTW.java"""
+    distance, _ = dtw_path(seq1, seq2)
+    return distance
+
+
+def dtw_path(seq1, seq2):
+    """DTW distance plus the optimal warping path as a list of (i, j) pairs"""
+    a = as_sequence(seq1)
+    b = as_sequence(seq2)
+    n, m = len(a), len(b)
+    if n == 0 or m == 0:
+        return float('inf'), []
+
+    cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+    dtw = np.full((n + 1, m + 1), np.inf)
+    dtw[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            dtw[i, j] = cost[i - 1, j - 1] + min(dtw[i - 1, j], dtw[i, j - 1], dtw[i - 1, j - 1])
+
+    # Backtrack from the end of both sequences
+    path = []
+    i, j = n, m
+    while i > 0 and j > 0:
+        path.append((i - 1, j - 1))
+        steps = (dtw[i - 1, j - 1], dtw[i - 1, j], dtw[i, j - 1])
+        step = int(np.argmin(steps))
+        if step == 0:
+            i, j = i - 1, j - 1
+        elif step == 1:
+            i -= 1
+        else:
+            j -= 1
+    path.reverse()
+    return float(dtw[n, m]), path
+
+
+def batch_dtw_distance(query, candidates):
+    """DTW from one query to a stack of equal-length candidates, shape (N, m, d) -> (N,)"""
+    q = as_sequence(query)
+    if len(candidates) == 0:
+        return np.zeros(0)
+    X = np.stack([as_sequence(c) for c in candidates])
+
+    n, m = len(q), X.shape[1]
+    cost = np.sqrt(((q[None, :, None, :] - X[:, None, :, :]) ** 2).sum(axis=3))
+    prev = np.full((len(X), m + 1), np.inf)
+    prev[:, 0] = 0.0
+    for i in range(n):
+        row = np.full((len(X), m + 1), np.inf)
+        for j in range(1, m + 1):
+            best = np.minimum(np.minimum(prev[:, j], row[:, j - 1]), prev[:, j - 1])
+            row[:, j] = cost[:, i, j - 1] + best
+        prev = row
+    return prev[:, m]
+
+
+def point_box_distance(points, box_min, box_max):
+    """Euclidean distance from each point to an axis-aligned box (0 inside the box)"""
+    points = np.asarray(points, dtype=np.float64)
+    gap = np.maximum(np.maximum(box_min - points, points - box_max), 0.0)
+    return np.sqrt((gap ** 2).sum(axis=-1))
+
+
+def box_lower_bound(query, box_first, box_all, box_last):
+    """Lower bound on DTW(query, x) for every x whose frames lie in the given boxes
+
+    Every query row owns at least one cell of the warping path, rows are disjoint,
+    and the first/last rows always contain the (0, 0) and (n-1, m-1) cells, so
+    summing per-row distances to the boxes never exceeds the true DTW cost.
+    """
+    q = as_sequence(query)
+    if len(q) == 0:
+        return 0.0
+
+    all_min, all_max = np.asarray(box_all[0]), np.asarray(box_all[1])
+    if len(q) == 1:
+        return float(point_box_distance(q, all_min, all_max).sum())
+
+    bound = point_box_distance(q[0], np.asarray(box_first[0]), np.asarray(box_first[1]))
+    bound += point_box_distance(q[-1], np.asarray(box_last[0]), np.asarray(box_last[1]))
+    bound += point_box_distance(q[1:-1], all_min, all_max).sum()
+    return float(bound)
+
+
+def batch_lower_bound(query, candidates):
+    """Per-candidate DTW lower bound (endpoints plus nearest frame per query row), shape (N,)"""
+    q = as_sequence(query)
+    if len(candidates) == 0:
+        return np.zeros(0)
+    X = np.stack([as_sequence(c) for c in candidates])
+
+    cost = np.sqrt(((q[None, :, None, :] - X[:, None, :, :]) ** 2).sum(axis=3))
+    if len(q) == 1:
+        return cost[:, 0, :].sum(axis=1)
+    bound = cost[:, 0, 0] + cost[:, -1, -1]
+    if len(q) > 2:
+        bound += cost[:, 1:-1, :].min(axis=2).sum(axis=1)
+    return bound
+
+
+def sequence_boxes(sequences):
+    """Bounding boxes (first frames, all frames, last frames) over a group of sequences"""
+    seqs = [as_sequence(s) for s in sequences]
+    firsts = np.stack([s[0] for s in seqs])
+    lasts = np.stack([s[-1] for s in seqs])
+    frames = np.concatenate(seqs)
+    return (
+        [firsts.min(axis=0).tolist(), firsts.max(axis=0).tolist()],
+        [frames.min(axis=0).tolist(), frames.max(axis=0).tolist()],
+        [lasts.min(axis=0).tolist(), lasts.max(axis=0).tolist()],
+    )
+
+
+def dba_average(sequences, iterations=10, initial=None):
+    """DTW Barycenter Averaging (Petitjean et al.) of a group of sequences"""
+    seqs = [as_sequence(s) for s in sequences]
+    if not seqs:
+        return None
+    average = as_sequence(initial) if initial is not None else seqs[0].copy()
+
+    for _ in range(iterations):
+        sums = np.zeros_like(average)
+        counts = np.zeros(len(average))
+        for seq in seqs:
+            _, path = dtw_path(average, seq)
+            for i, j in path:
+                sums[i] += seq[j]
+                counts[i] += 1
+        updated = sums / np.maximum(counts, 1)[:, None]
+        if np.allclose(updated, average):
+            average = updated
+            break
+        average = updated
+
+    return average
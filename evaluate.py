@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from HandCoordinates import init_tracking_worker
+
+STAGES = ["decode", "face", "hands", "crops", "features", "matching"]
+TOP_K_LEVELS = [1, 5, 10]
+
+
+def parse_manifest(manifest_file):
+    """Read query clips: path, true sign name, start ms, end ms[, one-handed[, x1, y1, x2, y2]]"""
+    queries = []
+    with open(manifest_file, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = [p.strip() for p in line.split(',')]
+            if len(parts) < 4:
+                print(f"Skipping manifest line {line_number}: expected path,sign,start_ms,end_ms")
+                continue
+
+            query = {
+                "path": parts[0],
+                "sign": parts[1],
+                "start_ms": float(parts[2]),
+                "end_ms": float(parts[3]),
+                "is_one_handed": parts[4].lower() == 'true' if len(parts) > 4 else True,
+                # No ROI means the whole frame; GetValues clamps the box to the video size
+                "roi": [int(v) for v in parts[5:9]] if len(parts) >= 9 else [0, 0, 1 << 20, 1 << 20]
+            }
+            queries.append(query)
+    return queries
+
+
+def _extract_query(query, landmark_cache=False):
+    """Worker: run the GetValues feature extraction stages for one query clip
+
+    Returns (query, features, timings, tracker stats, error); stats["cached"] tells whether a
+    landmark cache run was served from the cache.
+    """
+    from VideoTrimAndCropping import extract_sign_features
+
+    timings, stats = {}, {}
+    extraction_start = time.time()
+    try:
+        x1, y1, x2, y2 = query["roi"]
+        features, _, _ = extract_sign_features(
+            query["start_ms"], query["end_ms"], (x1, y1), (x2, y2),
+            query["path"], query["is_one_handed"], timings=timings, tracker_stats=stats,
+            landmark_cache=landmark_cache
+        )
+        # Decode runs ahead of the other stages on its own thread, so stage times overlap
+        timings["extraction"] = time.time() - extraction_start
+        return query, features, timings, stats, None
+    except Exception as e:
+        traceback.print_exc()
+        timings["extraction"] = time.time() - extraction_start
+        return query, None, timings, stats, str(e)
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values_ms = np.asarray(values) * 1000.0
+    return {
+        "count": len(values),
+        "mean": float(values_ms.mean()),
+        "p50": float(np.percentile(values_ms, 50)),
+        "p95": float(np.percentile(values_ms, 95)),
+        "p99": float(np.percentile(values_ms, 99))
+    }
+
+
+def evaluate(queries, db_dir="sign_database", num_workers=None, top_k=10, exclude_self=False, landmark_cache=None):
+    """Extract every query, then match them all in one batch
+
+    landmark_cache=None follows GetValues (LANDMARK_CACHE_ENABLED). Each query's matching time
+    is its share of the batch.
+    """
+    from VideoTrimAndCropping import match_sign_features_many, LANDMARK_CACHE_ENABLED
+
+    if landmark_cache is None:
+        landmark_cache = LANDMARK_CACHE_ENABLED
+    num_workers = num_workers if num_workers else max(1, multiprocessing.cpu_count() - 1)
+    results = []
+    overall_start_time = time.time()
+
+    # Feature extraction is CPU bound and independent per clip; matching goes through
+    # the shared Java DTW server from this process once every extraction has finished
+    extracted = []
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=init_tracking_worker) as executor:
+        futures = [executor.submit(_extract_query, query, landmark_cache) for query in queries]
+        for future in as_completed(futures):
+            query, features, timings, stats, error = future.result()
+            record = {
+                "path": query["path"],
+                "sign": query["sign"],
+                "start_ms": query["start_ms"],
+                "end_ms": query["end_ms"],
+                "is_one_handed": query["is_one_handed"],
+                "timings": timings,
+                "landmarks_cached": stats.get("cached", False),
+                "rank": None,
+                "matches": []
+            }
+
+            if features is None:
+                record["error"] = error or "no_features"
+                results.append(record)
+                print(f"No features for {query['path']}")
+                continue
+
+            extracted.append((record, features))
+            results.append(record)
+            print(f"Extracted {query['sign']} ({len(results)}/{len(queries)})")
+
+    matching_start = time.time()
+    all_matches = match_sign_features_many(
+        [(features, record["is_one_handed"], {record["path"]} if exclude_self else None)
+         for record, features in extracted],
+        top_k=top_k, db_dir=db_dir
+    )
+    matching_time = time.time() - matching_start
+    for (record, _), matches in zip(extracted, all_matches):
+        record["timings"]["matching"] = matching_time / len(extracted)
+        names = [name for name, _ in matches]
+        record["rank"] = names.index(record["sign"]) + 1 if record["sign"] in names else None
+        record["matches"] = [[name, float(similarity)] for name, similarity in matches]
+        print(f"{record['sign']}: rank {record['rank']}")
+
+    evaluated = [r for r in results if "error" not in r]
+    summary = {
+        "queries": len(queries),
+        "evaluated": len(evaluated),
+        "failed": len(results) - len(evaluated),
+        "landmark_cache_hits": sum(1 for r in results if r["landmarks_cached"]),
+        "matching_batch_seconds": matching_time,
+        "total_time_seconds": time.time() - overall_start_time,
+        "accuracy": {},
+        "latency_ms": {}
+    }
+    # Queries that failed extraction count as misses
+    for k in TOP_K_LEVELS:
+        hits = sum(1 for r in evaluated if r["rank"] is not None and r["rank"] <= k)
+        summary["accuracy"][f"top{k}"] = hits / len(results) if results else 0.0
+    for stage in STAGES + ["total"]:
+        if stage == "total":
+            values = [r["timings"].get("extraction", 0) + r["timings"].get("matching", 0) for r in evaluated]
+        else:
+            values = [r["timings"][stage] for r in results if stage in r["timings"]]
+        summary["latency_ms"][stage] = _percentiles(values)
+
+    return {
+        "config": {
+            "db_dir": db_dir,
+            "workers": num_workers,
+            "top_k": top_k,
+            "exclude_self": exclude_self,
+            "landmark_cache": landmark_cache
+        },
+        "summary": summary,
+        "queries": sorted(results, key=lambda r: (r["path"], r["start_ms"]))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate sign matching against a labeled set of query clips.')
+    parser.add_argument('manifest', type=str,
+                        help='CSV of path,sign_name,start_ms,end_ms[,one_handed[,x1,y1,x2,y2]]')
+    parser.add_argument('--db_dir', type=str, default="sign_database",
+                        help='Directory containing sign_data.json')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of feature extraction processes (default: CPU count - 1)')
+    parser.add_argument('--top_k', type=int, default=10,
+                        help='Number of matches retrieved per query (default: 10)')
+    parser.add_argument('--exclude_self', action='store_true',
+                        help='Do not let a query match its own database entry')
+    parser.add_argument('--no_landmark_cache', action='store_true',
+                        help='Track every query range directly instead of going through the landmark cache as GetValues does')
+    parser.add_argument('--output', '-o', type=str, default="evaluation_results.json",
+                        help='Path of the JSON report (default: evaluation_results.json)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        print(f"Error: Manifest not found: {args.manifest}")
+        sys.exit(1)
+
+    queries = parse_manifest(args.manifest)
+    if not queries:
+        print("No queries found in manifest.")
+        sys.exit(1)
+
+    report = evaluate(queries, args.db_dir, args.workers, args.top_k, args.exclude_self,
+                      landmark_cache=False if args.no_landmark_cache else None)
+
+    # Sorted keys keep reports from different runs diffable
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+    print(f"Evaluation report written to {args.output}")
+
+    accuracy = report["summary"]["accuracy"]
+    print(f"Top-1: {accuracy.get('top1', 0):.3f}  Top-5: {accuracy.get('top5', 0):.3f}  "
+          f"Top-10: {accuracy.get('top10', 0):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import cv2
+import threading
 import numpy as np
 import dlib
-
+import mediapipe as mp
+from cache_utils import load_json_cache, save_json_cache, file_content_hash
 
 
 def extractFirstFrame(videoDir):
@@ -22,25 +24,145 @@ def extractFirstFrame(videoDir):
     return frame
 
 
-def detect_face(videoDir):
-    first_frame = extractFirstFrame(videoDir)
-    detector = dlib.get_frontal_face_detector()
-    gray_frame = cv2.cvtColor(first_frame, cv2.COLOR_BGR2GRAY)
+# Frames wider than this are downscaled before face detection; the full-resolution frame is only
+# searched when nothing is found there
+DETECTION_WIDTH = 480
+# Default normalization when no face is found
+DEFAULT_ORIGIN = (100, 100)
+DEFAULT_SCALING = 0.01
+# Face boxes by video content hash (and optionally by signer/session group), in source-frame pixels;
+# one file per detector, since their boxes differ in size
+FACE_CACHE = "face_cache.json"
+FACE_CACHE_MEDIAPIPE = "face_cache_mediapipe.json"
+
+_detector = None
+# MediaPipe graphs are not safe to share between threads (the GUI detects faces from several QThreads)
+_mediapipe_local = threading.local()
+
+
+def get_detector():
+    """dlib's frontal face detector, created once per process"""
+    global _detector
+    if _detector is None:
+        _detector = dlib.get_frontal_face_detector()
+    return _detector
+
+
+def _detect(gray_frame, scale):
+    faces = get_detector()(gray_frame, 1)
+    if len(faces) == 0:
+        return None
+    face = faces[0]
+    return face.left() / scale, face.top() / scale, face.width() / scale, face.height() / scale
+
+
+def find_face(frame):
+    """Face box (x, y, w, h) in frame pixels for a single BGR frame, or None"""
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height, width = gray_frame.shape[:2]
+
+    if width > DETECTION_WIDTH:
+        scale = DETECTION_WIDTH / width
+        small = cv2.resize(gray_frame, (DETECTION_WIDTH, max(1, int(round(height * scale)))),
+                           interpolation=cv2.INTER_AREA)
+        box = _detect(small, scale)
+        if box is not None:
+            return box
+    return _detect(gray_frame, 1.0)
+
+
+def get_mediapipe_detector():
+    """MediaPipe short-range face detector, created once per thread"""
+    if not hasattr(_mediapipe_local, 'detector'):
+        _mediapipe_local.detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=0,
+            min_detection_confidence=0.5
+        )
+    return _mediapipe_local.detector
+
+
+def find_face_mediapipe(rgb_frame, width, height):
+    """Face box (x, y, w, h) in pixels of a width x height frame, from an RGB copy of it at any scale"""
+    results = get_mediapipe_detector().process(rgb_frame)
+    if not results.detections:
+        return None
+    box = results.detections[0].location_data.relative_bounding_box
+    return box.xmin * width, box.ymin * height, box.width * width, box.height * height
+
+
+def face_normalization(box):
+    """Face origin (box center) and scaling factor (1 / face diagonal) for a face box"""
+    x, y, w, h = box
+    center_x, center_y = x+w/2, y+h/2
+
+    diagonal_length = np.sqrt(w**2+h**2)
+
+    scaling_factor = 1/diagonal_length
+
+    return (center_x, center_y), scaling_factor
+
+
+def detect_face_in_frame(frame):
+    """Face origin and scaling factor (1 / face diagonal) for a single BGR frame"""
+    box = find_face(frame)
+    if box is None:
+        print("No face detected.")
+        return DEFAULT_ORIGIN, DEFAULT_SCALING
+    return face_normalization(box)
 
-    faces = detector(gray_frame, 1)
 
-    if len(faces) > 0:
-        face = faces[0]
+def face_cache_keys(fileName, group=None):
+    """Cache keys for a video: its content hash, then the signer/session group if given"""
+    keys = []
+    try:
+        keys.append(f"content:{file_content_hash(fileName)}")
+    except OSError as e:
+        print(f"Warning: could not hash {fileName} for the face cache: {e}")
+    if group:
+        keys.append(f"group:{group}")
+    return keys
 
-        x, y, w, h = face.left(), face.top(), face.width(), face.height()
-        
-        center_x, center_y = x+w/2, y+h/2
 
-        diagonal_length = np.sqrt(w**2+h**2)
+def lookup_face(keys, cache_name=FACE_CACHE):
+    """Cached face box (x, y, w, h) in source-frame pixels for the first key that has one, or None"""
+    if not keys:
+        return None
+    cache = load_json_cache(cache_name)
+    for key in keys:
+        if key in cache:
+            return tuple(cache[key])
+    return None
+
 
-        scaling_factor = 1/diagonal_length
+def store_face(keys, box, cache_name=FACE_CACHE):
+    """Remember a detected face box (source-frame pixels) under every key"""
+    if not keys:
+        return
+    cache = load_json_cache(cache_name)
+    for key in keys:
+        cache[key] = [float(v) for v in box]
+    save_json_cache(cache_name, cache)
 
-        return (center_x, center_y), scaling_factor, videoDir
+
+def detect_face(videoDir, group=None):
+    # Accept a path or frames already decoded in memory (frame_source.read_frames)
+    keys = face_cache_keys(videoDir, group) if isinstance(videoDir, str) else []
+    box = lookup_face(keys)
+    if box is not None:
+        origin, scaling_factor = face_normalization(box)
+        return origin, scaling_factor, videoDir
+
+    if isinstance(videoDir, str):
+        first_frame = extractFirstFrame(videoDir)
     else:
+        first_frame = videoDir[0] if len(videoDir) > 0 else None
+    if first_frame is None:
+        return None, None, videoDir
+
+    box = find_face(first_frame)
+    if box is None:
         print("No face detected.")
-        return (100, 100), 0.01, videoDir
+        return DEFAULT_ORIGIN, DEFAULT_SCALING, videoDir
+    store_face(keys, box)
+    origin, scaling_factor = face_normalization(box)
+    return origin, scaling_factor, videoDir
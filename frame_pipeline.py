@@ -0,0 +1,309 @@
+import time
+import queue
+import threading
+import numpy as np
+from faceDetection import (find_face, face_normalization, lookup_face, store_face,
+                           DEFAULT_ORIGIN, DEFAULT_SCALING, FACE_CACHE)
+from HandCoordinates import HandTracker
+
+# Frames decoded ahead of the stages when prefetching; bounds memory and applies backpressure
+DEFAULT_PREFETCH = 8
+# Frames between on_progress callbacks
+PROGRESS_INTERVAL = 15
+# Seconds a failed or cancelled run waits for the decode thread to stop
+PRODUCER_JOIN_TIMEOUT = 5.0
+
+
+class PipelineCancelled(Exception):
+    """Raised by FramePipeline.run when its cancel event is set"""
+
+
+class PoolClosed(Exception):
+    """Raised by FramePool.acquire once the pool has been closed"""
+
+
+class FaceStage:
+    """Face normalization: runs the detector on the first frame only
+
+    With cache_keys (faceDetection.face_cache_keys) a cached face box skips detection
+    entirely, and a newly detected one is stored. offset is the (x, y) of the crop the
+    frames were cut from, since cached boxes are in source-frame pixels. With
+    detect=False the stage only consults the cache and the box comes from set_face()
+    (e.g. HandTracker.face_box() in the combined tracker mode).
+    """
+    name = "face"
+
+    def __init__(self, cache_keys=None, offset=(0, 0), detect=True, cache_name=FACE_CACHE):
+        self.origin = None
+        self.scaling_factor = None
+        self.cache_keys = cache_keys
+        self.offset = offset
+        self.detect = detect
+        self.cache_name = cache_name
+        self.cached = False
+        # Face box in source-frame pixels, once known
+        self.box = None
+
+        box = lookup_face(cache_keys, cache_name)
+        if box is not None:
+            self.box = box
+            x, y, w, h = box
+            self.origin, self.scaling_factor = face_normalization((x - offset[0], y - offset[1], w, h))
+            self.cached = True
+
+    def set_face(self, box):
+        """Use a face box (x, y, w, h) in frame pixels, or the default normalization for None"""
+        if box is None:
+            print("No face detected.")
+            self.origin, self.scaling_factor = DEFAULT_ORIGIN, DEFAULT_SCALING
+            return
+        self.origin, self.scaling_factor = face_normalization(box)
+        x, y, w, h = box
+        self.box = (x + self.offset[0], y + self.offset[1], w, h)
+        store_face(self.cache_keys, self.box, self.cache_name)
+
+    def process(self, index, frame, prepared=None):
+        if index == 0 and self.detect and not self.cached:
+            self.set_face(find_face(frame))
+
+    def finish(self):
+        return self.origin, self.scaling_factor
+
+
+class HandTrackingStage:
+    """Hand tracking: sees every frame; normalization waits for the face stage
+
+    Downscaling and RGB conversion (HandTracker.prepare_input) run on the decode
+    thread when the pipeline prefetches.
+    """
+    name = "hands"
+
+    def __init__(self, isOneHanded, expected_frames=None, **tracker_options):
+        self.tracker = HandTracker(isOneHanded, expected_frames=expected_frames, **tracker_options)
+
+    def prepare(self, frame, pool):
+        out = pool.acquire(self.tracker.input_shape(frame.shape))
+        return self.tracker.prepare_input(frame, out)
+
+    def process(self, index, frame, prepared=None):
+        self.tracker.process_frame(frame, prepared)
+
+    def finish(self):
+        return self.tracker
+
+
+class HandCropStage:
+    """Hand appearance: keeps only the first and last frames for the start/end hand crops"""
+    name = "crops"
+
+    def __init__(self):
+        self.first_frame = None
+        self.last_frame = None
+
+    def process(self, index, frame, prepared=None):
+        # Frames may be pooled buffers that get reused, so keep copies
+        if index == 0:
+            self.first_frame = frame.copy()
+        if self.last_frame is None or self.last_frame.shape != frame.shape:
+            self.last_frame = np.empty_like(frame)
+        np.copyto(self.last_frame, frame)
+
+    def finish(self):
+        return self.first_frame, self.last_frame
+
+
+class FramePool:
+    """Reusable frame buffers, at most buffers_per_shape of each shape
+
+    acquire() blocks while every buffer of the requested shape is in use, which
+    keeps the decoder from running arbitrarily far ahead of the stages; close()
+    wakes it up with PoolClosed.
+    """
+
+    def __init__(self, buffers_per_shape):
+        self.buffers_per_shape = buffers_per_shape
+        self._free = {}
+        self._allocated = {}
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolClosed()
+                free = self._free.setdefault(key, [])
+                if free:
+                    return free.pop()
+                if self._allocated.get(key, 0) < self.buffers_per_shape:
+                    self._allocated[key] = self._allocated.get(key, 0) + 1
+                    return np.empty(shape, dtype=dtype)
+                self._condition.wait()
+
+    def release(self, buffer):
+        key = (buffer.shape, buffer.dtype.str)
+        with self._condition:
+            self._free.setdefault(key, []).append(buffer)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class FramePipeline:
+    """Feed a single pass over decoded frames to several consumers
+
+    Each stage implements process(index, frame, prepared) and finish(), and
+    optionally prepare(frame, pool). With prefetch > 0 a producer thread decodes
+    into pooled buffers and runs the prepare steps up to prefetch frames ahead
+    of the stages; otherwise everything runs inline. Busy time of the decoder and
+    of each stage is accumulated in timings (seconds, keyed by "decode" and the
+    stage name), and utilization() reports busy time over wall time. Setting the
+    cancel event stops the run before the next frame with PipelineCancelled, and
+    on_progress(frames_done) is called every PROGRESS_INTERVAL frames.
+    """
+
+    def __init__(self, stages, prefetch=0):
+        self.stages = stages
+        self.prefetch = prefetch
+        self.frame_count = 0
+        self.busy = {}
+        self.wall_time = 0.0
+        self.cancel = None
+        self.on_progress = None
+
+    def run(self, frames, timings=None, cancel=None, on_progress=None):
+        if timings is None:
+            timings = {}
+        self.cancel = cancel
+        self.on_progress = on_progress
+        self.busy = {"decode": 0.0}
+        for stage in self.stages:
+            self.busy[stage.name] = 0.0
+
+        run_start = time.time()
+        if self.prefetch > 0:
+            self._run_prefetched(iter(frames))
+        else:
+            self._run_inline(iter(frames))
+        self.wall_time = time.time() - run_start
+
+        for name in ["decode"] + [stage.name for stage in self.stages]:
+            timings[name] = timings.get(name, 0.0) + self.busy[name]
+        return {stage.name: stage.finish() for stage in self.stages}
+
+    def _process(self, frame, prepared):
+        if self.cancel is not None and self.cancel.is_set():
+            raise PipelineCancelled()
+        for stage in self.stages:
+            stage_start = time.time()
+            stage.process(self.frame_count, frame, prepared.get(stage.name))
+            self.busy[stage.name] += time.time() - stage_start
+        self.frame_count += 1
+        if self.on_progress is not None and self.frame_count % PROGRESS_INTERVAL == 0:
+            self.on_progress(self.frame_count)
+
+    def _run_inline(self, frames):
+        try:
+            while True:
+                decode_start = time.time()
+                frame = next(frames, None)
+                self.busy["decode"] += time.time() - decode_start
+                if frame is None:
+                    break
+                self._process(frame, {})
+        finally:
+            # Stops the decoder (e.g. kills ffmpeg) when the run ends early
+            if hasattr(frames, "close"):
+                frames.close()
+
+    def _run_prefetched(self, frames):
+        # Every buffer is either queued, being processed, or being filled by the producer
+        pool = FramePool(self.prefetch + 2)
+        ready = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        producer_busy = {"prepare": 0.0, "blocked": 0.0}
+        preparers = [stage for stage in self.stages if hasattr(stage, "prepare")]
+
+        def release(item):
+            buffer, prepared = item
+            pool.release(buffer)
+            for prepared_buffer in prepared.values():
+                pool.release(prepared_buffer)
+
+        def produce():
+            try:
+                while not stop.is_set():
+                    decode_start = time.time()
+                    frame = next(frames, None)
+                    self.busy["decode"] += time.time() - decode_start
+                    if frame is None:
+                        break
+
+                    wait_start = time.time()
+                    buffer = pool.acquire(frame.shape, frame.dtype)
+                    producer_busy["blocked"] += time.time() - wait_start
+
+                    prepare_start = time.time()
+                    np.copyto(buffer, frame)
+                    prepared = {stage.name: stage.prepare(buffer, pool) for stage in preparers}
+                    producer_busy["prepare"] += time.time() - prepare_start
+
+                    wait_start = time.time()
+                    ready.put((buffer, prepared))
+                    producer_busy["blocked"] += time.time() - wait_start
+                ready.put(None)
+            except BaseException as e:
+                ready.put(e)
+            finally:
+                # Stops the decoder (e.g. kills ffmpeg) when the run ends early
+                if hasattr(frames, "close"):
+                    frames.close()
+
+        producer = threading.Thread(target=produce, name="frame-prefetch", daemon=True)
+        producer.start()
+        waiting = 0.0
+        item = None
+        try:
+            while True:
+                wait_start = time.time()
+                item = ready.get()
+                waiting += time.time() - wait_start
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                self._process(*item)
+                release(item)
+                item = None
+        finally:
+            # If a stage failed part way through, give back the frame it held, wake a producer
+            # blocked on the pool and drain the queue so the producer can exit
+            stop.set()
+            if isinstance(item, tuple):
+                release(item)
+            pool.close()
+            deadline = time.time() + PRODUCER_JOIN_TIMEOUT
+            while producer.is_alive() and time.time() < deadline:
+                try:
+                    item = ready.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if isinstance(item, tuple):
+                    release(item)
+            producer.join(timeout=max(0.0, deadline - time.time()))
+            if producer.is_alive():
+                print("Warning: frame prefetch thread did not stop; leaving it behind")
+
+        self.busy["prepare"] = producer_busy["prepare"]
+        self.busy["decode_blocked"] = producer_busy["blocked"]
+        self.busy["stages_waiting"] = waiting
+
+    def utilization(self):
+        """Fraction of the run's wall time each stage (and the decode thread) was busy or blocked"""
+        if self.wall_time <= 0:
+            return {}
+        return {name: busy / self.wall_time for name, busy in self.busy.items()}
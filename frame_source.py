@@ -0,0 +1,487 @@
+import os
+import sys
+import time
+import shutil
+import platform
+import argparse
+import subprocess
+import cv2
+import numpy as np
+import ffmpeg
+from concurrent.futures import ThreadPoolExecutor
+from cache_utils import host_key, load_json_cache, save_json_cache
+
+# All features are computed on a 30 fps timeline, as the old transcoding step produced
+TARGET_FPS = 30
+
+# Lab .vid captures carry no timing information; they are recorded at a fixed rate
+VID_FPS = 30
+VID_EXTRACTOR = os.environ.get(
+    "VID_EXTRACTOR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "New_Video_converter", "vid_extractor")
+)
+
+CAPABILITIES_CACHE = "decoder_capabilities.json"
+# Frames decoded per backend when benchmark_new_formats meets a new codec/resolution; 0 disables the self-benchmark
+BENCHMARK_FRAMES = 60
+DEFAULT_BACKEND_ORDER = ["ffmpeg-hwaccel", "ffmpeg", "opencv"]
+# OpenCV seeks can land past the requested time; iter_frames_opencv seeks this far short of the
+# start and drops frames up to it, instead of repeating the first frame to fill the gap
+OPENCV_SEEK_MARGIN_SECONDS = 1.0
+
+_capabilities = None
+
+# Probe results per (path, size, mtime), so repeated reads of a clip open it only once
+_probe_cache = {}
+PROBE_CACHE_SIZE = 256
+
+
+def _is_vid(fileName):
+    return os.path.splitext(fileName)[1].lower() == ".vid"
+
+
+def _vid_properties(fileName):
+    result = subprocess.run([VID_EXTRACTOR, fileName, "properties"], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    width, height, num_frames = (int(v) for v in result.stdout.split()[:3])
+    return width, height, num_frames
+
+
+def _probe_format(fileName):
+    """((width, height, fps, frame_count), codec) with a single open of the file, or (None, None)"""
+    if _is_vid(fileName):
+        properties = _vid_properties(fileName)
+        if properties is None:
+            return None, None
+        return (properties[0], properties[1], VID_FPS, properties[2]), "vid"
+
+    cap = cv2.VideoCapture(fileName)
+    if not cap.isOpened():
+        return None, None
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    cap.release()
+    codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip().lower() or "unknown"
+    return (width, height, fps, frame_count), codec
+
+
+def _cached_probe(fileName):
+    try:
+        stat = os.stat(fileName)
+    except OSError:
+        return None, None
+    key = (os.path.abspath(fileName), stat.st_size, stat.st_mtime)
+    result = _probe_cache.get(key)
+    if result is None:
+        result = _probe_format(fileName)
+        if len(_probe_cache) >= PROBE_CACHE_SIZE:
+            # Dicts keep insertion order: drop the oldest entry
+            _probe_cache.pop(next(iter(_probe_cache)))
+        _probe_cache[key] = result
+    return result
+
+
+def probe_video(fileName):
+    """Return (width, height, fps, frame_count), or None if unreadable"""
+    return _cached_probe(fileName)[0]
+
+
+def probe_videos(fileNames, max_workers=8):
+    """probe_video for many files on a thread pool (container reads mostly wait on I/O), in input order"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(probe_video, fileNames))
+
+
+def video_format_key(fileName):
+    """'codec@WxH' key that decoder benchmarks are stored under, or None if unreadable"""
+    info, codec = _cached_probe(fileName)
+    if info is None:
+        return None
+    return f"{codec}@{info[0]}x{info[1]}"
+
+
+# ---------------------------------------------------------------------------
+# Per-host capability probe (cached on disk, once per process in memory)
+# ---------------------------------------------------------------------------
+
+def _pick_hwaccel(hwaccels):
+    system = platform.system()
+    # Check for available hardware acceleration
+    if "videotoolbox" in hwaccels and system == "Darwin":  # macOS (including M1/M2)
+        return "videotoolbox"
+    elif "cuda" in hwaccels:  # NVIDIA GPU
+        return "cuda"
+    elif "qsv" in hwaccels:  # Intel Quick Sync
+        return "qsv"
+    elif "vaapi" in hwaccels:  # Linux VA-API
+        return "vaapi"
+    elif "dxva2" in hwaccels and system == "Windows":  # Windows
+        return "dxva2"
+    elif "d3d11va" in hwaccels and system == "Windows":  # Windows
+        return "d3d11va"
+    return None
+
+
+def _binary_signature(path):
+    """Path and mtime of a binary, so the cache is redone when it is upgraded"""
+    if not path or not os.path.exists(path):
+        return None
+    return f"{path}:{int(os.path.getmtime(path))}"
+
+
+def _probe_capabilities():
+    ffmpeg_path = shutil.which("ffmpeg")
+    hwaccels = []
+    if ffmpeg_path:
+        try:
+            result = subprocess.run([ffmpeg_path, "-hide_banner", "-hwaccels"], capture_output=True, text=True)
+            # First line is the "Hardware acceleration methods:" header
+            hwaccels = [line.strip().lower() for line in result.stdout.splitlines()[1:] if line.strip()]
+        except Exception as e:
+            print(f"Could not query ffmpeg hwaccels: {e}")
+
+    return {
+        "ffmpeg": _binary_signature(ffmpeg_path),
+        "hwaccels": hwaccels,
+        "hwaccel": _pick_hwaccel(hwaccels),
+        "vid_extractor": _binary_signature(VID_EXTRACTOR) if os.access(VID_EXTRACTOR, os.X_OK) else None,
+        "benchmarks": {}
+    }
+
+
+def get_capabilities(refresh=False):
+    """Decoder capabilities of this host, probed once and cached in the cache directory"""
+    global _capabilities
+    if _capabilities is not None and not refresh:
+        return _capabilities
+
+    cache = load_json_cache(CAPABILITIES_CACHE)
+    host = host_key()
+    cached = cache.get(host)
+    signature_ok = cached is not None and \
+        cached.get("ffmpeg") == _binary_signature(shutil.which("ffmpeg")) and \
+        cached.get("vid_extractor") == (_binary_signature(VID_EXTRACTOR) if os.access(VID_EXTRACTOR, os.X_OK) else None)
+
+    if refresh or not signature_ok:
+        print("Probing decoder capabilities for this host...")
+        cached = _probe_capabilities()
+        cache[host] = cached
+        save_json_cache(CAPABILITIES_CACHE, cache)
+
+    _capabilities = cached
+    return _capabilities
+
+
+def _save_benchmark(key, entry):
+    """Merge one benchmark into the capability file, keeping what other processes stored meanwhile"""
+    caps = get_capabilities()
+    cache = load_json_cache(CAPABILITIES_CACHE)
+    stored = cache.get(host_key())
+    if stored is None or stored.get("ffmpeg") != caps.get("ffmpeg") or \
+            stored.get("vid_extractor") != caps.get("vid_extractor"):
+        stored = dict(caps, benchmarks={})
+    stored.setdefault("benchmarks", {})[key] = entry
+    cache[host_key()] = stored
+    # save_json_cache writes a temporary file and renames it into place
+    save_json_cache(CAPABILITIES_CACHE, cache)
+    caps.setdefault("benchmarks", {}).update(stored["benchmarks"])
+
+
+def get_hardware_acceleration_option():
+    """Determine the best hardware acceleration option for ffmpeg on this system (cached per host)"""
+    return get_capabilities().get("hwaccel")
+
+
+# ---------------------------------------------------------------------------
+# Backends. Each yields (h, w, 3) BGR frames of the [start, end) range, cropped
+# to (width, height, x, y) and resampled to fps, so they are interchangeable.
+# ---------------------------------------------------------------------------
+
+def _ffmpeg_input(fileName, start_seconds=None, end_seconds=None, crop=None, fps=TARGET_FPS, hw_accel=None):
+    """Build the trim/crop/fps ffmpeg graph; returns (stream, width, height) of the output frames"""
+    info = probe_video(fileName)
+    if info is None:
+        raise IOError(f"Could not open video {fileName}")
+    width, height = info[0], info[1]
+
+    input_args = {}
+    if hw_accel:
+        input_args['hwaccel'] = hw_accel
+    if start_seconds:
+        # Input-side seek: fast, and frame accurate because we decode rather than stream copy
+        input_args['ss'] = start_seconds
+    if end_seconds is not None:
+        input_args['t'] = end_seconds - (start_seconds or 0)
+
+    stream = ffmpeg.input(fileName, **input_args)
+    if crop is not None:
+        width, height, x, y = crop
+        stream = stream.filter('crop', width, height, x, y)
+    stream = stream.filter('fps', fps=fps)
+    return stream, width, height
+
+
+def iter_frames_ffmpeg(fileName, start_seconds=None, end_seconds=None, crop=None, fps=TARGET_FPS, hw_accel=None):
+    """Yield (h, w, 3) BGR frames as ffmpeg produces them through a rawvideo pipe"""
+    stream, width, height = _ffmpeg_input(fileName, start_seconds, end_seconds, crop, fps, hw_accel)
+    process = (
+        stream
+        .output('pipe:', format='rawvideo', pix_fmt='bgr24', threads=8)
+        .global_args('-loglevel', 'error')
+        .run_async(pipe_stdout=True)
+    )
+
+    frame_size = width * height * 3
+    try:
+        while True:
+            buffer = process.stdout.read(frame_size)
+            if len(buffer) < frame_size:
+                break
+            yield np.frombuffer(buffer, np.uint8).reshape(height, width, 3)
+    finally:
+        # The consumer may stop early; don't leave ffmpeg blocked on a full pipe
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+def iter_frames_ffmpeg_hwaccel(fileName, start_seconds=None, end_seconds=None, crop=None, fps=TARGET_FPS):
+    return iter_frames_ffmpeg(fileName, start_seconds, end_seconds, crop, fps, get_hardware_acceleration_option())
+
+
+def iter_frames_opencv(fileName, start_seconds=None, end_seconds=None, crop=None, fps=TARGET_FPS):
+    """OpenCV seek and read, cropping by slicing and picking frames on the fps timeline"""
+    cap = cv2.VideoCapture(fileName)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video {fileName}")
+    seeking = bool(start_seconds)
+    if seeking:
+        cap.set(cv2.CAP_PROP_POS_MSEC, max(0.0, start_seconds - OPENCV_SEEK_MARGIN_SECONDS) * 1000.0)
+
+    step_ms = 1000.0 / fps
+    next_ms = (start_seconds or 0) * 1000.0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Timestamp of the frame just read
+            position_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if seeking:
+                seeking = False
+                if position_ms > next_ms + 0.5 * step_ms:
+                    # Landed past the start even so: read from the beginning rather than repeat this frame
+                    cap.set(cv2.CAP_PROP_POS_MSEC, 0)
+                    continue
+            if end_seconds is not None and position_ms >= end_seconds * 1000.0:
+                break
+            if crop is not None:
+                width, height, x, y = crop
+                frame = frame[y:y + height, x:x + width]
+            frame = np.ascontiguousarray(frame)
+            # Drop or repeat source frames like ffmpeg's fps filter would; frames before the start are dropped
+            while position_ms + 0.5 * step_ms >= next_ms:
+                yield frame
+                next_ms += step_ms
+    finally:
+        cap.release()
+
+
+def iter_frames_vid(fileName, start_seconds=None, end_seconds=None, crop=None, fps=TARGET_FPS):
+    """Lab .vid captures through New_Video_converter/vid_extractor, one raw RGB frame per call"""
+    properties = _vid_properties(fileName)
+    if properties is None:
+        raise IOError(f"vid_extractor could not read {fileName}")
+    width, height, num_frames = properties
+
+    start_seconds = start_seconds or 0
+    end_frame = num_frames if end_seconds is None else min(num_frames, int(round(end_seconds * VID_FPS)))
+    k = 0
+    while True:
+        source_index = int(round((start_seconds + k / fps) * VID_FPS))
+        if source_index >= end_frame:
+            break
+        result = subprocess.run([VID_EXTRACTOR, fileName, str(source_index)], capture_output=True)
+        if result.returncode != 0 or len(result.stdout) < width * height * 3:
+            raise IOError(f"vid_extractor failed on frame {source_index}: {result.stderr.decode(errors='ignore')}")
+        frame = np.frombuffer(result.stdout, np.uint8, count=width * height * 3).reshape(height, width, 3)
+        if crop is not None:
+            crop_width, crop_height, x, y = crop
+            frame = frame[y:y + crop_height, x:x + crop_width]
+        yield np.ascontiguousarray(frame[:, :, ::-1])  # RGB -> BGR
+        k += 1
+
+
+class DecoderBackend:
+    def __init__(self, name, iter_frames, is_available, extensions=None):
+        self.name = name
+        self.iter_frames = iter_frames
+        self.is_available = is_available
+        self.extensions = extensions
+
+    def handles(self, fileName):
+        if self.extensions is None:
+            return not _is_vid(fileName)
+        return os.path.splitext(fileName)[1].lower() in self.extensions
+
+
+DECODER_BACKENDS = {}
+
+
+def register_backend(backend):
+    DECODER_BACKENDS[backend.name] = backend
+
+
+register_backend(DecoderBackend("ffmpeg-hwaccel", iter_frames_ffmpeg_hwaccel,
+                                lambda caps: bool(caps.get("ffmpeg") and caps.get("hwaccel"))))
+register_backend(DecoderBackend("ffmpeg", iter_frames_ffmpeg, lambda caps: bool(caps.get("ffmpeg"))))
+register_backend(DecoderBackend("opencv", iter_frames_opencv, lambda caps: True))
+register_backend(DecoderBackend("vid", iter_frames_vid, lambda caps: bool(caps.get("vid_extractor")),
+                                extensions=(".vid",)))
+
+
+def available_backends(fileName):
+    caps = get_capabilities()
+    return [name for name, backend in DECODER_BACKENDS.items()
+            if backend.handles(fileName) and backend.is_available(caps)]
+
+
+def benchmark_backends(fileName, max_frames=BENCHMARK_FRAMES):
+    """Time every usable backend on the start of a clip and remember the fastest for its codec/resolution"""
+    key = video_format_key(fileName)
+    if key is None:
+        return None
+
+    results = {}
+    for name in available_backends(fileName):
+        frames = 0
+        start_time = time.time()
+        try:
+            for _ in DECODER_BACKENDS[name].iter_frames(fileName):
+                frames += 1
+                if frames >= max_frames:
+                    break
+        except Exception as e:
+            print(f"Backend {name} failed on {key}: {e}")
+            continue
+        elapsed = time.time() - start_time
+        if frames > 0:
+            results[name] = frames / elapsed if elapsed > 0 else float("inf")
+
+    if not results:
+        return None
+    best = max(results, key=results.get)
+    print(f"Decoder benchmark for {key}: " + ", ".join(f"{n} {f:.0f} fps" for n, f in results.items()) +
+          f" -> {best}")
+
+    _save_benchmark(key, {"best": best, "fps": results})
+    return best
+
+
+def benchmark_new_formats(fileNames, max_frames=BENCHMARK_FRAMES):
+    """Benchmark the backends once for every codec/resolution among fileNames not measured yet
+
+    Run from start-up steps (frame_source's CLI, the populators); queries never benchmark.
+    """
+    if not max_frames:
+        return
+    benchmarks = get_capabilities().get("benchmarks", {})
+    seen = set(benchmarks)
+    for fileName in fileNames:
+        key = video_format_key(fileName)
+        if key is None or key in seen:
+            continue
+        seen.add(key)
+        if len(available_backends(fileName)) > 1:
+            benchmark_backends(fileName, max_frames)
+
+
+def backend_order(fileName):
+    """Backends to try for this clip, fastest measured first (see benchmark_new_formats), else the default order"""
+    available = available_backends(fileName)
+    order = [name for name in DEFAULT_BACKEND_ORDER if name in available] + \
+            [name for name in available if name not in DEFAULT_BACKEND_ORDER]
+
+    key = video_format_key(fileName)
+    benchmarks = get_capabilities().get("benchmarks", {})
+    best = benchmarks.get(key, {}).get("best") if key else None
+    if best in order:
+        order.remove(best)
+        order.insert(0, best)
+    return order
+
+
+def iter_frames(fileName, start_seconds=None, end_seconds=None, crop=None, fps=TARGET_FPS, backends=None):
+    """Yield the selected part of a clip frame by frame, trying backends in order
+
+    crop is (width, height, x, y) in source pixels. A backend is abandoned only if it
+    fails before producing its first frame.
+    """
+    if backends is None:
+        backends = backend_order(fileName)
+
+    for name in backends:
+        produced = 0
+        try:
+            for frame in DECODER_BACKENDS[name].iter_frames(fileName, start_seconds, end_seconds, crop, fps):
+                produced += 1
+                yield frame
+        except Exception as e:
+            if produced:
+                raise
+            print(f"Decoder {name} failed: {str(e)}")
+            continue
+        if produced:
+            return
+        print(f"Decoder {name} returned no frames")
+
+    print(f"No decoder could read {fileName}")
+
+
+def read_frame_at(fileName, seconds, crop=None, backends=None):
+    """The single frame at (or just after) seconds, or None; decodes nothing beyond it"""
+    frames = iter_frames(fileName, seconds, None, crop, backends=backends)
+    try:
+        frame = next(frames, None)
+    finally:
+        frames.close()
+    return None if frame is None else frame.copy()
+
+
+def read_frames(fileName, start_seconds=None, end_seconds=None, crop=None, fps=TARGET_FPS, backends=None):
+    """Read the selected part of a clip into an (N, h, w, 3) BGR array"""
+    frames = list(iter_frames(fileName, start_seconds, end_seconds, crop, fps, backends))
+    if not frames:
+        return np.zeros((0, 0, 0, 3), dtype=np.uint8)
+    return np.stack(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Probe decoder capabilities and benchmark decoder backends.')
+    parser.add_argument('videos', nargs='*', help='Clips to benchmark (one per codec/resolution is enough)')
+    parser.add_argument('--frames', type=int, default=BENCHMARK_FRAMES,
+                        help=f'Frames decoded per backend (default: {BENCHMARK_FRAMES})')
+    parser.add_argument('--refresh', action='store_true', help='Re-probe capabilities and drop old benchmarks')
+    args = parser.parse_args()
+
+    caps = get_capabilities(refresh=args.refresh)
+    print(f"Host: {host_key()}")
+    print(f"ffmpeg: {caps.get('ffmpeg') or 'not found'}; hwaccels: {', '.join(caps.get('hwaccels', [])) or 'none'}")
+    print(f"Hardware acceleration: {caps.get('hwaccel') or 'Not available'}")
+    print(f"vid_extractor: {caps.get('vid_extractor') or 'not found'}")
+
+    for video in args.videos:
+        if not os.path.exists(video):
+            print(f"Video not found: {video}")
+            continue
+        benchmark_backends(video, args.frames)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,36 @@
 import os
 import argparse
+from frame_source import probe_videos
 
-def generate_videos_list(root_dir, output_file="videos_to_add.txt"):
+# Manifest columns; duration, fps and resolution feed DatabasePopulator-multi's cost-based scheduling
+MANIFEST_HEADER = "# path,sign,one_handed,signer,duration_ms,fps,width,height"
+
+def generate_videos_list(root_dir, output_file="videos_to_add.txt", probe_workers=8):
     print(f"Scanning directory: {root_dir}")
     
-    video_files = []
+    video_paths = []
     video_extensions = ['.mpg', '.mpeg', '.mp4']
     
     for dirpath, dirnames, filenames in os.walk(root_dir):
         for filename in filenames:
             if any(filename.lower().endswith(ext) for ext in video_extensions):
-                full_path = os.path.abspath(os.path.join(dirpath, filename))
+                video_paths.append(os.path.abspath(os.path.join(dirpath, filename)))
 
-                sign_name = os.path.splitext(filename)[0]
-                
-                is_one_handed = "true"
-                video_files.append(f"{full_path},{sign_name},{is_one_handed}")
+    print(f"Probing {len(video_paths)} videos with {probe_workers} threads")
+    video_files = []
+    for full_path, info in zip(video_paths, probe_videos(video_paths, probe_workers)):
+        sign_name = os.path.splitext(os.path.basename(full_path))[0]
+        
+        is_one_handed = "true"
+        # Signer column left empty; unreadable videos get empty metadata
+        metadata = ",,,"
+        if info is not None and info[2] > 0:
+            width, height, fps, frame_count = info
+            metadata = f"{frame_count / fps * 1000:.0f},{fps:g},{width},{height}"
+        video_files.append(f"{full_path},{sign_name},{is_one_handed},,{metadata}")
 
     with open(output_file, 'w') as f:
+        f.write(f"{MANIFEST_HEADER}\n")
         for video_file in video_files:
             f.write(f"{video_file}\n")
     
@@ -28,6 +41,8 @@ if __name__ == "__main__":
     parser.add_argument("root_dir", help="Root directory to scan for video files")
     parser.add_argument("--output", "-o", default="videos_to_add.txt", 
                         help="Output file path (default: videos_to_add.txt)")
+    parser.add_argument("--probe_workers", type=int, default=8,
+                        help="Threads probing duration, fps and resolution (default: 8)")
     args = parser.parse_args()
     
-    generate_videos_list(args.root_dir, args.output)
\ No newline at end of file
+    generate_videos_list(args.root_dir, args.output, args.probe_workers)
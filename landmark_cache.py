@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import numpy as np
+from cache_utils import cache_path, file_content_hash
+
+# Per-frame hand landmarks of the tracked parts of a video (HandTracker output), so a clip can be
+# re-trimmed within a tracked span without decoding or tracking it again. A file holds every span
+# tracked under one set of tracker settings, ROI and handedness, as separate segments.
+# Files live in a subdirectory of the shared cache; the least recently used ones are deleted
+# once the directory grows past LANDMARK_CACHE_MAX_BYTES
+LANDMARK_CACHE_DIR = "landmarks"
+LANDMARK_CACHE_MAX_BYTES = 1 << 30
+# Bump when the stored arrays change meaning
+LANDMARK_CACHE_VERSION = 3
+
+
+def _cache_directory():
+    directory = cache_path(LANDMARK_CACHE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def landmark_cache_file(fileName, settings):
+    """Cache file for a video's landmarks under the given tracker settings (JSON-serializable dict)"""
+    key = json.dumps(dict(settings, version=LANDMARK_CACHE_VERSION), sort_keys=True)
+    settings_hash = hashlib.sha1(key.encode()).hexdigest()[:12]
+    return os.path.join(_cache_directory(), f"{file_content_hash(fileName)}_{settings_hash}.npz")
+
+
+def load_landmarks(path):
+    """Cached segments of a video, in time order, or None if there are none
+
+    Each segment is a dict with landmarks (frames, 2, 21, 2) normalized to the tracked frame,
+    tracked (frames,) bool, timestamps (frames,) in seconds, frame_size (height, width),
+    face_box (x, y, w, h) in source pixels (NaN if no face was found) and span, the
+    (start, end) seconds that were tracked (end is inf when tracked to the end of the video).
+    """
+    try:
+        with np.load(path) as data:
+            bounds = np.concatenate([[0], np.cumsum(data["lengths"])])
+            landmarks, tracked, timestamps = data["landmarks"], data["tracked"], data["timestamps"]
+            frame_size = tuple(int(v) for v in data["frame_size"])
+            segments = [{
+                "landmarks": landmarks[start:end].astype(np.float64),
+                "tracked": tracked[start:end].astype(bool),
+                "timestamps": timestamps[start:end],
+                "frame_size": frame_size,
+                "face_box": tuple(float(v) for v in face_box),
+                "span": tuple(float(v) for v in span)
+            } for start, end, face_box, span in zip(bounds[:-1], bounds[1:], data["face_boxes"], data["spans"])]
+        # Mark as recently used for eviction
+        os.utime(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return segments or None
+
+
+def save_landmarks(path, segments, max_bytes=LANDMARK_CACHE_MAX_BYTES):
+    """Write a video's segments atomically, then evict old files; failures are reported but not fatal"""
+    # MediaPipe landmarks are float32 to begin with, so float32 storage is lossless
+    temp_path = f"{path}.{os.getpid()}.tmp.npz"
+    try:
+        np.savez_compressed(
+            temp_path,
+            landmarks=np.concatenate([seg["landmarks"] for seg in segments]).astype(np.float32),
+            tracked=np.concatenate([seg["tracked"] for seg in segments]),
+            timestamps=np.concatenate([seg["timestamps"] for seg in segments]),
+            lengths=np.array([len(seg["timestamps"]) for seg in segments]),
+            frame_size=np.array(segments[0]["frame_size"]),
+            face_boxes=np.array([seg["face_box"] for seg in segments], dtype=np.float64),
+            spans=np.array([seg["span"] for seg in segments], dtype=np.float64)
+        )
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write landmark cache {path}: {e}")
+        return
+    evict_landmarks(max_bytes)
+
+
+def covering_segment(segments, start_seconds, end_seconds, fps):
+    """The segment whose span covers start_seconds to end_seconds (None = end of the video), or None"""
+    half_frame = 0.5 / fps
+    end_seconds = np.inf if end_seconds is None else end_seconds
+    for segment in segments or []:
+        span_start, span_end = segment["span"]
+        if span_start <= start_seconds + half_frame and span_end >= end_seconds - half_frame:
+            return segment
+    return None
+
+
+def add_segment(segments, new, fps):
+    """Segments with new added: merged with every segment it overlaps or touches, the rest kept
+
+    Frame i of a segment is at timestamps[0] + i / fps on the same timeline in every segment;
+    where segments overlap, the new one wins. Returns (segments in time order, the merged segment).
+    """
+    def frame_range(segment):
+        first = int(round(segment["timestamps"][0] * fps))
+        return first, first + len(segment["timestamps"])
+
+    new_first, new_end = frame_range(new)
+    touching, kept = [], []
+    for segment in segments or []:
+        first, end = frame_range(segment)
+        (touching if first <= new_end and new_first <= end else kept).append(segment)
+
+    merged = new
+    if touching:
+        parts = touching + [new]
+        ranges = [frame_range(part) for part in parts]
+        first, end = min(r[0] for r in ranges), max(r[1] for r in ranges)
+        landmarks = np.full((end - first,) + new["landmarks"].shape[1:], np.nan)
+        tracked = np.zeros(end - first, dtype=bool)
+        for part, (part_first, part_end) in zip(parts, ranges):
+            landmarks[part_first - first:part_end - first] = part["landmarks"]
+            tracked[part_first - first:part_end - first] = part["tracked"]
+        # The earliest face found is the one a clip starting there would have used
+        faces = [part["face_box"] for part in sorted(parts, key=lambda part: part["span"][0])
+                 if not np.isnan(part["face_box"][0])]
+        face_box = faces[0] if faces else new["face_box"]
+        merged = dict(new, landmarks=landmarks, tracked=tracked, timestamps=np.arange(first, end) / fps,
+                      face_box=face_box, span=(min(part["span"][0] for part in parts),
+                                               max(part["span"][1] for part in parts)))
+    return sorted(kept + [merged], key=lambda segment: segment["span"][0]), merged
+
+
+def remove_video_landmarks(fileName):
+    """Delete every cached tracking of a video, under any tracker settings"""
+    prefix = f"{file_content_hash(fileName)}_"
+    directory = _cache_directory()
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(".npz"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError as e:
+                print(f"Warning: could not remove {name}: {e}")
+
+
+def evict_landmarks(max_bytes=LANDMARK_CACHE_MAX_BYTES):
+    """Delete the least recently used landmark files until the cache fits in max_bytes"""
+    directory = _cache_directory()
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".npz") or ".tmp" in name:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError as e:
+            print(f"Warning: could not evict {path}: {e}")
@@ -0,0 +1,74 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# Bytes per slot. A video's feature arrays (six 20x2 trajectories, the resampling pyramid and
+# up to four 50x50 float32 hand images) take about 42 KB
+SLOT_BYTES = 1 << 17
+# Offsets are rounded up to this many bytes so every array is aligned for its dtype
+ALIGNMENT = 16
+
+# Slots this worker process has attached to, by name
+_attached = {}
+
+
+def _attach(name):
+    block = _attached.get(name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+        _attached[name] = block
+    return block
+
+
+class ResultSlots:
+    """Shared memory blocks that worker processes write their result arrays into
+
+    The parent process owns the blocks: it acquires a slot name for each task it submits,
+    passes the name along with the task, and once the task has returned its layout
+    (from write_arrays) reads the arrays back and releases the slot for the next task.
+    """
+
+    def __init__(self, count, slot_bytes=SLOT_BYTES):
+        self._blocks = {}
+        self._free = []
+        for _ in range(count):
+            block = shared_memory.SharedMemory(create=True, size=slot_bytes)
+            self._blocks[block.name] = block
+            self._free.append(block.name)
+
+    def acquire(self):
+        """Name of a free slot; the caller keeps at most count tasks in flight"""
+        return self._free.pop()
+
+    def release(self, name):
+        self._free.append(name)
+
+    def read(self, name, layout):
+        """{key: array} copied out of the slot, so it can be reused straight away"""
+        buffer = self._blocks[name].buf
+        return {
+            key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset).copy()
+            for key, dtype, shape, offset in layout
+        }
+
+    def close(self):
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
+        self._free = []
+
+
+def write_arrays(name, arrays):
+    """Copy {key: array} into slot name, returning the layout for ResultSlots.read, or None if they do not fit"""
+    block = _attach(name)
+    layout = []
+    offset = 0
+    for key, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        if offset + arr.nbytes > block.size:
+            return None
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf, offset=offset)[...] = arr
+        layout.append((key, arr.dtype.str, arr.shape, offset))
+        offset += arr.nbytes
+    return layout
@@ -0,0 +1,166 @@
+import json
+import os
+import time
+import argparse
+import numpy as np
+from dtw_utils import as_sequence, batch_dtw_distance, dba_average, sequence_boxes
+
+CLUSTER_FEATURE = 'centroids_dom_arr'
+
+
+def _k_medoids(distances, k, iterations=20):
+    """Simple alternating k-medoids on a precomputed distance matrix"""
+    n = len(distances)
+    # Deterministic init: first medoid is the most central, the rest are farthest-first
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(distances[:, medoids].min(axis=1))))
+
+    for _ in range(iterations):
+        labels = np.argmin(distances[:, medoids], axis=1)
+        new_medoids = []
+        for c in range(k):
+            members = np.where(labels == c)[0]
+            if len(members) == 0:
+                new_medoids.append(medoids[c])
+                continue
+            within = distances[np.ix_(members, members)].sum(axis=1)
+            new_medoids.append(int(members[np.argmin(within)]))
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+
+    return np.argmin(distances[:, medoids], axis=1), medoids
+
+
+def _make_cluster(name, is_one_handed, member_paths, sequences, dba_iterations, medoid=None):
+    """Build one cluster record: DBA prototype, radius and bounding boxes of its members"""
+    prototype = dba_average(sequences, iterations=dba_iterations, initial=medoid)
+    radius = float(batch_dtw_distance(prototype, sequences).max()) if sequences else 0.0
+    box_first, box_all, box_last = sequence_boxes(sequences)
+    return {
+        "name": name,
+        "is_one_handed": is_one_handed,
+        "members": member_paths,
+        "prototype": prototype.tolist(),
+        "radius": radius,
+        "box_first": box_first,
+        "box_all": box_all,
+        "box_last": box_last
+    }
+
+
+def build_clusters(signs, max_cluster_size=8, dba_iterations=10):
+    """Group database entries per sign name and handedness, splitting large groups with k-medoids"""
+    groups = {}
+    for path, entry in signs.items():
+        features = entry.get("features", {})
+        if CLUSTER_FEATURE not in features or len(features[CLUSTER_FEATURE]) == 0:
+            continue
+        key = (entry.get("name", "unknown"), entry.get("is_one_handed", True))
+        groups.setdefault(key, []).append(path)
+
+    clusters = []
+    for (name, is_one_handed), paths in groups.items():
+        sequences = [as_sequence(signs[p]["features"][CLUSTER_FEATURE]) for p in paths]
+
+        if len(paths) <= max_cluster_size:
+            clusters.append(_make_cluster(name, is_one_handed, paths, sequences, dba_iterations))
+            continue
+
+        distances = np.stack([batch_dtw_distance(seq, sequences) for seq in sequences])
+        k = int(np.ceil(len(paths) / max_cluster_size))
+        labels, medoids = _k_medoids(distances, k)
+        for c, medoid in enumerate(medoids):
+            members = np.where(labels == c)[0]
+            if len(members) == 0:
+                continue
+            clusters.append(_make_cluster(
+                name, is_one_handed,
+                [paths[i] for i in members],
+                [sequences[i] for i in members],
+                dba_iterations,
+                medoid=sequences[medoid]
+            ))
+
+    return clusters
+
+
+def save_clusters(clusters, db_dir="sign_database", cluster_file="sign_clusters.json"):
+    cluster_path = os.path.join(db_dir, cluster_file)
+    with open(cluster_path, 'w') as f:
+        json.dump({"feature": CLUSTER_FEATURE, "clusters": clusters}, f, indent=4)
+    print(f"Saved {len(clusters)} clusters to {cluster_path}")
+
+
+def load_clusters(db_dir="sign_database", cluster_file="sign_clusters.json"):
+    """Load cluster prototypes, or None if they have not been built"""
+    cluster_path = os.path.join(db_dir, cluster_file)
+    if not os.path.exists(cluster_path):
+        return None
+    with open(cluster_path, 'r') as f:
+        return json.load(f).get("clusters", [])
+
+
+def resolve_clusters(clusters, database_paths, database_signs):
+    """Map cluster members to indices into database_signs
+
+    Entries added after the clusters were built get a singleton cluster of their own,
+    so a stale cluster file never hides a candidate from the search.
+    """
+    index_of = {path: i for i, path in enumerate(database_paths)}
+    resolved = []
+    covered = set()
+
+    for cluster in clusters or []:
+        members = [index_of[p] for p in cluster["members"] if p in index_of]
+        if not members:
+            continue
+        covered.update(members)
+        resolved.append(dict(cluster, member_indices=members))
+
+    for i, features in enumerate(database_signs):
+        if i in covered or CLUSTER_FEATURE not in features:
+            continue
+        sequence = as_sequence(features[CLUSTER_FEATURE])
+        box_first, box_all, box_last = sequence_boxes([sequence])
+        resolved.append({
+            "name": None,
+            "members": [database_paths[i]],
+            "member_indices": [i],
+            "prototype": sequence.tolist(),
+            "radius": 0.0,
+            "box_first": box_first,
+            "box_all": box_all,
+            "box_last": box_last
+        })
+
+    return resolved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build DBA cluster prototypes for pruned sign search.')
+    parser.add_argument('--db_dir', type=str, default="sign_database",
+                        help='Directory containing sign_data.json')
+    parser.add_argument('--max_cluster_size', type=int, default=8,
+                        help='Split a sign into k-medoids clusters above this many exemplars (default: 8)')
+    parser.add_argument('--dba_iterations', type=int, default=10,
+                        help='DBA refinement iterations per prototype (default: 10)')
+    args = parser.parse_args()
+
+    json_file = os.path.join(args.db_dir, "sign_data.json")
+    if not os.path.exists(json_file):
+        print(f"Error: Database file not found: {json_file}")
+        return
+
+    with open(json_file, 'r') as f:
+        signs = json.load(f).get("signs", {})
+
+    start_time = time.time()
+    clusters = build_clusters(signs, args.max_cluster_size, args.dba_iterations)
+    print(f"Built {len(clusters)} clusters from {len(signs)} signs in {time.time() - start_time:.2f}s")
+    save_clusters(clusters, args.db_dir)
+
+
+if __name__ == "__main__":
+    main()
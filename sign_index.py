@@ -0,0 +1,156 @@
+import json
+import os
+import numpy as np
+
+# Grid cell size in face-normalized units (1.0 = one face diagonal, see faceDetection.detect_face)
+DEFAULT_CELL_SIZE = 0.25
+INDEX_FEATURE = 'centroids_dom_arr'
+
+
+def _cell(point, cell_size):
+    return (int(np.floor(point[0] / cell_size)), int(np.floor(point[1] / cell_size)))
+
+
+def location_cells(features, cell_size=DEFAULT_CELL_SIZE):
+    """Quantized start, end and extent cells of the dominant hand trajectory, or None if unusable"""
+    trajectory = np.asarray(features.get(INDEX_FEATURE, []), dtype=np.float32)
+    if trajectory.ndim != 2 or len(trajectory) == 0:
+        return None
+    valid = trajectory[~np.isnan(trajectory).any(axis=1)]
+    if len(valid) == 0:
+        return None
+
+    # Resampled trajectories start and end on the first/last frames with a detected hand
+    extent = valid.max(axis=0) - valid.min(axis=0)
+    return {
+        "start": _cell(valid[0], cell_size),
+        "end": _cell(valid[-1], cell_size),
+        "extent": _cell(extent, cell_size)
+    }
+
+
+class LocationIndex:
+    """Inverted index from quantized start/end hand location (and trajectory extent) to sign ids"""
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.start_cells = {}
+        self.end_cells = {}
+        self.extent_cells = {}
+        self.size = 0
+
+    def add(self, sign_id, features):
+        cells = location_cells(features, self.cell_size)
+        if cells is None:
+            return False
+        self.start_cells.setdefault(cells["start"], set()).add(sign_id)
+        self.end_cells.setdefault(cells["end"], set()).add(sign_id)
+        self.extent_cells.setdefault(cells["extent"], set()).add(sign_id)
+        self.size += 1
+        return True
+
+    @staticmethod
+    def _neighbourhood(table, cell, tolerance):
+        found = set()
+        for dx in range(-tolerance, tolerance + 1):
+            for dy in range(-tolerance, tolerance + 1):
+                found |= table.get((cell[0] + dx, cell[1] + dy), set())
+        return found
+
+    def query(self, features, tolerance=1, extent_tolerance=None, min_candidates=1, allowed=None):
+        """Sign ids whose start, end and extent cells all lie within tolerance of the query's
+
+        allowed restricts the result to the sign ids the caller can actually compare against
+        (e.g. same handedness), before min_candidates is checked. Returns None when the query
+        cannot be located or fewer than min_candidates match, meaning the caller should fall
+        back to the exhaustive search.
+        """
+        cells = location_cells(features, self.cell_size)
+        if cells is None:
+            return None
+        if extent_tolerance is None:
+            extent_tolerance = tolerance
+
+        candidates = self._neighbourhood(self.start_cells, cells["start"], tolerance)
+        candidates &= self._neighbourhood(self.end_cells, cells["end"], tolerance)
+        candidates &= self._neighbourhood(self.extent_cells, cells["extent"], extent_tolerance)
+        if allowed is not None:
+            candidates &= set(allowed)
+
+        if len(candidates) < min_candidates:
+            return None
+        return candidates
+
+    def cell_distances(self, features):
+        """Sign id -> grid distance of its cells from the query's, or None if the query cannot be located
+
+        The distance is the largest Chebyshev distance over the start, end and extent cells,
+        so query(features, tolerance=t) selects exactly the signs at distance <= t.
+        """
+        cells = location_cells(features, self.cell_size)
+        if cells is None:
+            return None
+
+        distances = {}
+        for table, cell in ((self.start_cells, cells["start"]), (self.end_cells, cells["end"]),
+                            (self.extent_cells, cells["extent"])):
+            for (x, y), ids in table.items():
+                d = max(abs(x - cell[0]), abs(y - cell[1]))
+                for sign_id in ids:
+                    distances[sign_id] = max(distances.get(sign_id, 0), d)
+        return distances
+
+    def to_dict(self):
+        def encode(table):
+            return {f"{cell[0]},{cell[1]}": sorted(ids) for cell, ids in table.items()}
+        return {
+            "cell_size": self.cell_size,
+            "size": self.size,
+            "start": encode(self.start_cells),
+            "end": encode(self.end_cells),
+            "extent": encode(self.extent_cells)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        def decode(table):
+            return {tuple(int(v) for v in key.split(',')): set(ids) for key, ids in table.items()}
+        index = cls(data.get("cell_size", DEFAULT_CELL_SIZE))
+        index.size = data.get("size", 0)
+        index.start_cells = decode(data.get("start", {}))
+        index.end_cells = decode(data.get("end", {}))
+        index.extent_cells = decode(data.get("extent", {}))
+        return index
+
+
+def build_location_index(signs, cell_size=DEFAULT_CELL_SIZE):
+    """Index every database entry (keyed by video path) by its quantized hand locations"""
+    index = LocationIndex(cell_size)
+    for path, entry in signs.items():
+        index.add(path, entry.get("features", {}))
+    return index
+
+
+def save_location_index(index, db_dir="sign_database", index_file="location_index.json"):
+    index_path = os.path.join(db_dir, index_file)
+    with open(index_path, 'w') as f:
+        json.dump(index.to_dict(), f)
+    print(f"Saved location index ({index.size} signs) to {index_path}")
+
+
+def load_location_index(signs, db_dir="sign_database", index_file="location_index.json",
+                        db_file="sign_data.json"):
+    """Load the saved index, rebuilding it if the database has changed since it was written"""
+    index_path = os.path.join(db_dir, index_file)
+    db_path = os.path.join(db_dir, db_file)
+
+    if os.path.exists(index_path) and (
+            not os.path.exists(db_path) or os.path.getmtime(index_path) >= os.path.getmtime(db_path)):
+        with open(index_path, 'r') as f:
+            return LocationIndex.from_dict(json.load(f))
+
+    print("Location index missing or out of date, rebuilding")
+    index = build_location_index(signs)
+    if os.path.isdir(db_dir):
+        save_location_index(index, db_dir, index_file)
+    return index
@@ -3,7 +3,87 @@ import numpy as np
 import threading
 import traceback
 import time
+import heapq
 from concurrent.futures import ThreadPoolExecutor
+from dtw_utils import as_sequence, box_lower_bound, batch_lower_bound
+from LinearInterpolation import InterpolateAndResample
+
+NORMALIZATIONS = ('minmax', 'relative')
+
+
+def rank_matches(indices, distances, top_k=10, normalization='minmax', dist_bounds=None):
+    """Top k (index, similarity) pairs, best first, without sorting the whole candidate set
+    
+    'minmax' maps the smallest distance to 100% and the largest one passed in to 0%.
+    'relative' scores each match as best_distance / distance, so it only needs the best
+    distance and stays meaningful for pruned searches that never see the true maximum.
+    When the best distance is 0 (an exact duplicate), the others are scored against the
+    smallest non-zero distance among the top k instead of all showing 0%.
+    """
+    if normalization not in NORMALIZATIONS:
+        raise ValueError(f"Unknown normalization '{normalization}', choose from {NORMALIZATIONS}")
+    
+    indices = np.asarray(indices)
+    distances = np.asarray(distances, dtype=np.float64)
+    if len(distances) == 0 or top_k <= 0:
+        return []
+    
+    if top_k < len(distances):
+        part = np.argpartition(distances, top_k - 1)[:top_k]
+        # Keep every candidate tied with the k-th distance so ties still break by index
+        selected = np.flatnonzero(distances <= distances[part].max())
+    else:
+        selected = np.arange(len(distances))
+    order = selected[np.lexsort((indices[selected], distances[selected]))][:top_k]
+    top_indices = indices[order]
+    top_distances = distances[order]
+    
+    min_dist, max_dist = dist_bounds if dist_bounds is not None else (distances.min(), distances.max())
+    if normalization == 'minmax':
+        dist_range = max_dist - min_dist
+        if dist_range > 0:
+            # Linear normalization to convert distance to similarity (0-100%)
+            similarities = (1.0 - (top_distances - min_dist) / dist_range) * 100
+        else:
+            # Handle case where all distances are equal
+            similarities = np.full(len(top_distances), 100.0)
+    else:
+        reference = min_dist
+        if reference <= 0:
+            positive = top_distances[top_distances > 0]
+            reference = positive.min() if len(positive) else 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarities = np.where(top_distances > 0, reference / top_distances, 1.0) * 100
+    
+    return [(idx.item(), float(sim)) for idx, sim in zip(top_indices, similarities)]
+
+
+class TopKHeap:
+    """Bounded max-heap keeping the k smallest (distance, index) pairs seen so far"""
+    
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+    
+    def __len__(self):
+        return len(self._heap)
+    
+    def push(self, idx, distance):
+        # Stored negated so the worst kept match sits at the top of Python's min-heap
+        item = (-distance, -idx)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+    
+    def kth_distance(self):
+        """Distance a new candidate has to beat, inf until k candidates have been seen"""
+        return -self._heap[0][0] if len(self._heap) >= self.k else float('inf')
+    
+    def items(self):
+        """(index, distance) pairs sorted best first"""
+        return sorted(((-neg_idx, -neg_dist) for neg_dist, neg_idx in self._heap), key=lambda x: (x[1], x[0]))
+
 
 class SignMatcher:
     _instance = None
@@ -45,6 +125,9 @@ class SignMatcher:
         
         # Thread local storage for per-thread Java gateways
         self.thread_local = threading.local()
+        
+        # Long-lived pool for multi-query matching, created on first use
+        self._executor = None
     
     def get_thread_gateway(self):
         """Get or create a thread-local Java gateway"""
@@ -187,7 +270,113 @@ class SignMatcher:
         
         return results
 
-    def find_matches(self, query_sign, database_signs, top_k=10):
+    def convert_many_for_java(self, sequences):
+        """Convert a list of sequences to a Java List of 2D arrays with as few Py4J calls as possible"""
+        arrays = [np.nan_to_num(np.asarray(seq, dtype=np.float32), nan=0.0) for seq in sequences]
+        java_list = self.gateway.jvm.java.util.ArrayList()
+        
+        # Runs of equally shaped sequences go over in a single bulk call
+        start = 0
+        while start < len(arrays):
+            shape = arrays[start].shape
+            end = start + 1
+            while end < len(arrays) and arrays[end].shape == shape:
+                end += 1
+            run = arrays[start:end]
+            try:
+                data = np.stack(run).astype('<f8').tobytes()
+                java_list.addAll(self.dtw_server.toMatrixList(data, len(run), shape[0], shape[1]))
+            except Exception:
+                # DTWServer compiled before toMatrixList existed: copy element by element
+                for arr in run:
+                    java_list.add(self.convert_for_java(arr, self.gateway, self._double_array_class))
+            start = end
+        
+        return java_list
+
+    def prepare_database(self, database_signs, feature='centroids_dom_arr'):
+        """Convert the database once for repeated matching, grouped by handedness"""
+        start_time = time.time()
+        groups = {}
+        for idx, db_sign in enumerate(database_signs):
+            sequence = db_sign.get(feature)
+            if sequence is None or len(sequence) == 0:
+                continue
+            groups.setdefault(db_sign.get('is_one_handed', True), []).append(idx)
+        
+        prepared = {}
+        for is_one_handed, indices in groups.items():
+            prepared[is_one_handed] = {
+                'indices': np.asarray(indices),
+                'java_list': self.convert_many_for_java([database_signs[idx][feature] for idx in indices])
+            }
+        
+        print(f"Prepared {sum(len(g['indices']) for g in prepared.values())} database sequences "
+              f"in {time.time() - start_time:.2f} seconds")
+        return prepared
+
+    def find_matches_many(self, queries, database_signs, top_k=10, tile_size=None, normalization='minmax',
+                          prepared=None, candidates=None):
+        """Find top k matches for many queries at once, returning one match list per query
+        
+        The database is converted to Java once (or pass the result of prepare_database to
+        reuse it across calls) and the queries x database work is split into tiles spread
+        over a persistent thread pool. Indices refer to database_signs. candidates optionally
+        holds, per query, the database indices it may match (None for all of them).
+        """
+        start_time = time.time()
+        if prepared is None:
+            prepared = self.prepare_database(database_signs)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+        
+        query_lists = self.convert_many_for_java([
+            q['centroids_dom_arr'] if 'centroids_dom_arr' in q else np.zeros((1, 2)) for q in queries
+        ])
+        
+        # Submit every (query, database tile) pair
+        futures = {}
+        distances = []
+        for q, query_sign in enumerate(queries):
+            group = prepared.get(query_sign.get('is_one_handed', True))
+            if 'centroids_dom_arr' not in query_sign or group is None:
+                distances.append(None)
+                continue
+            
+            total = len(group['indices'])
+            distances.append(np.empty(total))
+            size = tile_size or max(1, -(-total // self.num_threads))
+            java_query = query_lists[q]
+            for start in range(0, total, size):
+                end = min(start + size, total)
+                future = self._executor.submit(
+                    self.dtw_server.batchCalculateDTW, java_query, group['java_list'].subList(start, end)
+                )
+                futures[future] = (q, start, end)
+        
+        for future, (q, start, end) in futures.items():
+            try:
+                distances[q][start:end] = list(future.result())
+            except Exception as e:
+                print(f"Error processing tile {start}-{end} for query {q}: {str(e)}")
+                distances[q][start:end] = np.inf
+        
+        results = []
+        for q, (query_sign, query_distances) in enumerate(zip(queries, distances)):
+            if query_distances is None:
+                results.append([])
+                continue
+            indices = prepared[query_sign.get('is_one_handed', True)]['indices']
+            if candidates is not None and candidates[q] is not None:
+                keep = np.isin(indices, list(candidates[q]))
+                indices, query_distances = indices[keep], query_distances[keep]
+            results.append(rank_matches(indices, query_distances, top_k, normalization))
+        
+        print(f"Matched {len(queries)} queries against {len(database_signs)} signs "
+              f"in {time.time() - start_time:.2f} seconds ({len(futures)} tiles)")
+        return results
+
+    def find_matches(self, query_sign, database_signs, top_k=10, normalization='minmax'):
         """Find top k matches for query sign using parallel processing with Java DTW"""
         start_time = time.time()
         
@@ -227,34 +416,18 @@ class SignMatcher:
         if not distances:
             return []
             
-        # Find min and max distances for normalization
-        min_dist = min(d for _, d in distances)
-        max_dist = max(d for _, d in distances)
-        dist_range = max_dist - min_dist
-        
-        matches = []
-        for idx, dist in distances:
-            if dist_range > 0:
-                # Linear normalization to convert distance to similarity (0-100%)
-                normalized_dist = (dist - min_dist) / dist_range
-                similarity = (1.0 - normalized_dist) * 100
-            else:
-                # Handle case where all distances are equal
-                similarity = 100.0 if dist == min_dist else 0.0
-                
-            matches.append((idx, similarity))
-        
-        # Sort by similarity (descending) and return top_k matches
-        matches.sort(key=lambda x: x[1], reverse=True)
+        indices = [idx for idx, _ in distances]
+        values = [dist for _, dist in distances]
+        matches = rank_matches(indices, values, top_k, normalization)
         
         time_taken = time.time() - start_time
         print(f"Matching completed in {time_taken:.2f}s")
         
-        return matches[:top_k]
+        return matches
 
     # Add this method to the SignMatcher class in sign_matcher.py
 
-    def find_matches_batch(self, query_sign, database_signs, top_k=10):
+    def find_matches_batch(self, query_sign, database_signs, top_k=10, normalization='minmax'):
         """Find top k matches using batch processing for much faster results"""
         start_time = time.time()
         
@@ -278,53 +451,393 @@ class SignMatcher:
         # Convert query to Java format once
         java_query = self.convert_for_java(query_centroids)
         
+        # Prepare all database sequences and call batch processing function
+        sequences = [db_sign.get('centroids_dom_arr') for db_sign in compatible_signs]
+        print(f"Processing {len(sequences)} sequences in a single batch")
+        distances = self._batch_distances(java_query, sequences)
+        
+        # Select and normalize the top k in NumPy
+        result_matches = rank_matches(np.arange(len(distances)), distances, top_k, normalization)
+        
+        print(f"DTW batch processing completed in {time.time() - start_time:.2f} seconds")
+        
+        return result_matches
+
+    def iter_matches(self, query_sign, database_signs, top_k=10, batch_size=64, normalization='relative'):
+        """Anytime search: yield (provisional top k, signs examined, total) after each candidate batch
+        
+        Candidates are scored in order of a cheap DTW lower bound so good matches tend to show
+        up in the first batches; the caller can stop iterating at any point. Provisional results
+        are always scored 'relative' to the best distance so far, so a match keeps its score
+        between updates unless a better one turns up; the normalization requested applies to
+        the last yield, which equals find_matches_batch (indices into database_signs).
+        """
+        start_time = time.time()
+        
+        if 'centroids_dom_arr' not in query_sign:
+            print("No dominant hand centroids found in query")
+            return
+        
+        candidates = [
+            idx for idx, db_sign in enumerate(database_signs)
+            if query_sign.get('is_one_handed', True) == db_sign.get('is_one_handed', True)
+            and db_sign.get('centroids_dom_arr') is not None and len(db_sign['centroids_dom_arr']) > 0
+        ]
+        total = len(candidates)
+        if total == 0:
+            return
+        
+        # Most promising candidates first
+        bounds = batch_lower_bound(query_sign['centroids_dom_arr'],
+                                   [database_signs[idx]['centroids_dom_arr'] for idx in candidates])
+        candidates = [candidates[i] for i in np.argsort(bounds, kind='stable')]
+        
+        java_query = self.convert_for_java(np.ascontiguousarray(query_sign['centroids_dom_arr'], dtype=np.float32))
+        best = TopKHeap(top_k)
+        min_dist = float('inf')
+        max_dist = float('-inf')
+        
+        for start in range(0, total, batch_size):
+            batch = candidates[start:start + batch_size]
+            distances = self._batch_distances(
+                java_query, [database_signs[idx]['centroids_dom_arr'] for idx in batch]
+            )
+            for idx, dist in zip(batch, distances):
+                best.push(idx, dist)
+            if distances:
+                min_dist = min(min_dist, min(distances))
+                max_dist = max(max_dist, max(distances))
+            
+            matches = best.items()
+            examined = min(start + batch_size, total)
+            # Min-max bounds are only global once every candidate has been scored
+            batch_normalization = normalization if examined == total else 'relative'
+            yield (rank_matches([idx for idx, _ in matches], [dist for _, dist in matches], top_k,
+                                batch_normalization, dist_bounds=(min_dist, max_dist)),
+                   examined, total)
+        
+        print(f"Streaming search finished in {time.time() - start_time:.2f} seconds")
+
+    def weighted_features(self, query_sign):
+        """(feature key, weight) pairs the query can be scored on, highest weight first"""
+        features = [('centroids_dom_arr', self.f1)]
+        if not query_sign.get('is_one_handed', True):
+            features += [
+                ('centroids_nondom_arr', self.f2),
+                ('l_delta_arr', self.f3),
+                ('orientation_dom_arr', self.f4),
+                ('orientation_nondom_arr', self.f5),
+                ('orientation_delta_arr', self.f6)
+            ]
+        features = [(key, weight) for key, weight in features
+                    if query_sign.get(key) is not None and len(query_sign[key]) > 0]
+        return sorted(features, key=lambda f: -f[1])
+
+    def find_matches_within(self, query_sign, database_signs, budget_s, top_k=10, priority=None, batch_size=32,
+                            normalization='relative', on_matches=None):
+        """Deadline-aware search: best top k found within budget_s seconds
+        
+        Candidates are scored in order of priority (one cheap key per database sign, lower first,
+        e.g. LocationIndex.cell_distances) and then of the DTW lower bound, with the distance of
+        process_sign_batch: weighted motion features averaged over those both signs have, plus the
+        hand appearance term. Per-candidate cost is measured as batches complete; when
+        the remaining candidates would not fit in the time left, the lowest weighted features are
+        dropped (already scored candidates are re-ranked without them) down to the dominant hand.
+        on_matches(matches, examined, total) is called after every batch like iter_matches and can
+        return True to stop. Returns (matches, partial, examined_fraction) where partial means
+        candidates were left unscored or features were dropped; indices refer to database_signs.
+        Progress updates and partial results are scored 'relative' to the best distance found,
+        since min-max bounds over part of the database are not comparable with a full search;
+        the normalization requested only applies to complete results.
+        """
+        start_time = time.time()
+        deadline = start_time + budget_s
+        
+        features = self.weighted_features(query_sign)
+        if not features or features[0][0] != 'centroids_dom_arr':
+            print("No dominant hand centroids found in query")
+            return [], False, 0.0
+        
+        candidates = [
+            idx for idx, db_sign in enumerate(database_signs)
+            if query_sign.get('is_one_handed', True) == db_sign.get('is_one_handed', True)
+            and db_sign.get('centroids_dom_arr') is not None and len(db_sign['centroids_dom_arr']) > 0
+        ]
+        total = len(candidates)
+        if total == 0:
+            return [], False, 0.0
+        
+        # Most promising candidates first: priority, then lower bound
+        bounds = batch_lower_bound(query_sign['centroids_dom_arr'],
+                                   [database_signs[idx]['centroids_dom_arr'] for idx in candidates])
+        if priority is not None:
+            order = np.lexsort((bounds, np.asarray([priority[idx] for idx in candidates], dtype=np.float64)))
+        else:
+            order = np.argsort(bounds, kind='stable')
+        candidates = [candidates[i] for i in order]
+        
+        java_queries = {
+            key: self.convert_for_java(np.ascontiguousarray(query_sign[key], dtype=np.float32))
+            for key, _ in features
+        }
+        active = list(features)
+        # NaN where a database sign lacks the feature: it is skipped, as in process_sign_batch
+        distances = {key: [] for key, _ in features}
+        hand_distances = []
+        cost = {}
+        scored = 0
+        
+        def ranked(final_normalization='relative'):
+            weighted = np.array([weight * np.asarray(distances[key][:scored]) for key, weight in active])
+            counts = np.sum(~np.isnan(weighted), axis=0)
+            motion = np.nansum(weighted, axis=0) / np.maximum(counts, 1)
+            combined = motion + self.f_hand * np.asarray(hand_distances[:scored])
+            return rank_matches(candidates[:scored], combined, top_k, final_normalization)
+        
+        while scored < total:
+            left = deadline - time.time()
+            if left <= 0:
+                break
+            size = batch_size
+            if cost:
+                # Drop the lowest weighted features while the rest of the candidates would not fit
+                while len(active) > 1 and (total - scored) * sum(cost[key] for key, _ in active) > left:
+                    key, _ = active.pop()
+                    print(f"Time budget: dropping {key} after {scored}/{total} signs")
+                per_candidate = sum(cost[key] for key, _ in active)
+                if per_candidate > 0:
+                    size = min(batch_size, int(left / per_candidate))
+                if size == 0:
+                    break
+            
+            batch = candidates[scored:scored + size]
+            for key, _ in active:
+                feature_start = time.time()
+                sequences = [database_signs[idx].get(key) for idx in batch]
+                present = [i for i, seq in enumerate(sequences) if seq is not None and len(seq) > 0]
+                values = np.full(len(batch), np.nan)
+                if present:
+                    java_list = self.convert_many_for_java([sequences[i] for i in present])
+                    values[present] = list(self.dtw_server.batchCalculateDTW(java_queries[key], java_list))
+                distances[key].extend(values)
+                cost[key] = (time.time() - feature_start) / len(batch)
+            hand_distances.extend(self.compute_hand_distance(query_sign, database_signs[idx]) for idx in batch)
+            scored += len(batch)
+            
+            if on_matches is not None and on_matches(ranked(), scored, total):
+                break
+        
+        partial = scored < total or len(active) < len(features)
+        result_matches = []
+        if scored > 0:
+            result_matches = ranked('relative' if partial else normalization)
+        print(f"Budgeted search scored {scored}/{total} signs on {len(active)}/{len(features)} features "
+              f"in {time.time() - start_time:.2f} seconds" + (" (partial)" if partial else ""))
+        
+        return result_matches, partial, scored / total
+
+    def _batch_distances(self, java_query, sequences):
+        """Run one batchCalculateDTW call for a list of (possibly missing) sequences"""
         # Create a Java ArrayList to hold the database sequences
         java_list = self.gateway.jvm.java.util.ArrayList()
         
-        # Prepare all database sequences
-        for db_sign in compatible_signs:
-            if 'centroids_dom_arr' in db_sign:
-                centroids = np.array(db_sign['centroids_dom_arr'], dtype=np.float32)
-                centroids = np.ascontiguousarray(centroids)
-                java_centroids = self.convert_for_java(centroids)
-                java_list.add(java_centroids)
+        for sequence in sequences:
+            if sequence is not None and len(sequence) > 0:
+                centroids = np.ascontiguousarray(np.array(sequence, dtype=np.float32))
+                java_list.add(self.convert_for_java(centroids))
             else:
                 # Use empty array as placeholder
                 empty = np.zeros((1, 2), dtype=np.float32)
                 java_list.add(self.convert_for_java(empty))
         
-        # Call batch processing function
-        print(f"Processing {java_list.size()} sequences in a single batch")
+        if java_list.size() == 0:
+            return []
+        return list(self.dtw_server.batchCalculateDTW(java_query, java_list))
+
+    def find_matches_clustered(self, query_sign, database_signs, clusters, top_k=10, exact=True,
+                               normalization='relative', on_matches=None):
+        """Find top k matches by ranking cluster prototypes and expanding only clusters that can still win
+        
+        clusters come from sign_clusters.resolve_clusters and index into database_signs.
+        With exact=True only the box lower bounds are used for pruning, so the ranking and the
+        scores are identical to find_matches_batch(normalization='relative'); exact=False also
+        trusts prototype distance minus cluster radius, which is faster but may miss matches
+        since DTW is not a metric. Only 'relative' scores are supported: they need just the
+        best distance, whereas 'minmax' needs the largest one, which pruning never computes.
+        on_matches(matches, examined, total) is called after every expanded cluster like
+        iter_matches (examined counts scored and pruned signs) and can return True to stop.
+        """
+        if normalization != 'relative':
+            raise ValueError("find_matches_clustered only supports normalization='relative'")
+        start_time = time.time()
+        
+        if 'centroids_dom_arr' not in query_sign:
+            print("No dominant hand centroids found in query")
+            return []
+        if not clusters:
+            return []
         
-        # Pass the Java ArrayList to the batch function
-        distances = self.dtw_server.batchCalculateDTW(java_query, java_list)
+        query_seq = as_sequence(query_sign['centroids_dom_arr'])
+        java_query = self.convert_for_java(np.ascontiguousarray(query_sign['centroids_dom_arr'], dtype=np.float32))
+        is_one_handed = query_sign.get('is_one_handed', True)
+        
+        # Rank all prototypes with a single batch call
+        proto_distances = self._batch_distances(java_query, [c['prototype'] for c in clusters])
+        bounds = []
+        for cluster, proto_dist in zip(clusters, proto_distances):
+            bound = box_lower_bound(query_seq, cluster['box_first'], cluster['box_all'], cluster['box_last'])
+            if not exact:
+                bound = max(bound, proto_dist - cluster['radius'])
+            bounds.append(bound)
+        order = sorted(range(len(clusters)), key=lambda c: proto_distances[c])
+        
+        best = TopKHeap(top_k)
+        expanded = 0
+        computed = 0
+        examined = 0
+        total = sum(1 for cluster in clusters for i in cluster['member_indices']
+                    if database_signs[i].get('is_one_handed', True) == is_one_handed)
+        
+        def can_beat(bound, kth):
+            # Small tolerance so float differences between numpy and Java never prune a tie
+            return bound <= kth + 1e-9 * max(1.0, abs(kth))
+        
+        def ranked():
+            matches = best.items()
+            return rank_matches([idx for idx, _ in matches], [dist for _, dist in matches], top_k, normalization)
+        
+        for c in order:
+            members = [
+                i for i in clusters[c]['member_indices']
+                if database_signs[i].get('is_one_handed', True) == is_one_handed
+            ]
+            examined += len(members)
+            if not members or not can_beat(bounds[c], best.kth_distance()):
+                continue
+            
+            # Drop individual members whose own lower bound cannot beat the current k-th best
+            kth = best.kth_distance()
+            if kth != float('inf'):
+                member_bounds = batch_lower_bound(
+                    query_seq, [database_signs[i]['centroids_dom_arr'] for i in members]
+                )
+                members = [i for i, b in zip(members, member_bounds) if can_beat(b, kth)]
+            if not members:
+                continue
+            expanded += 1
+            
+            distances = self._batch_distances(
+                java_query, [database_signs[i]['centroids_dom_arr'] for i in members]
+            )
+            computed += len(members)
+            
+            for idx, dist in zip(members, distances):
+                best.push(idx, dist)
+            
+            if on_matches is not None and examined < total and on_matches(ranked(), examined, total):
+                break
         
-        # Process results
-        matches = []
-        for i, distance in enumerate(distances):
-            matches.append((i, distance))
+        result_matches = ranked()
+        if on_matches is not None and examined == total:
+            on_matches(result_matches, total, total)
         
-        # Sort by distance (ascending)
-        matches.sort(key=lambda x: x[1])
+        print(f"Clustered search expanded {expanded}/{len(clusters)} clusters, "
+              f"computed {computed}/{len(database_signs)} DTW distances "
+              f"in {time.time() - start_time:.2f} seconds")
         
-        # Convert to similarity scores (0-100%)
-        result_matches = []
-        if matches:
-            min_dist = matches[0][1]
-            max_dist = matches[-1][1]
-            dist_range = max_dist - min_dist
-            
-            for idx, dist in matches[:top_k]:
-                if dist_range > 0:
-                    similarity = (1.0 - (dist - min_dist) / dist_range) * 100
-                else:
-                    similarity = 100.0
-                result_matches.append((idx, similarity))
+        return result_matches
+
+    def _pyramid_level(self, sign, size):
+        """Dominant hand trajectory at a cascade resolution, falling back to resampling the full one"""
+        pyramid = sign.get('centroids_dom_pyramid') or {}
+        level = pyramid.get(str(size))
+        if level is not None and len(level) > 0:
+            return level
+        full = sign.get('centroids_dom_arr')
+        if full is None or len(full) == 0:
+            return None
+        # Entries populated before the pyramid existed: resample the stored 20-frame trajectory
+        return InterpolateAndResample(np.asarray(full, dtype=np.float32), size)
+
+    def find_matches_cascade(self, query_sign, database_signs, top_k=10, levels=(5, 10), shortlist_sizes=(200, 50),
+                             normalization='relative', on_matches=None, batch_size=64):
+        """Find top k matches by ranking everything at the coarsest resolution and refining a shrinking shortlist
+        
+        levels are the coarse trajectory lengths (stored by the populators as centroids_dom_pyramid),
+        shortlist_sizes[i] is how many candidates survive level i. Full-resolution DTW only runs on
+        the final shortlist, so recall against find_matches_batch depends on the shortlist sizes;
+        use measure_cascade_recall to pick them. Scores are 'relative' only, so they do not depend
+        on the shortlist sizes and equal find_matches_batch's whenever the best match survives.
+        on_matches(matches, examined, total) is called after every full-resolution batch like
+        iter_matches (examined counts the signs dropped by the coarse levels as well) and can
+        return True to stop.
+        """
+        if normalization != 'relative':
+            raise ValueError("find_matches_cascade only supports normalization='relative'")
+        start_time = time.time()
         
-        print(f"DTW batch processing completed in {time.time() - start_time:.2f} seconds")
+        if 'centroids_dom_arr' not in query_sign:
+            print("No dominant hand centroids found in query")
+            return []
+        if len(shortlist_sizes) != len(levels):
+            raise ValueError("shortlist_sizes needs one entry per cascade level")
+        
+        # Filter compatible signs (same handedness)
+        candidates = [
+            idx for idx, db_sign in enumerate(database_signs)
+            if query_sign.get('is_one_handed', True) == db_sign.get('is_one_handed', True)
+        ]
+        total = len(candidates)
+        
+        for size, keep in zip(levels, shortlist_sizes):
+            if len(candidates) <= max(keep, top_k):
+                continue
+            query_level = self._pyramid_level(query_sign, size)
+            java_query = self.convert_for_java(np.asarray(query_level, dtype=np.float32))
+            distances = self._batch_distances(
+                java_query, [self._pyramid_level(database_signs[idx], size) for idx in candidates]
+            )
+            ranked = rank_matches(candidates, distances, max(keep, top_k))
+            candidates = [idx for idx, _ in ranked]
+            print(f"Cascade level {size} frames: kept {len(candidates)} candidates")
+        
+        # Full-resolution DTW on the final shortlist, best coarse candidates first
+        java_query = self.convert_for_java(np.ascontiguousarray(query_sign['centroids_dom_arr'], dtype=np.float32))
+        distances = []
+        step = batch_size if on_matches is not None else max(1, len(candidates))
+        for start in range(0, len(candidates), step):
+            distances.extend(self._batch_distances(
+                java_query, [database_signs[idx].get('centroids_dom_arr') for idx in candidates[start:start + step]]
+            ))
+            examined = total - len(candidates) + len(distances)
+            if on_matches is not None and on_matches(
+                    rank_matches(candidates[:len(distances)], distances, top_k, normalization), examined, total):
+                break
+        result_matches = rank_matches(candidates[:len(distances)], distances, top_k, normalization)
+        
+        print(f"Cascade matching ran full DTW on {len(distances)}/{total} signs "
+              f"in {time.time() - start_time:.2f} seconds")
         
         return result_matches
 
+    def measure_cascade_recall(self, query_signs, database_signs, top_k=10, **cascade_options):
+        """Average recall@k of find_matches_cascade against the exhaustive find_matches_batch"""
+        recalls = []
+        for query_sign in query_signs:
+            compatible = [
+                idx for idx, db_sign in enumerate(database_signs)
+                if query_sign.get('is_one_handed', True) == db_sign.get('is_one_handed', True)
+            ]
+            # find_matches_batch indexes into the compatible subset
+            exact = {compatible[idx] for idx, _ in self.find_matches_batch(query_sign, database_signs, top_k)}
+            approx = {idx for idx, _ in self.find_matches_cascade(query_sign, database_signs, top_k, **cascade_options)}
+            if exact:
+                recalls.append(len(exact & approx) / len(exact))
+        
+        recall = float(np.mean(recalls)) if recalls else 0.0
+        print(f"Cascade recall@{top_k} over {len(recalls)} queries: {recall:.3f}")
+        return recall
+
     def compute_hand_distance(self, Q, X):
         """Compute Euclidean distance between hand appearance images as in paper section 6"""
         try:
@@ -0,0 +1,38 @@
+import threading
+import time
+import numpy as np
+import pytest
+from frame_pipeline import FramePipeline
+
+
+class FailingStage:
+    """Raises on the given frame; prepares a full-size pooled copy of each frame, like full-resolution tracking"""
+    name = "failing"
+
+    def __init__(self, fail_at):
+        self.fail_at = fail_at
+
+    def prepare(self, frame, pool):
+        out = pool.acquire(frame.shape)
+        out[...] = frame
+        return out
+
+    def process(self, index, frame, prepared=None):
+        if index == self.fail_at:
+            raise RuntimeError("stage failed")
+
+    def finish(self):
+        return None
+
+
+def test_stage_failure_stops_prefetch_thread():
+    # Frames and prepared copies share a shape, so the producer waits on the pool while a stage holds a frame
+    frames = (np.full((8, 8, 3), i % 256, dtype=np.uint8) for i in range(1000))
+    pipeline = FramePipeline([FailingStage(fail_at=3)], prefetch=1)
+
+    start = time.time()
+    with pytest.raises(RuntimeError, match="stage failed"):
+        pipeline.run(frames)
+
+    assert time.time() - start < 2.0
+    assert not any(thread.name == "frame-prefetch" for thread in threading.enumerate())
@@ -0,0 +1,39 @@
+import numpy as np
+from landmark_cache import add_segment, covering_segment, load_landmarks, save_landmarks
+
+FPS = 30
+
+
+def make_segment(first_frame, end_frame, value, face_x=1.0):
+    count = end_frame - first_frame
+    return {
+        "landmarks": np.full((count, 2, 21, 2), value, dtype=np.float64),
+        "tracked": np.ones(count, dtype=bool),
+        "timestamps": (first_frame + np.arange(count)) / FPS,
+        "frame_size": (480, 640),
+        "face_box": (face_x, 2.0, 3.0, 4.0),
+        "span": (first_frame / FPS, end_frame / FPS)
+    }
+
+
+def test_disjoint_ranges_are_kept_and_overlaps_merged(tmp_path):
+    segments, _ = add_segment(None, make_segment(300, 360, 1.0), FPS)
+    segments, _ = add_segment(segments, make_segment(1500, 1530, 2.0), FPS)
+    assert len(segments) == 2
+    assert covering_segment(segments, 10.5, 11.5, FPS) is segments[0]
+    assert covering_segment(segments, 50.0, 51.0, FPS) is segments[1]
+    assert covering_segment(segments, 11.0, 13.0, FPS) is None
+
+    segments, merged = add_segment(segments, make_segment(330, 420, 3.0, face_x=np.nan), FPS)
+    assert len(segments) == 2
+    assert merged["span"] == (10.0, 14.0) and len(merged["timestamps"]) == 120
+    # The new tracking wins where the two overlap; the earlier face box is kept
+    assert np.all(merged["landmarks"][:30] == 1.0) and np.all(merged["landmarks"][30:] == 3.0)
+    assert merged["face_box"][0] == 1.0
+
+    path = str(tmp_path / "video.npz")
+    save_landmarks(path, segments)
+    loaded = load_landmarks(path)
+    assert [segment["span"] for segment in loaded] == [(10.0, 14.0), (50.0, 51.0)]
+    assert np.array_equal(loaded[0]["landmarks"], merged["landmarks"])
+    assert np.allclose(loaded[1]["timestamps"], np.arange(1500, 1530) / FPS)
@@ -0,0 +1,48 @@
+import json
+import numpy as np
+import VideoTrimAndCropping
+from sign_index import build_location_index
+
+
+def create_sign(start, is_one_handed):
+    trajectory = np.linspace(start, np.add(start, 0.1), 20)
+    return {
+        'name': f"sign_{start[0]}_{is_one_handed}",
+        'is_one_handed': is_one_handed,
+        'features': {'centroids_dom_arr': trajectory.tolist(), 'is_one_handed': is_one_handed}
+    }
+
+
+class StubMatcher:
+    """Ranks database signs in the order they are passed in"""
+
+    def find_matches_batch(self, query_sign, database_signs, top_k=10, **kwargs):
+        return [(idx, 100.0) for idx in range(min(top_k, len(database_signs)))]
+
+
+def test_query_filters_before_min_candidates():
+    signs = {f"two_{i}.mp4": create_sign((0.0, 0.0), False) for i in range(3)}
+    index = build_location_index(signs)
+    query = signs["two_0.mp4"]['features']
+
+    assert index.query(query, min_candidates=1) == set(signs)
+    # Every hit has the wrong handedness: too few candidates, fall back to the full scan
+    assert index.query(query, min_candidates=1, allowed=set()) is None
+
+
+def test_wrong_handedness_hits_fall_back_to_full_scan(tmp_path, monkeypatch):
+    # The index hits around the query are all two-handed; the one-handed signs lie elsewhere
+    signs = {f"two_{i}.mp4": create_sign((0.0, 0.0), False) for i in range(3)}
+    signs.update({f"one_{i}.mp4": create_sign((5.0, 5.0), True) for i in range(2)})
+    with open(tmp_path / "sign_data.json", 'w') as f:
+        json.dump({"signs": signs}, f)
+
+    monkeypatch.setattr(VideoTrimAndCropping, "_database_cache", None)
+    monkeypatch.setattr(VideoTrimAndCropping, "get_matcher", StubMatcher)
+    monkeypatch.setattr(VideoTrimAndCropping, "LOCATION_INDEX_MIN_CANDIDATES", 1)
+    monkeypatch.setattr(VideoTrimAndCropping, "MATCH_CASCADE_SHORTLISTS", None)
+
+    query = create_sign((0.0, 0.0), True)['features']
+    matches = VideoTrimAndCropping.match_sign_features(query, True, db_dir=str(tmp_path))
+
+    assert sorted(name for name, _ in matches) == ["sign_5.0_True", "sign_5.0_True"]
@@ -34,6 +34,114 @@ def test_sign_matching():
     for idx, distance in matches:
         print(f"Match {idx}: distance = {distance}")
 
+def test_clustered_scores_match_exhaustive():
+    from sign_clusters import build_clusters, resolve_clusters
+    
+    matcher = SignMatcher.get_instance()
+    rng = np.random.default_rng(0)
+    signs = {
+        f"sign_{i}.mp4": {
+            'name': f"sign_{i % 4}",
+            'is_one_handed': True,
+            'features': {'centroids_dom_arr': rng.random((20, 2)).tolist(), 'is_one_handed': True}
+        }
+        for i in range(24)
+    }
+    paths = list(signs)
+    database_signs = [signs[p]['features'] for p in paths]
+    clusters = resolve_clusters(build_clusters(signs, max_cluster_size=3), paths, database_signs)
+    query_sign = {'centroids_dom_arr': rng.random((20, 2)), 'is_one_handed': True}
+    
+    # find_matches_batch is the exhaustive search over the same dominant hand distance
+    exhaustive = matcher.find_matches_batch(query_sign, database_signs, top_k=5, normalization='relative')
+    clustered = matcher.find_matches_clustered(query_sign, database_signs, clusters, top_k=5)
+    
+    assert [idx for idx, _ in clustered] == [idx for idx, _ in exhaustive]
+    assert np.allclose([score for _, score in clustered], [score for _, score in exhaustive])
+    assert clustered[-1][1] > 0
+
+def test_relative_scores_with_exact_duplicate():
+    from sign_matcher import rank_matches
+    
+    matches = rank_matches(np.arange(4), [0.0, 2.0, 4.0, 8.0], top_k=3, normalization='relative')
+    
+    assert [idx for idx, _ in matches] == [0, 1, 2]
+    assert np.allclose([score for _, score in matches], [100.0, 100.0, 50.0])
+
+def test_pruned_searches_stream_progress():
+    from sign_clusters import build_clusters, resolve_clusters
+    
+    matcher = SignMatcher.get_instance()
+    rng = np.random.default_rng(1)
+    signs = {
+        f"sign_{i}.mp4": {
+            'name': f"sign_{i % 4}",
+            'is_one_handed': True,
+            'features': {'centroids_dom_arr': rng.random((20, 2)).tolist(), 'is_one_handed': True}
+        }
+        for i in range(40)
+    }
+    paths = list(signs)
+    database_signs = [signs[p]['features'] for p in paths]
+    clusters = resolve_clusters(build_clusters(signs, max_cluster_size=3), paths, database_signs)
+    query_sign = {'centroids_dom_arr': rng.random((20, 2)), 'is_one_handed': True}
+    
+    for search in (
+        lambda on_matches: matcher.find_matches_clustered(query_sign, database_signs, clusters, top_k=5,
+                                                          on_matches=on_matches),
+        lambda on_matches: matcher.find_matches_cascade(query_sign, database_signs, top_k=5, levels=(5,),
+                                                        shortlist_sizes=(20,), batch_size=8, on_matches=on_matches)
+    ):
+        updates = []
+        result = search(lambda matches, examined, total: updates.append((matches, examined, total)))
+        assert updates and updates[-1] == (result, len(database_signs), len(database_signs))
+        # Stopping at the first update returns the matches found so far
+        assert search(lambda matches, examined, total: True) == updates[0][0]
+
+def test_budgeted_scores_match_exhaustive():
+    matcher = SignMatcher.get_instance()
+    rng = np.random.default_rng(2)
+
+    def sign():
+        return {
+            'centroids_dom_arr': rng.random((20, 2)),
+            'centroids_nondom_arr': rng.random((20, 2)),
+            'l_delta_arr': rng.random((20, 2)),
+            'H_d_s': rng.random((21, 2)),
+            'H_d_e': rng.random((21, 2)),
+            'is_one_handed': False
+        }
+
+    database_signs = [sign() for _ in range(12)]
+    # Signs missing a feature are scored on the features they have, not on a padded sequence
+    del database_signs[3]['l_delta_arr']
+    database_signs[5]['centroids_nondom_arr'] = np.zeros((0, 2))
+    query_sign = sign()
+
+    exhaustive = matcher.find_matches(query_sign, database_signs, top_k=5, normalization='relative')
+    budgeted, partial, coverage = matcher.find_matches_within(query_sign, database_signs, budget_s=60, top_k=5)
+
+    assert not partial and coverage == 1.0
+    assert [idx for idx, _ in budgeted] == [idx for idx, _ in exhaustive]
+    assert np.allclose([score for _, score in budgeted], [score for _, score in exhaustive])
+
+def test_batched_candidates_match_single_query():
+    matcher = SignMatcher.get_instance()
+    rng = np.random.default_rng(3)
+    database_signs = [{'centroids_dom_arr': rng.random((20, 2)), 'is_one_handed': True} for _ in range(16)]
+    queries = [{'centroids_dom_arr': rng.random((20, 2)), 'is_one_handed': True} for _ in range(3)]
+    candidates = [[1, 4, 5, 9, 12], None, [0, 2]]
+
+    batched = matcher.find_matches_many(queries, database_signs, top_k=3, normalization='relative',
+                                        candidates=candidates)
+
+    for query_sign, allowed, matches in zip(queries, candidates, batched):
+        allowed = allowed if allowed is not None else list(range(len(database_signs)))
+        single = matcher.find_matches_batch(query_sign, [database_signs[idx] for idx in allowed], top_k=3,
+                                            normalization='relative')
+        assert [idx for idx, _ in matches] == [allowed[idx] for idx, _ in single]
+        assert np.allclose([score for _, score in matches], [score for _, score in single])
+
 def main():
     print("Starting tests...")
     